@@ -1,15 +1,62 @@
+import json
 import time
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from app.services.agent_service import AgentService
+from app.services.answer_cache import answer_cache
 from app.schemas.response import StandardResponse  # 假设你定义在这里
 from app.core.logger import logger
+from app.core.readiness import readiness
 
 router = APIRouter()
 agent_service = AgentService()
 
 
+def _to_response_payload(result: dict, start_ts: float) -> dict:
+    """Service 结果 -> StandardResponse 结构 (/query 与 /query/stream 的 done 事件共用)"""
+    response_payload = {
+        "success": False,
+        "message": "",
+        "data": [],
+        "meta": {}
+    }
+
+    # 1. 映射字段 (Mapping)
+    # 无论 Service 返回什么，这里负责转换成标准格式
+    response_payload["success"] = result.get("success", True)  # Service 可能显式返回 False
+    response_payload["message"] = result.get("message", "")  # Analyst 的话
+    response_payload["data"] = result.get("data", [])  # 表格数据
+
+    # 2. 组装元数据 (Meta) - 给前端 Debug 或展示 SQL 用
+    response_payload["meta"] = {
+        "trace_id": result.get("trace_id"),
+        "intent": result.get("intent", "UNKNOWN"),
+        "sql": result.get("sql"),  # 前端可能想展示生成的 SQL
+        "steps": result.get("steps", []),  # 如果前端要画流程图
+        "answer_cache": result.get("answer_cache"),  # 是否命中语义答案缓存
+        "node_timings": result.get("node_timings", []),  # 子图各节点耗时
+        "duration": round(time.time() - start_ts, 2)
+    }
+
+    # 特殊处理：如果 Service 返回了 error 字段，视为业务失败
+    if result.get("error"):
+        response_payload["success"] = False
+        # 如果 message 是空的，把 error 填进去
+        if not response_payload["message"]:
+            response_payload["message"] = f"查询处理异常: {result.get('error')}"
+
+    return response_payload
+
+
+def _ensure_ready() -> None:
+    """预热在后台进行：master_app / 模型还没就绪时直接 503，而不是让请求在半初始化的状态里报错"""
+    if not readiness.is_ready():
+        raise HTTPException(status_code=503, detail={"message": "服务预热中，请稍后重试", **readiness.snapshot()})
+
+
 @router.post("/query", response_model=StandardResponse)
 async def query_agent(payload: dict):
+    _ensure_ready()
     start_ts = time.time()
     user_id = payload.get("user_id", "anonymous")
     query = payload.get("query", "")
@@ -27,28 +74,7 @@ async def query_agent(payload: dict):
         # 1. 调用业务逻辑
         # Service 层返回的通常是 dict: {"message": "...", "data": [...], "sql": "...", "trace_id": "..."}
         result = await agent_service.process_query(query, user_id, session_id)
-
-        # 2. 映射字段 (Mapping)
-        # 无论 Service 返回什么，这里负责转换成标准格式
-        response_payload["success"] = result.get("success", True)  # Service 可能显式返回 False
-        response_payload["message"] = result.get("message", "")  # Analyst 的话
-        response_payload["data"] = result.get("data", [])  # 表格数据
-
-        # 3. 组装元数据 (Meta) - 给前端 Debug 或展示 SQL 用
-        response_payload["meta"] = {
-            "trace_id": result.get("trace_id"),
-            "intent": result.get("intent", "UNKNOWN"),
-            "sql": result.get("sql"),  # 前端可能想展示生成的 SQL
-            "steps": result.get("steps", []),  # 如果前端要画流程图
-            "duration": round(time.time() - start_ts, 2)
-        }
-
-        # 特殊处理：如果 Service 返回了 error 字段，视为业务失败
-        if result.get("error"):
-            response_payload["success"] = False
-            # 如果 message 是空的，把 error 填进去
-            if not response_payload["message"]:
-                response_payload["message"] = f"查询处理异常: {result.get('error')}"
+        response_payload = _to_response_payload(result, start_ts)
 
     except Exception as e:
         # 4. 兜底异常捕获 (Catch-All)
@@ -60,4 +86,48 @@ async def query_agent(payload: dict):
         # 这里可以选择是否返回 500 状态码，或者保持 200 但 success=False
         # 通常建议保持 200，让前端根据 success 字段判断
 
-    return response_payload
\ No newline at end of file
+    return response_payload
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/query/stream")
+async def query_agent_stream(payload: dict):
+    """
+    SSE 版 /query：不用等图 + 执行 + Analyst 全部跑完，首个节点结束就开始有输出
+    事件：start / node (路由、检索到的表、生成的 SQL、校验结果) / rows / token (Analyst 逐 token) / done
+    done 的 data 与 /query 的响应体完全一致，前端以它为准
+    """
+    _ensure_ready()
+    start_ts = time.time()
+    user_id = payload.get("user_id", "anonymous")
+    query = payload.get("query", "")
+    session_id = payload.get("session_id")
+
+    async def _events():
+        try:
+            async for ev in agent_service.stream_query(query, user_id, session_id):
+                if ev["event"] == "done":
+                    yield _sse("done", _to_response_payload(ev["data"], start_ts))
+                else:
+                    yield _sse(ev["event"], ev["data"])
+        except Exception as e:
+            # 响应头已经发出去了，只能用一个 done 事件告诉前端失败
+            logger.error(f"API Stream Error: {str(e)}", exc_info=True)
+            yield _sse("done", {"success": False, "message": f"系统内部错误: {str(e)}", "data": [],
+                                "meta": {"duration": round(time.time() - start_ts, 2)}})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        # 关掉反向代理 (Nginx) 的缓冲，否则事件会被攒成一坨再发
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/query/cache/stats")
+async def answer_cache_stats():
+    """语义答案缓存命中率 / 容量 / 失效次数"""
+    return answer_cache.stats()
@@ -1,17 +1,36 @@
 import datetime
+import json
 import threading
 import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Any, Optional
+from collections import Counter
+from typing import List, Dict, Any, Callable, Optional, Union, Literal
 
-from fastapi import APIRouter
+import numpy as np
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from pymilvus import Collection, connections, utility
 from sentence_transformers import SentenceTransformer, CrossEncoder
 
 from app.core.config import settings
+from app.core.executors import (
+    EMBED_POOL, MILVUS_IO_POOL, RERANK_POOL, configure_torch_threads, get_pool, pool_stats
+)
 from app.core.logger import logger
+from app.modules.retrieval.batcher import MicroBatcher
+from app.modules.retrieval.bm25 import bm25_index_current, get_bm25_index, rrf_fuse
+from app.modules.retrieval.cache import TTLCache, normalize_query, normalize_text
+from app.modules.retrieval.catalog import card_texts_current, get_card_texts, get_catalog_version
+from app.modules.retrieval.lexical import (
+    HIT as LEXICAL_HIT, get_lexical_index, lexical_index_current, lexical_result
+)
+from app.modules.retrieval.onnx_backend import (
+    OnnxCrossEncoder, OnnxEmbedder, load_onnx_cross_encoder, load_onnx_embedder
+)
+from app.modules.retrieval.scope import RISK_LEVELS, RetrievalScope
+from app.modules.retrieval.rerank_tokens import RerankItem, get_card_token_cache, predict_pretokenized
+from app.modules.retrieval.vector_index import get_local_index, local_index_current
+from app.modules.security.term_matcher import sensitive_terms
 from app.modules.sql.executor import append_event
 
 router = APIRouter(tags=["RAG"])
@@ -22,51 +41,95 @@ router = APIRouter(tags=["RAG"])
 MILVUS_HOST = settings.MILVUS_HOST
 MILVUS_PORT = settings.MILVUS_PORT
 COLLECTION_NAME = settings.MILVUS_COLLECTION
+RETRIEVAL_BACKEND = settings.RETRIEVAL_BACKEND
 
 EMBED_MODEL_NAME = settings.EMBED_MODEL
 RERANK_MODEL_NAME = settings.RERANK_MODEL
+INFERENCE_BACKEND = settings.INFERENCE_BACKEND
 
 # Recall / Rerank / Final defaults
 DEFAULT_TOP_K_RECALL = int(getattr(settings, "TOP_K_RECALL", 100))
 DEFAULT_TOP_K_RERANK = int(getattr(settings, "TOP_K_RERANK", 20))
 DEFAULT_TOP_K_FINAL = int(getattr(settings, "TOP_K_FINAL", 5))
 RERANK_THRESHOLD = float(getattr(settings, "RERANK_THRESHOLD", 0.01))
-SENSITIVE_KEYWORDS = ["工资", "薪水", "底薪", "密码", "密钥", "token", "salary", "password"]
+# 敏感词词典见 data/sensitive_terms.txt (Aho-Corasick，文件变化自动热加载)
 
 # =========================
 # Singletons + Locks
 # =========================
-_embed_model: Optional[SentenceTransformer] = None
-_rerank_model: Optional[CrossEncoder] = None
-_collection_loaded = False
+_embed_model: Optional[Union[SentenceTransformer, OnnxEmbedder]] = None
+_rerank_model: Optional[Union[CrossEncoder, OnnxCrossEncoder]] = None
+# 常驻的 collection 句柄：连接 + load 成功后才赋值，之后所有请求复用
+_collection: Optional[Collection] = None
 
-_model_lock = threading.Lock()
+# 两个模型各自一把锁：启动时并发预热，互不等待
+_embed_lock = threading.Lock()
+_rerank_lock = threading.Lock()
 _milvus_lock = threading.Lock()
 
-# 专门用于跑模型推理的线程池 (Embedding/Rerank 是 CPU 密集型任务)
-_executor = ThreadPoolExecutor(max_workers=3)
+# 按资源类型隔离的线程池：Embedding / Rerank 是 CPU 密集型，Milvus 检索是网络等待，互不抢占
+_embed_executor = get_pool(EMBED_POOL)
+_rerank_executor = get_pool(RERANK_POOL)
+_milvus_executor = get_pool(MILVUS_IO_POOL)
+
+# Query Embedding 缓存 (看板重复提问 / repair 重复补搜直接命中，不再占用推理线程)
+_embed_cache = TTLCache(
+    maxsize=settings.EMBED_CACHE_SIZE,
+    ttl_s=settings.EMBED_CACHE_TTL_S,
+    enabled=settings.EMBED_CACHE_ENABLED,
+    name="query_embedding",
+)
+
+# 端到端结果缓存 (最终 rerank 后的表列表)，catalog 版本变化时整体失效
+_result_cache = TTLCache(
+    maxsize=settings.RESULT_CACHE_SIZE,
+    ttl_s=settings.RESULT_CACHE_TTL_S,
+    enabled=settings.RESULT_CACHE_ENABLED,
+    name="retrieve_result",
+)
+_result_cache_version: Optional[str] = None
+
+# 级联 Rerank 统计：各条路径走了多少次 + 单个 pair 的 Rerank 耗时 (EMA，用于按预算裁剪 Rerank 池)
+_rerank_path_counter: Counter = Counter()
+_rerank_ms_per_pair = 2.0
 
 
 # =========================
 # Core Logic Functions
 # =========================
 
-def get_embed_model() -> SentenceTransformer:
+def get_embed_model() -> Union[SentenceTransformer, OnnxEmbedder]:
     global _embed_model
     if _embed_model is None:
-        with _model_lock:
+        with _embed_lock:
             if _embed_model is None:
+                if INFERENCE_BACKEND == "onnx":
+                    try:
+                        logger.info("🧠 Loading Embedding Model (ONNX int8)...")
+                        _embed_model = load_onnx_embedder()
+                        return _embed_model
+                    except Exception as e:
+                        logger.warning(f"⚠️ ONNX embedding load failed: {e}. Fallback to torch.")
                 logger.info(f"🧠 Loading Embedding Model: {EMBED_MODEL_NAME}...")
+                configure_torch_threads()
                 _embed_model = SentenceTransformer(EMBED_MODEL_NAME)
     return _embed_model
 
 
-def get_rerank_model() -> Optional[CrossEncoder]:
+def get_rerank_model() -> Optional[Union[CrossEncoder, OnnxCrossEncoder]]:
     global _rerank_model
     if _rerank_model is None:
-        with _model_lock:
+        with _rerank_lock:
             if _rerank_model is None:
+                if INFERENCE_BACKEND == "onnx":
+                    try:
+                        logger.info("🧠 Loading Rerank Model (ONNX int8)...")
+                        _rerank_model = load_onnx_cross_encoder()
+                        return _rerank_model
+                    except Exception as e:
+                        logger.warning(f"⚠️ ONNX rerank load failed: {e}. Fallback to torch.")
                 logger.info(f"🧠 Loading Rerank Model: {RERANK_MODEL_NAME}...")
+                configure_torch_threads()
                 try:
                     _rerank_model = CrossEncoder(RERANK_MODEL_NAME)
                 except Exception as e:
@@ -75,9 +138,31 @@ def get_rerank_model() -> Optional[CrossEncoder]:
     return _rerank_model
 
 
+def warmup_embedder() -> None:
+    """加载 Embedding 模型并跑一次推理 (首次 encode 有额外的初始化开销)"""
+    get_embed_model().encode(["warmup"], normalize_embeddings=True)
+
+
+def warmup_reranker() -> bool:
+    """加载 Rerank 模型、预分词全部表卡片并跑一次推理 (启动时调用)"""
+    model = get_rerank_model()
+    if model is None:
+        return False
+    if settings.RERANK_PRETOKENIZE_ENABLED:
+        get_card_token_cache().ensure(model.tokenizer)
+    model.predict([["warmup", "warmup"]], show_progress_bar=False)
+    return True
+
+
 def ensure_milvus_connection() -> bool:
-    global _collection_loaded
+    global _collection
+    # 快路径：句柄已就绪时不加锁 (pymilvus 连接断开后会自行重连)
+    if _collection is not None:
+        return True
+
     with _milvus_lock:
+        if _collection is not None:
+            return True
         try:
             if not connections.has_connection("default"):
                 connections.connect(alias="default", host=MILVUS_HOST, port=MILVUS_PORT)
@@ -85,134 +170,436 @@ def ensure_milvus_connection() -> bool:
             logger.error(f"❌ Milvus Connect Error: {e}")
             return False
 
-        if not _collection_loaded:
-            try:
-                if not utility.has_collection(COLLECTION_NAME):
-                    logger.error(f"❌ Collection '{COLLECTION_NAME}' not found! Please run ETL first.")
-                    return False
-                logger.info(f"🔄 Loading collection '{COLLECTION_NAME}' into memory...")
-                Collection(COLLECTION_NAME).load()
-                _collection_loaded = True
-                logger.info(f"✅ Collection '{COLLECTION_NAME}' loaded.")
-            except Exception as e:
-                logger.error(f"❌ Collection load failed: {e}", exc_info=True)
+        try:
+            if not utility.has_collection(COLLECTION_NAME):
+                logger.error(f"❌ Collection '{COLLECTION_NAME}' not found! Please run ETL first.")
                 return False
+            logger.info(f"🔄 Loading collection '{COLLECTION_NAME}' into memory...")
+            col = Collection(COLLECTION_NAME)
+            col.load()
+            _collection = col
+            logger.info(f"✅ Collection '{COLLECTION_NAME}' loaded.")
+        except Exception as e:
+            logger.error(f"❌ Collection load failed: {e}", exc_info=True)
+            return False
     return True
 
 
+def get_collection() -> Collection:
+    if _collection is None and not ensure_milvus_connection():
+        raise RuntimeError(f"Milvus collection '{COLLECTION_NAME}' unavailable")
+    return _collection
+
+
+def _as_query_vec(vec) -> np.ndarray:
+    """float32 连续数组 (Milvus / 本地索引都直接吃 ndarray，省掉 tolist 的装箱)；只读，缓存里可安全共享"""
+    arr = np.ascontiguousarray(vec, dtype=np.float32)
+    arr.setflags(write=False)
+    return arr
+
+
 # 辅助函数：在线程池中运行 Embedding (CPU密集)
 def _run_embedding(model, text):
-    return model.encode([text], normalize_embeddings=True)[0].tolist()
+    return _as_query_vec(model.encode([text], normalize_embeddings=True)[0])
+
+
+async def _embed_query(loop, model, query: str) -> np.ndarray:
+    """带缓存的 Query Embedding：命中直接返回，未命中才进推理线程池 (key 保留大小写，与分词器一致)"""
+    key = normalize_text(query)
+    cached = _embed_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if settings.EMBED_BATCH_ENABLED:
+        query_vec = await _embed_batcher.submit(query)
+    else:
+        query_vec = await loop.run_in_executor(_embed_executor, _run_embedding, model, query)
+    _embed_cache.set(key, query_vec)
+    return query_vec
+
+
+async def embed_query(query: str) -> np.ndarray:
+    """对外的 Query Embedding (L2 归一化，共享 embedding 缓存与微批)，供答案缓存等上层模块复用"""
+    return await _embed_query(asyncio.get_running_loop(), get_embed_model(), query)
+
+
+def _result_cache_key(query: str, top_k_recall: int, top_k_rerank: int, top_k_final: int, *extra) -> tuple:
+    """结果缓存 key；发现 catalog 版本变化时顺手清空旧条目"""
+    global _result_cache_version
+    version = get_catalog_version()
+    if version != _result_cache_version:
+        if _result_cache_version is not None:
+            _result_cache.clear()
+        _result_cache_version = version
+    return (version, normalize_query(query), top_k_recall, top_k_rerank, top_k_final, *extra)
+
+
+async def _embed_queries(loop, queries: List[str]) -> List[np.ndarray]:
+    """多个 query 一次 batch encode (缓存命中的跳过)，用于多路召回"""
+    keys = [normalize_text(q) for q in queries]
+    vecs = [_embed_cache.get(k) for k in keys]
+    missing = [q for q, v in zip(queries, vecs) if v is None]
+    if missing:
+        fresh = await loop.run_in_executor(_embed_executor, _run_embedding_batch, missing)
+        by_text = dict(zip(missing, fresh))
+        for i, q in enumerate(queries):
+            if vecs[i] is None:
+                vecs[i] = by_text[q]
+                _embed_cache.set(keys[i], vecs[i])
+    return vecs
+
+
+def _run_embedding_batch(texts: List[str]) -> List[np.ndarray]:
+    """微批版 Embedding：同一批内重复的 query 只算一次"""
+    unique = list(dict.fromkeys(texts))
+    vecs = get_embed_model().encode(unique, normalize_embeddings=True, batch_size=len(unique))
+    by_text = {t: _as_query_vec(vecs[i]) for i, t in enumerate(unique)}
+    return [by_text[t] for t in texts]
+
+
+_embed_batcher = MicroBatcher(
+    _run_embedding_batch,
+    executor=_embed_executor,
+    max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=settings.EMBED_BATCH_WINDOW_MS,
+    name="embed_batcher",
+)
 
 
 # 辅助函数：在线程池中运行 Rerank (CPU密集)
-def _run_rerank(model, pairs):
+# items: [(query, full_name, card_text), ...]
+def _run_rerank(model, items: List[RerankItem]):
+    if settings.RERANK_PRETOKENIZE_ENABLED:
+        try:
+            # doc 侧复用启动时预分词的 token ids，只对 query 分词
+            return predict_pretokenized(model, items)
+        except Exception as e:
+            logger.warning(f"⚠️ [Rerank] Pre-tokenized path failed: {e}. Fallback to predict().")
+    pairs = [[q[:256], text[:512]] for q, _, text in items]
     return model.predict(pairs, batch_size=32, show_progress_bar=False)
 
 
-# 🔥 Async Wrapper for External Calls
-async def retrieve_tables(query: str, topk: int = 5, trace_id: str = "N/A") -> List[Dict[str, Any]]:
-    # 1. 硬规则过滤
-    for kw in SENSITIVE_KEYWORDS:
-        if kw in query:
-            logger.warning(f"🛑 [Security] Query contains sensitive keyword '{kw}'. Blocked.",
-                           extra={"trace_id": trace_id})
-            return []
+def _run_rerank_batch(item_groups: List[List[RerankItem]]) -> List[List[float]]:
+    """跨请求合批 Rerank：多个请求的 pair 拼成一次 predict，再按请求切回"""
+    flat = [it for group in item_groups for it in group]
+    scores = _run_rerank(get_rerank_model(), flat)
+    results, offset = [], 0
+    for group in item_groups:
+        results.append([float(x) for x in scores[offset: offset + len(group)]])
+        offset += len(group)
+    return results
 
-    # 调用异步的高级检索
-    return await retrieve_tables_advanced(
-        query=query,
-        top_k_recall=max(topk * 10, 50),
-        top_k_rerank=DEFAULT_TOP_K_RERANK,
-        top_k_final=topk,
-        trace_id=trace_id
+
+_rerank_batcher = MicroBatcher(
+    _run_rerank_batch,
+    executor=_rerank_executor,
+    max_batch_size=settings.RERANK_BATCH_MAX_PAIRS,
+    max_wait_ms=settings.RERANK_BATCH_WINDOW_MS,
+    item_size=len,
+    name="rerank_batcher",
+)
+
+
+async def _rerank_items(loop, model, items: List[RerankItem]) -> List[float]:
+    if settings.RERANK_BATCH_ENABLED:
+        return await _rerank_batcher.submit(items)
+    return await loop.run_in_executor(_rerank_executor, _run_rerank, model, items)
+
+
+def _search_milvus(query_vecs, limit: int, scope: Optional[RetrievalScope] = None) -> List[List[Dict[str, Any]]]:
+    """一次 search 可带多个向量 (data=[v1, v2, ...])，按输入顺序返回每个向量的命中"""
+    col = get_collection()
+    search_params = {"metric_type": "IP", "params": {"nprobe": 10}}
+    res = col.search(
+        data=list(query_vecs),
+        anns_field="embedding",
+        param=search_params,
+        limit=limit,
+        # 权限范围下推：在 ANN 检索内部过滤，TopK 名额只留给可见的表
+        expr=scope.to_milvus_expr() if scope is not None else None,
+        # 两阶段召回：第一阶段只要表名，text (最长 8KB) 只给 Rerank 池单独取
+        output_fields=["db", "logical_table"],
     )
 
+    return [
+        [
+            {
+                "score": float(hit.score),
+                "db": hit.entity.get("db"),
+                "logical_table": hit.entity.get("logical_table"),
+            }
+            for hit in hits
+        ]
+        for hits in res
+    ]
 
-# 🔥 Core Async Retrieval Logic
-async def retrieve_tables_advanced(
-        query: str,
-        top_k_recall: int = DEFAULT_TOP_K_RECALL,
-        top_k_rerank: int = DEFAULT_TOP_K_RERANK,
-        top_k_final: int = DEFAULT_TOP_K_FINAL,
-        trace_id: str = "N/A"
-) -> List[Dict[str, Any]]:
-    if not query:
-        return []
 
-    # Milvus 连接检查 (这一步很快，可以同步)
-    if not ensure_milvus_connection():
-        return []
+def _query_milvus_texts(full_names: List[str]) -> Dict[str, str]:
+    """按主键批量取 text (两阶段召回的第二阶段，card store 未命中时才走)"""
+    rows = get_collection().query(
+        expr=f"full_name in {json.dumps(full_names, ensure_ascii=False)}",
+        output_fields=["full_name", "text"],
+    )
+    return {r["full_name"]: r.get("text") or "" for r in rows}
 
-    t0 = time.perf_counter()
-    logger.info(f"🔍 [Retrieve] Start searching for: '{query}'", extra={"trace_id": trace_id})
 
-    # -------- 1) Recall (Milvus) --------
-    try:
-        loop = asyncio.get_running_loop()
-        col = Collection(COLLECTION_NAME)
-        model = get_embed_model()
+# 正在线程里重建的 catalog 单例 (getter -> Future)，同一次重建由并发请求共享
+_catalog_rebuilds: Dict[Callable[[], Any], asyncio.Future] = {}
+
+
+async def _catalog_singleton(loop, is_current: Callable[[], bool], getter: Callable[[], Any]) -> Any:
+    """
+    依赖 catalog 版本的进程内单例 (本地向量索引 / 卡片正文 / 词法 / BM25 索引)：版本没变时 getter 是无锁快路径，直接调用；
+    ETL 重跑后的第一次获取要重建 (mmap + sha256 校验 / 解析 jsonl)，放到 I/O 线程，不卡住事件循环上的其它请求
+    """
+    if is_current():
+        return getter()
+    fut = _catalog_rebuilds.get(getter)
+    if fut is None:
+        fut = loop.run_in_executor(_milvus_executor, getter)
+        _catalog_rebuilds[getter] = fut
+        fut.add_done_callback(lambda _f: _catalog_rebuilds.pop(getter, None))
+    # shield：某个请求被取消不影响共享同一次重建的其它请求
+    return await asyncio.shield(fut)
 
-        # 🔥 异步执行 Embedding
-        embed_t0 = time.perf_counter()
-        query_vec = await loop.run_in_executor(_executor, _run_embedding, model, query)
 
-        # Milvus 搜索
-        search_params = {"metric_type": "IP", "params": {"nprobe": 10}}
+async def _fill_texts(loop, candidates: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    给真正要 Rerank / 返回的候选补上 text：进程内 card store 优先，缺的再按主键回后端取 (Milvus / 本地索引)
+    返回各来源补了多少条，写进 stats
+    """
+    remote_source = "local" if RETRIEVAL_BACKEND == "local" else "milvus"
+    # 本地后端召回带的行号只在这里用，不往外透出
+    rows = {c["full_name"]: c.pop("row") for c in candidates if "row" in c}
+    missing = [c for c in candidates if "text" not in c]
+    if not missing:
+        return {"store": 0, remote_source: 0}
 
-        def _search_milvus():
-            return col.search(
-                data=[query_vec],
-                anns_field="embedding",
-                param=search_params,
-                limit=top_k_recall,
-                output_fields=["db", "logical_table", "text"],
-            )
+    texts = await _catalog_singleton(loop, card_texts_current, get_card_texts)
+    remote = []
+    for c in missing:
+        text = texts.get(c["full_name"])
+        if text is None:
+            remote.append(c)
+        else:
+            c["text"] = text
 
-        res = await loop.run_in_executor(_executor, _search_milvus)
+    if remote and RETRIEVAL_BACKEND != "local":
+        fetched = await loop.run_in_executor(_milvus_executor, _query_milvus_texts, [c["full_name"] for c in remote])
+        for c in remote:
+            c["text"] = fetched.get(c["full_name"], "")
+    elif remote:
+        # 本地后端：按召回时的行号从 mmap 的 cards.jsonl 里切正文；索引已换代 (行号对不上) 的留空
+        index = await _catalog_singleton(loop, local_index_current, get_local_index)
+        for c in remote:
+            row = rows.get(c["full_name"])
+            ok = row is not None and row < len(index) and index.cards[row]["full_name"] == c["full_name"]
+            c["text"] = index.text(row) if ok else ""
+    return {"store": len(missing) - len(remote), remote_source: len(remote)}
 
+
+def _search_local(index, query_vecs, limit: int,
+                  scope: Optional[RetrievalScope] = None) -> List[List[Dict[str, Any]]]:
+    return [
+        [
+            {
+                "score": h["score"],
+                "db": h.get("db"),
+                "logical_table": h.get("logical_table"),
+                "row": h["row"],
+            }
+            for h in hits
+        ]
+        for hits in index.search_many(query_vecs, limit, scope=scope)
+    ]
+
+
+async def _recall_many(loop, query_vecs, limit: int,
+                       scope: Optional[RetrievalScope] = None) -> List[List[Dict[str, Any]]]:
+    """按配置选择召回后端 (多个向量一次往返)，每个向量的结果各自按 full_name 去重"""
+    if RETRIEVAL_BACKEND == "local":
+        # 矩阵乘法是亚毫秒级，直接在事件循环里跑，不占推理线程；索引换代时的重新加载在 I/O 线程里做
+        index = await _catalog_singleton(loop, local_index_current, get_local_index)
+        hits_per_query = _search_local(index, query_vecs, limit, scope)
+    else:
+        hits_per_query = await loop.run_in_executor(_milvus_executor, _search_milvus, query_vecs, limit, scope)
+
+    results = []
+    for hits in hits_per_query:
         candidates: List[Dict[str, Any]] = []
         seen = set()
+        for h in hits:
+            full_name = f"{h['db']}.{h['logical_table']}"
+            if full_name in seen:
+                continue
+            seen.add(full_name)
+            candidates.append({**h, "full_name": full_name})
+        results.append(candidates)
+    return results
 
-        for hits in res:
-            for hit in hits:
-                entity = hit.entity
-                full_name = f"{entity.get('db')}.{entity.get('logical_table')}"
-                if full_name in seen:
-                    continue
-                seen.add(full_name)
-                candidates.append(
-                    {
-                        "score": float(hit.score),
-                        "db": entity.get("db"),
-                        "logical_table": entity.get("logical_table"),
-                        "full_name": full_name,
-                        "text": entity.get("text") or "",
-                    }
-                )
 
-        if not candidates:
-            logger.info("✅ [Retrieve] No candidates from Milvus.", extra={"trace_id": trace_id})
-            return []
+async def _recall(loop, query_vec, limit: int, scope: Optional[RetrievalScope] = None) -> List[Dict[str, Any]]:
+    return (await _recall_many(loop, [query_vec], limit, scope))[0]
 
-        candidates.sort(key=lambda x: x["score"], reverse=True)
 
-    except Exception as e:
-        logger.error(f"❌ Milvus Search Failed: {e}", exc_info=True, extra={"trace_id": trace_id})
-        return []
+async def _hybrid_fuse(loop, query: str, candidates: List[Dict[str, Any]],
+                       scope: Optional[RetrievalScope] = None) -> List[Dict[str, Any]]:
+    """
+    BM25 + 向量 RRF 融合
+    精确表名 (t_pay_flow) / 中文同义词 (购物车) 这类字面命中，向量召回经常排不上来，
+    BM25 正好补上；融合后按 rrf_score 排序，Rerank 池从融合结果里取
+    """
+    index = await _catalog_singleton(loop, bm25_index_current, get_bm25_index)
+    bm25_hits = index.search(query, settings.HYBRID_BM25_TOP_K, scope=scope)
+    if not bm25_hits:
+        return candidates
+    return _rrf_merge([candidates], [bm25_hits])
+
+
+def _rrf_merge(vector_lists: List[List[Dict[str, Any]]],
+               bm25_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    多路召回结果按 full_name 合并 + RRF 打分
+    同一张表在多路里出现时：向量分 / BM25 分各取最大值，RRF 分累加
+    """
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for hits in vector_lists:
+        for c in hits:
+            cur = by_name.get(c["full_name"])
+            if cur is None:
+                by_name[c["full_name"]] = c
+            elif c["score"] > cur["score"]:
+                cur["score"] = c["score"]
+
+    for hits in bm25_lists:
+        for h in hits:
+            c = by_name.get(h["full_name"])
+            if c is None:
+                # 仅被 BM25 召回的表：向量分未知，记 0
+                c = {
+                    "score": 0.0,
+                    "db": h["db"],
+                    "logical_table": h["logical_table"],
+                    "full_name": h["full_name"],
+                    "text": h.get("text") or "",
+                }
+                by_name[h["full_name"]] = c
+            c["bm25_score"] = max(c.get("bm25_score", 0.0), h["bm25_score"])
+
+    fused = rrf_fuse([[c["full_name"] for c in hits] for hits in vector_lists + bm25_lists])
+    for name, c in by_name.items():
+        c["rrf_score"] = fused.get(name, 0.0)
+
+    return sorted(by_name.values(), key=lambda x: x["rrf_score"], reverse=True)
+
+
+def _plan_rerank(
+        candidates: List[Dict[str, Any]],
+        top_k_rerank: int,
+        top_k_final: int,
+        elapsed_ms: float,
+        budget_ms: float,
+) -> tuple[str, int]:
+    """
+    级联 Rerank 决策，返回 (path, rerank 池大小)
+    - skip_margin: 向量 top1 本身足够高 (RERANK_SKIP_MIN_SCORE)，且与第二名的分差足够大 -> 胜负已分，不跑 CrossEncoder；
+                   top1 不够高时照常 Rerank，让 RERANK_THRESHOLD 截掉不相关的问题
+    - skip_budget: 剩余预算连 top_k_final 个 pair 都不够 -> 直接用召回顺序
+    - shrunk:      去掉与 top1 差距过大的尾部候选 / 按剩余预算裁剪池子
+    - full:        正常 Rerank top_k_rerank 个
+    BM25 字面命中的候选 (带 bm25_score) 不参与按向量分裁剪
+    """
+    full_size = max(1, min(top_k_rerank, len(candidates)))
+    k = max(1, min(top_k_final, len(candidates)))
+
+    top1 = candidates[0]["score"]
+    if len(candidates) > 1 and top1 >= settings.RERANK_SKIP_MIN_SCORE:
+        runner_up = max(c["score"] for c in candidates[1:])
+        # 融合后的第一名必须同时是向量第一名，分差才有意义
+        if top1 - runner_up >= settings.RERANK_SKIP_MARGIN:
+            return "skip_margin", 0
+
+    pool_size = full_size
+    for i in range(full_size - 1, k - 1, -1):
+        c = candidates[i]
+        if "bm25_score" in c or top1 - c["score"] <= settings.RERANK_POOL_MARGIN:
+            break
+        pool_size = i
+
+    if budget_ms > 0:
+        affordable = int((budget_ms - elapsed_ms) / max(_rerank_ms_per_pair, 1e-3))
+        if affordable < k:
+            return "skip_budget", 0
+        pool_size = min(pool_size, affordable)
+
+    return ("shrunk" if pool_size < full_size else "full"), pool_size
+
 
-    # -------- 2) Rerank --------
+def _ms_since(t: float) -> float:
+    return round((time.perf_counter() - t) * 1000.0, 2)
+
+
+async def _ensure_backend_ready() -> bool:
+    """Milvus 连接检查：句柄就绪后是无锁快路径；首次连接 + load 放到 I/O 线程，不阻塞事件循环 (local 后端不依赖 Milvus)"""
+    if RETRIEVAL_BACKEND == "local" or _collection is not None:
+        return True
+    return await asyncio.get_running_loop().run_in_executor(_milvus_executor, ensure_milvus_connection)
+
+
+async def _rerank_and_finalize(
+        loop,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_k_rerank: int,
+        top_k_final: int,
+        use_cascade: bool,
+        budget_ms: float,
+        t0: float,
+        cache_key: tuple,
+        trace_id: str,
+        stats: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """召回之后的公共阶段：(级联) Rerank -> 阈值截断 -> 审计 -> 写结果缓存"""
+    global _rerank_ms_per_pair
+    timings = stats.setdefault("timings_ms", {})
+
+    # -------- 2) Rerank (可级联) --------
     reranker = get_rerank_model()
     candidates_final = candidates
+    cacheable = True
 
-    if reranker is not None:
-        rerank_pool = candidates[: max(1, min(top_k_rerank, len(candidates)))]
+    if reranker is None:
+        rerank_path = "no_reranker"
+        pool_size = 0
+    elif use_cascade:
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        rerank_path, pool_size = _plan_rerank(candidates, top_k_rerank, top_k_final, elapsed_ms, budget_ms)
+        # skip_budget 取决于这一次请求前面有多慢，只是临时降级，不能占着缓存拖累后续同样的问题
+        cacheable = rerank_path != "skip_budget"
+    else:
+        rerank_path = "full"
+        pool_size = max(1, min(top_k_rerank, len(candidates)))
+
+    # 两阶段召回：只给 Rerank 池 + 最终返回的候选取 text
+    try:
+        stage_t0 = time.perf_counter()
+        stats["text_fetch"] = await _fill_texts(loop, candidates[:max(pool_size, top_k_final)])
+        timings["text_fetch"] = _ms_since(stage_t0)
+    except Exception as e:
+        logger.error(f"❌ Card text fetch failed: {e}", exc_info=True, extra={"trace_id": trace_id})
+        return []
+
+    if pool_size > 0:
+        rerank_pool = candidates[:pool_size]
         try:
             rerank_t0 = time.perf_counter()
-            pairs = [[query[:256], c["text"][:512]] for c in rerank_pool]
+            items = [(query, c["full_name"], c["text"]) for c in rerank_pool]
 
             # 🔥 异步执行 Rerank 推理
-            scores = await loop.run_in_executor(_executor, _run_rerank, reranker, pairs)
+            scores = await _rerank_items(loop, reranker, items)
+            timings["rerank"] = _ms_since(rerank_t0)
+            per_pair = timings["rerank"] / len(items)
+            _rerank_ms_per_pair = 0.8 * _rerank_ms_per_pair + 0.2 * per_pair
 
             for i, c in enumerate(rerank_pool):
                 c["rerank_score"] = float(scores[i])
@@ -224,6 +611,11 @@ async def retrieve_tables_advanced(
             if top1 < RERANK_THRESHOLD:
                 logger.info(f"🛑 [Retrieve] Cutoff: top1 {top1:.3f} < threshold {RERANK_THRESHOLD}. Return [].",
                             extra={"trace_id": trace_id})
+                _rerank_path_counter[rerank_path] += 1
+                stats.update({"rerank_path": rerank_path, "rerank_pool": pool_size})
+                timings["total"] = _ms_since(t0)
+                # 负缓存：同一个无关问题不再重复付出 embedding + 搜索 + rerank 的代价
+                _result_cache.set(cache_key, [], ttl_s=settings.RESULT_CACHE_NEGATIVE_TTL_S)
                 return []
 
             candidates_final = rerank_pool
@@ -231,10 +623,19 @@ async def retrieve_tables_advanced(
         except Exception as e:
             logger.error(f"⚠️ [Rerank Failed] {e}. Fallback to vector score.", exc_info=True,
                          extra={"trace_id": trace_id})
+            # 降级结果不进缓存，避免一次抖动污染后续请求
+            cacheable = False
+            rerank_path = "rerank_failed"
+
+    _rerank_path_counter[rerank_path] += 1
+    stats.update({"rerank_path": rerank_path, "rerank_pool": pool_size})
+    if rerank_path.startswith("skip"):
+        logger.info(f"⏭️ [Retrieve] Rerank skipped ({rerank_path}).", extra={"trace_id": trace_id})
 
     # -------- 4) Final output --------
     final_results = candidates_final[: max(0, min(top_k_final, len(candidates_final)))]
     total_ms = (time.perf_counter() - t0) * 1000.0
+    timings["total"] = round(total_ms, 2)
 
     # 1. 提取表名列表 (方便查看)
     table_names = [t["logical_table"] for t in final_results]
@@ -254,14 +655,373 @@ async def retrieve_tables_advanced(
             "truncated": False,
             "error": None,
             "result_summary": table_names,
+            "rerank_path": rerank_path,
             "ts_iso": datetime.datetime.utcnow().isoformat(),
         })
     except Exception:
         pass
 
+    if cacheable:
+        _result_cache.set(cache_key, [dict(c) for c in final_results])
     return final_results
 
 
+async def _lexical_fast_path(query: str, scope: Optional[RetrievalScope], trace_id: str,
+                             stats: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """问题就是某张表的表名 / 分表名 / 同义词且唯一命中：直接返回，不做任何模型推理"""
+    if not settings.LEXICAL_FAST_PATH_ENABLED:
+        return None
+    try:
+        index = await _catalog_singleton(asyncio.get_running_loop(), lexical_index_current, get_lexical_index)
+        status, card = index.lookup(query, scope)
+    except Exception as e:
+        logger.warning(f"⚠️ [Lexical] Fast path skipped: {e}", extra={"trace_id": trace_id})
+        return None
+    stats["lexical"] = status
+    if status != LEXICAL_HIT:
+        return None
+
+    stats["path"] = "lexical"
+    _rerank_path_counter["lexical"] += 1
+    logger.info(f"⚡ [Retrieve] Lexical hit for: '{query}' -> {card['logical_table']}", extra={"trace_id": trace_id})
+
+    # 与模型路径一样留一条 RETRIEVE 审计
+    try:
+        append_event({
+            "trace_id": trace_id,
+            "user_id": "system_retriever",
+            "route": "RETRIEVE",
+            "sql": query,
+            "latency_ms": 0,
+            "truncated": False,
+            "error": None,
+            "result_summary": [card["logical_table"]],
+            "rerank_path": "lexical",
+            "ts_iso": datetime.datetime.utcnow().isoformat(),
+        })
+    except Exception:
+        pass
+    return [lexical_result(card)]
+
+
+def _blocked_keyword(query: str, trace_id: str, stats: Optional[Dict[str, Any]]) -> Optional[str]:
+    kw = sensitive_terms.find_first(query)
+    if kw:
+        logger.warning(f"🛑 [Security] Query contains sensitive keyword '{kw}'. Blocked.",
+                       extra={"trace_id": trace_id})
+        if stats is not None:
+            stats["blocked"] = kw
+    return kw
+
+
+# 🔥 Async Wrapper for External Calls
+async def retrieve_tables(query: str, topk: int = 5, trace_id: str = "N/A",
+                          hybrid: Optional[bool] = None,
+                          scope: Optional[RetrievalScope] = None,
+                          stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    # 1. 硬规则过滤
+    if _blocked_keyword(query, trace_id, stats):
+        return []
+
+    # 调用异步的高级检索
+    return await retrieve_tables_advanced(
+        query=query,
+        top_k_recall=max(topk * 10, 50),
+        top_k_rerank=DEFAULT_TOP_K_RERANK,
+        top_k_final=topk,
+        trace_id=trace_id,
+        hybrid=hybrid,
+        scope=scope,
+        stats=stats
+    )
+
+
+# 🔥 Core Async Retrieval Logic
+async def retrieve_tables_advanced(
+        query: str,
+        top_k_recall: int = DEFAULT_TOP_K_RECALL,
+        top_k_rerank: int = DEFAULT_TOP_K_RERANK,
+        top_k_final: int = DEFAULT_TOP_K_FINAL,
+        trace_id: str = "N/A",
+        hybrid: Optional[bool] = None,
+        cascade: Optional[bool] = None,
+        latency_budget_ms: Optional[float] = None,
+        scope: Optional[RetrievalScope] = None,
+        stats: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    hybrid / cascade 为 None 时跟随 settings；latency_budget_ms 为 None 时用 RERANK_LATENCY_BUDGET_MS
+    scope: 用户可见的 domain / 风险等级范围，下推为 Milvus expr (None 表示不限)
+    stats: 调用方传入一个 dict，会被填上本次走的路径 (path: lexical / cache / model，以及 rerank_path 等)
+    """
+    stats = stats if stats is not None else {}
+    if not query:
+        return []
+
+    use_hybrid = settings.HYBRID_ENABLED if hybrid is None else hybrid
+    use_cascade = settings.RERANK_CASCADE_ENABLED if cascade is None else cascade
+    budget_ms = settings.RERANK_LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+
+    if scope is not None:
+        stats["scope"] = scope.to_milvus_expr()
+        if scope.is_empty:
+            logger.info("🛑 [Retrieve] Empty scope, nothing visible.", extra={"trace_id": trace_id})
+            return []
+
+    lexical = await _lexical_fast_path(query, scope, trace_id, stats)
+    if lexical is not None:
+        return lexical
+
+    # 结果缓存 (放在连接检查之前：命中时 Milvus 抖动也不影响)；不同 scope 的结果互不复用
+    # cascade / 预算也进 key：级联跳过 Rerank 的结果不能给要求完整 Rerank 的调用方
+    cache_key = _result_cache_key(query, top_k_recall, top_k_rerank, top_k_final, use_hybrid,
+                                  scope.cache_key() if scope is not None else None, use_cascade, budget_ms)
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"⚡ [Retrieve] Cache hit for: '{query}' ({len(cached)} tables)", extra={"trace_id": trace_id})
+        stats["cache_hit"] = True
+        stats["path"] = "cache"
+        return [dict(c) for c in cached]
+    stats["cache_hit"] = False
+
+    if not await _ensure_backend_ready():
+        return []
+
+    t0 = time.perf_counter()
+    stats["path"] = "model"
+    logger.info(f"🔍 [Retrieve] Start searching for: '{query}'", extra={"trace_id": trace_id})
+    # 分阶段耗时 (ms)：embed / search / fuse / text_fetch / rerank / total
+    timings = stats["timings_ms"] = {}
+
+    # -------- 1) Recall (Milvus / Local) --------
+    try:
+        loop = asyncio.get_running_loop()
+        model = get_embed_model()
+
+        # 🔥 异步执行 Embedding
+        stage_t0 = time.perf_counter()
+        query_vec = await _embed_query(loop, model, query)
+        timings["embed"] = _ms_since(stage_t0)
+
+        stage_t0 = time.perf_counter()
+        candidates = await _recall(loop, query_vec, top_k_recall, scope)
+        candidates.sort(key=lambda x: x["score"], reverse=True)
+        timings["search"] = _ms_since(stage_t0)
+
+        # 混合召回：BM25 字面命中 + RRF 融合
+        if use_hybrid:
+            try:
+                stage_t0 = time.perf_counter()
+                candidates = await _hybrid_fuse(loop, query, candidates, scope)
+                timings["fuse"] = _ms_since(stage_t0)
+            except Exception as e:
+                logger.warning(f"⚠️ [Hybrid] BM25 fuse skipped: {e}", extra={"trace_id": trace_id})
+
+        if not candidates:
+            logger.info(f"✅ [Retrieve] No candidates from {RETRIEVAL_BACKEND}.", extra={"trace_id": trace_id})
+            return []
+
+    except Exception as e:
+        logger.error(f"❌ Recall ({RETRIEVAL_BACKEND}) Failed: {e}", exc_info=True, extra={"trace_id": trace_id})
+        return []
+
+    return await _rerank_and_finalize(
+        loop, query, candidates, top_k_rerank, top_k_final, use_cascade, budget_ms, t0, cache_key, trace_id, stats
+    )
+
+
+async def retrieve_tables_multi(
+        queries: List[str],
+        top_k_recall: int = DEFAULT_TOP_K_RECALL,
+        top_k_rerank: int = DEFAULT_TOP_K_RERANK,
+        top_k_final: int = DEFAULT_TOP_K_FINAL,
+        trace_id: str = "N/A",
+        rerank_query: Optional[str] = None,
+        hybrid: Optional[bool] = None,
+        scope: Optional[RetrievalScope] = None,
+        stats: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    多路召回 (rewrite / repair 的多个关键词变体)：
+    一次 batch embedding + 一次多向量 search -> 按 full_name 合并去重 (RRF) -> 整体只 Rerank 一次
+    rerank_query: Rerank 时与候选配对的文本，默认取第一个 query
+    """
+    stats = stats if stats is not None else {}
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return []
+    rerank_query = rerank_query or queries[0]
+    if len(queries) == 1 and rerank_query == queries[0]:
+        return await retrieve_tables_advanced(queries[0], top_k_recall, top_k_rerank, top_k_final, trace_id,
+                                              hybrid=hybrid, scope=scope, stats=stats)
+
+    use_hybrid = settings.HYBRID_ENABLED if hybrid is None else hybrid
+    stats["queries"] = len(queries)
+    if scope is not None:
+        stats["scope"] = scope.to_milvus_expr()
+        if scope.is_empty:
+            return []
+
+    cache_key = _result_cache_key("\n".join(queries), top_k_recall, top_k_rerank, top_k_final, use_hybrid,
+                                  scope.cache_key() if scope is not None else None, "multi", rerank_query)
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        stats["cache_hit"] = True
+        stats["path"] = "cache"
+        return [dict(c) for c in cached]
+    stats["cache_hit"] = False
+
+    if not await _ensure_backend_ready():
+        return []
+
+    t0 = time.perf_counter()
+    stats["path"] = "model"
+    logger.info(f"🔍 [Retrieve] Multi-query search ({len(queries)}): {queries}", extra={"trace_id": trace_id})
+
+    timings = stats["timings_ms"] = {}
+
+    try:
+        loop = asyncio.get_running_loop()
+        stage_t0 = time.perf_counter()
+        query_vecs = await _embed_queries(loop, queries)
+        timings["embed"] = _ms_since(stage_t0)
+
+        stage_t0 = time.perf_counter()
+        vector_lists = await _recall_many(loop, query_vecs, top_k_recall, scope)
+        timings["search"] = _ms_since(stage_t0)
+
+        stage_t0 = time.perf_counter()
+        bm25_lists: List[List[Dict[str, Any]]] = []
+        if use_hybrid:
+            try:
+                index = await _catalog_singleton(loop, bm25_index_current, get_bm25_index)
+                bm25_lists = [index.search(q, settings.HYBRID_BM25_TOP_K, scope=scope) for q in queries]
+            except Exception as e:
+                logger.warning(f"⚠️ [Hybrid] BM25 fuse skipped: {e}", extra={"trace_id": trace_id})
+
+        candidates = _rrf_merge(vector_lists, bm25_lists)
+        timings["fuse"] = _ms_since(stage_t0)
+        if not candidates:
+            logger.info(f"✅ [Retrieve] No candidates from {RETRIEVAL_BACKEND}.", extra={"trace_id": trace_id})
+            return []
+
+    except Exception as e:
+        logger.error(f"❌ Multi Recall ({RETRIEVAL_BACKEND}) Failed: {e}", exc_info=True,
+                     extra={"trace_id": trace_id})
+        return []
+
+    # 多路合并后的向量分来自不同 query，互相不可比，不做级联裁剪
+    return await _rerank_and_finalize(
+        loop, rerank_query, candidates, top_k_rerank, top_k_final, False, 0.0, t0, cache_key, trace_id, stats
+    )
+
+
+def _mark_failed(pending: List[tuple[int, tuple]], stats_list: List[Dict[str, Any]], path: str, error: str) -> None:
+    for i, _ in pending:
+        stats_list[i].update({"path": path, "error": error})
+
+
+async def retrieve_tables_batch(
+        queries: List[str],
+        topk: int = 5,
+        trace_id: str = "N/A",
+        hybrid: Optional[bool] = None,
+        scope: Optional[RetrievalScope] = None,
+) -> tuple[List[List[Dict[str, Any]]], List[Dict[str, Any]], Dict[str, float]]:
+    """
+    批量检索 (离线评测 / 批处理工具)：语义与逐个调用 retrieve_tables 相同，但
+    - 未命中缓存的 query 一次 batch embedding + 一次多向量 search
+    - 各 query 的 Rerank 并发提交，由 Rerank 微批合并成少数几次 predict
+    返回 (每个 query 的结果, 每个 query 的 stats (timings_ms 只含该 query 自己的阶段), 批级别共享阶段耗时)
+    """
+    top_k_recall, top_k_final = max(topk * 10, 50), topk
+    use_hybrid = settings.HYBRID_ENABLED if hybrid is None else hybrid
+    results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    stats_list: List[Dict[str, Any]] = [{} for _ in queries]
+    batch_timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+
+    # 1) 硬规则过滤 + 字面快路径 + 结果缓存，剩下的才走模型
+    pending: List[tuple[int, tuple]] = []
+    for i, query in enumerate(queries):
+        stats = stats_list[i]
+        if not query or _blocked_keyword(query, trace_id, stats):
+            continue
+        if scope is not None:
+            stats["scope"] = scope.to_milvus_expr()
+            if scope.is_empty:
+                continue
+        lexical = await _lexical_fast_path(query, scope, trace_id, stats)
+        if lexical is not None:
+            results[i] = lexical
+            continue
+        cache_key = _result_cache_key(query, top_k_recall, DEFAULT_TOP_K_RERANK, top_k_final, use_hybrid,
+                                      scope.cache_key() if scope is not None else None,
+                                      settings.RERANK_CASCADE_ENABLED, settings.RERANK_LATENCY_BUDGET_MS)
+        cached = _result_cache.get(cache_key)
+        stats["cache_hit"] = cached is not None
+        stats["path"] = "cache" if cached is not None else "model"
+        if cached is not None:
+            results[i] = [dict(c) for c in cached]
+        else:
+            pending.append((i, cache_key))
+
+    if not pending:
+        batch_timings["total"] = _ms_since(t0)
+        return results, stats_list, batch_timings
+    if not await _ensure_backend_ready():
+        # 与 "没有相关表" 的空结果区分开，评测 / 批处理调用方据此重试而不是记为未命中
+        _mark_failed(pending, stats_list, "unavailable", f"{RETRIEVAL_BACKEND} backend not ready")
+        batch_timings["total"] = _ms_since(t0)
+        return results, stats_list, batch_timings
+
+    # 2) 一次 batch embedding + 一次多向量 search
+    loop = asyncio.get_running_loop()
+    pending_queries = [queries[i] for i, _ in pending]
+    try:
+        stage_t0 = time.perf_counter()
+        query_vecs = await _embed_queries(loop, pending_queries)
+        batch_timings["embed"] = _ms_since(stage_t0)
+
+        stage_t0 = time.perf_counter()
+        vector_lists = await _recall_many(loop, query_vecs, top_k_recall, scope)
+        batch_timings["search"] = _ms_since(stage_t0)
+    except Exception as e:
+        logger.error(f"❌ Batch Recall ({RETRIEVAL_BACKEND}) Failed: {e}", exc_info=True,
+                     extra={"trace_id": trace_id})
+        _mark_failed(pending, stats_list, "error", f"batch recall failed: {e}")
+        batch_timings["total"] = _ms_since(t0)
+        return results, stats_list, batch_timings
+
+    # 3) 各 query 独立融合 + Rerank (并发提交，Rerank 微批负责合并)
+    async def _finish(i: int, cache_key: tuple, candidates: List[Dict[str, Any]]) -> None:
+        # 每个 query 从自己的融合阶段起算：共享的 embed / search 只记在 batch_timings，
+        # 否则级联预算会把整批的耗时算到每个 query 头上，批越大越容易误判 skip_budget
+        q_t0 = time.perf_counter()
+        query, stats = queries[i], stats_list[i]
+        timings = stats["timings_ms"] = {}
+        candidates.sort(key=lambda x: x["score"], reverse=True)
+        if use_hybrid:
+            try:
+                stage_t0 = time.perf_counter()
+                candidates = await _hybrid_fuse(loop, query, candidates, scope)
+                timings["fuse"] = _ms_since(stage_t0)
+            except Exception as e:
+                logger.warning(f"⚠️ [Hybrid] BM25 fuse skipped: {e}", extra={"trace_id": trace_id})
+        if not candidates:
+            return
+        results[i] = await _rerank_and_finalize(
+            loop, query, candidates, DEFAULT_TOP_K_RERANK, top_k_final,
+            settings.RERANK_CASCADE_ENABLED, settings.RERANK_LATENCY_BUDGET_MS, q_t0, cache_key, trace_id, stats
+        )
+
+    await asyncio.gather(*[
+        _finish(i, cache_key, candidates) for (i, cache_key), candidates in zip(pending, vector_lists)
+    ])
+    batch_timings["total"] = _ms_since(t0)
+    return results, stats_list, batch_timings
+
+
 # =========================
 # API Endpoints
 # =========================
@@ -269,13 +1029,71 @@ async def retrieve_tables_advanced(
 class RetrieveRequest(BaseModel):
     query: str
     top_k: int = 5
+    # 字段投影：只返回指定字段 (如 ["full_name", "rerank_score"])，不传则返回全部
+    fields: Optional[List[str]] = None
+    # 调用方的权限范围 (不传则不限)
+    allowed_domains: Optional[List[str]] = None
+    max_risk_level: Optional[Literal[RISK_LEVELS]] = None
+    table_types: Optional[List[str]] = None
 
 
 @router.post("/retrieve")
 async def api_retrieve_tables(req: RetrieveRequest):
-    results = await retrieve_tables(req.query, topk=req.top_k, trace_id="API_REQ")
+    stats: Dict[str, Any] = {}
+    scope = RetrievalScope.build(req.allowed_domains, req.max_risk_level, req.table_types)
+    results = await retrieve_tables(req.query, topk=req.top_k, trace_id="API_REQ", scope=scope, stats=stats)
+    if req.fields:
+        results = [{k: r[k] for k in req.fields if k in r} for r in results]
     return {
         "query": req.query,
         "count": len(results),
-        "results": results
+        "results": results,
+        "path": stats
+    }
+
+
+class RetrieveBatchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    allowed_domains: Optional[List[str]] = None
+    max_risk_level: Optional[Literal[RISK_LEVELS]] = None
+    table_types: Optional[List[str]] = None
+    fields: Optional[List[str]] = None
+
+
+@router.post("/retrieve/batch")
+async def api_retrieve_tables_batch(req: RetrieveBatchRequest):
+    """批量检索：一次请求最多 RETRIEVE_BATCH_MAX_QUERIES 个 query，共享一次 embedding + 一次多向量 search"""
+    if not req.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(req.queries) > settings.RETRIEVE_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400,
+                            detail=f"at most {settings.RETRIEVE_BATCH_MAX_QUERIES} queries per batch")
+
+    scope = RetrievalScope.build(req.allowed_domains, req.max_risk_level, req.table_types)
+    results, stats_list, timings = await retrieve_tables_batch(
+        req.queries, topk=req.top_k, trace_id="API_BATCH", scope=scope
+    )
+    items = []
+    for query, rows, stats in zip(req.queries, results, stats_list):
+        if req.fields:
+            rows = [{k: r[k] for k in req.fields if k in r} for r in rows]
+        items.append({"query": query, "count": len(rows), "results": rows, "path": stats})
+    return {"count": len(items), "timings_ms": timings, "items": items}
+
+
+@router.get("/retrieve/stats")
+async def api_retrieve_stats():
+    """缓存命中率 / 微批 / 级联 Rerank 路径 / 线程池排队监控"""
+    return {
+        "rerank_paths": dict(_rerank_path_counter),
+        "rerank_ms_per_pair": round(_rerank_ms_per_pair, 3),
+        "catalog_version": get_catalog_version(),
+        "embedding": _embed_cache.stats(),
+        "result": _result_cache.stats(),
+        "embed_batcher": _embed_batcher.stats(),
+        "rerank_batcher": _rerank_batcher.stats(),
+        "rerank_card_tokens": get_card_token_cache().stats(),
+        "pools": pool_stats(),
+        "sensitive_terms": sensitive_terms.stats(),
     }
\ No newline at end of file
@@ -1,7 +1,9 @@
+import asyncio
 import datetime
+import time
 import warnings
 import re
-from typing import Literal
+from typing import Any, Dict, List, Literal
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
 from langchain_core._api import LangChainBetaWarning
@@ -23,8 +25,10 @@ from app.core.prompts import (
 from app.core.state import AgentState, IntentOutput, SQLOutput, ErrorOutput, ReflectionOutput
 
 # Import Tools
-from app.api.v1.retrieve_tables import retrieve_tables_advanced
+from app.api.v1.retrieve_tables import embed_query, retrieve_tables_multi
+from app.core.executors import DB_IO_POOL, get_pool
 from app.modules.sql.executor import execute_sql_explain, append_event, get_tables_columns
+from app.modules.security.term_matcher import TermMatcher
 
 # ==========================================
 # LLM Initialization
@@ -63,6 +67,9 @@ def _extract_columns_from_ddl(text: str) -> list[str]:
     return columns
 
 
+_FORBIDDEN_JSON_OPS = TermMatcher(["json_extract", "json_unquote", "->", "->>"])
+
+
 def _lint_sql_columns(sql: str, table_columns: dict) -> str | None:
     """
     Defense Line 2: Static SQL Linting.
@@ -79,12 +86,11 @@ def _lint_sql_columns(sql: str, table_columns: dict) -> str | None:
     # 🔥🔥🔥 核心新增：JSON 关键词强力拦截 🔥🔥🔥
     # 只要 SQL 里出现了 JSON 解析函数，直接视为幻觉，强制拦截！
     # ============================================================
-    forbidden_keywords = ["json_extract", "json_unquote", "->", "->>"]
-    for kw in forbidden_keywords:
-        if kw in sql_lower:
-            logger.warning(f"🛑 [Lint] Detected Forbidden JSON Operation: '{kw}'. Blocking...")
-            # 返回一个特殊的标记，这会触发 generate_node 生成 ERR::NEED_SCHEMA_FIELD 报错
-            return f"FORBIDDEN_JSON_OP({kw})"
+    kw = _FORBIDDEN_JSON_OPS.find_first(sql_lower)
+    if kw:
+        logger.warning(f"🛑 [Lint] Detected Forbidden JSON Operation: '{kw}'. Blocking...")
+        # 返回一个特殊的标记，这会触发 generate_node 生成 ERR::NEED_SCHEMA_FIELD 报错
+        return f"FORBIDDEN_JSON_OP({kw})"
 
     # ============================================================
     # 以下是原有的白名单检查逻辑 (保持不变)
@@ -126,6 +132,34 @@ def _lint_sql_columns(sql: str, table_columns: dict) -> str | None:
     return None
 
 
+async def _run_db(fn, *args):
+    """同步的 pymysql 调用丢到 db_io 池，不阻塞事件循环"""
+    return await asyncio.get_running_loop().run_in_executor(get_pool(DB_IO_POOL), fn, *args)
+
+
+def _timed(name: str, fn):
+    """节点耗时埋点：返回值里追加一条 node_timings (AgentState 上的 reducer 负责累加)"""
+
+    async def _node(state: AgentState):
+        t0 = time.perf_counter()
+        out = dict(await fn(state) or {})
+        out["node_timings"] = out.get("node_timings", []) + [
+            {"node": name, "ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+        ]
+        return out
+
+    return _node
+
+
+def format_node_timings(timings: List[Dict[str, Any]]) -> str:
+    """一行的耗时报告：speculate.intent=812ms | speculate=1034ms | retrieve=95ms | ... | sum=..."""
+    if not timings:
+        return "no node timings"
+    parts = [f"{t['node']}={t['ms']:.0f}ms" + (" (cancelled)" if t.get("cancelled") else "") for t in timings]
+    total = sum(t["ms"] for t in timings if "." not in t["node"])
+    return " | ".join(parts) + f" | sum={total:.0f}ms"
+
+
 # ==========================================
 # Nodes
 # ==========================================
@@ -165,7 +199,15 @@ async def intent_node(state: AgentState):
     except:
         pass
 
-    # 3. 调用 LLM
+    # 3. 主图 Router 已高置信判定为数据查询：不再重复调用 LLM
+    routed_intent = state.get("routed_intent")
+    route_confidence = state.get("route_confidence") or 0.0
+    if routed_intent == "DATA_QUERY" and route_confidence >= settings.ROUTER_CONFIDENCE_THRESHOLD:
+        logger.info(f"⏭️ Intent taken from router: DATA_QUERY (confidence={route_confidence:.2f})",
+                    extra={"trace_id": trace_id})
+        return {"intent": "DATA_QUERY"}
+
+    # 4. 调用 LLM
     try:
         parser = JsonOutputParser(pydantic_object=IntentOutput)
         format_instructions = parser.get_format_instructions()
@@ -210,6 +252,65 @@ async def rewrite_node(state: AgentState):
     return {"search_query": rewritten_query}
 
 
+async def speculative_front_node(state: AgentState):
+    """
+    Step 0 (推测执行模式)：intent / rewrite / 原问题 embedding 三路并发
+    rewrite 的 prompt 不依赖 intent 结果，数据类问题上省掉一整个 LLM 往返；
+    原问题的向量提前写进 embedding 缓存，retrieve_node 对 [改写, 原问题] 批量编码时直接命中。
+    只预取 embedding、不跑检索 + Rerank：改写后 retrieve_node 的结果缓存 key 不同，
+    提前跑完整检索的 Rerank 结果用不上，还会和真实请求抢 Rerank 微批。
+    intent 一旦不是 DATA_QUERY，立刻取消另外两路并丢弃结果。
+    """
+    trace_id = state.get("trace_id", "N/A")
+    question = state["question"]
+    timings: List[Dict[str, Any]] = []
+
+    async def _track(name: str, coro):
+        t0 = time.perf_counter()
+        cancelled = False
+        try:
+            return await coro
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            entry = {"node": f"speculate.{name}", "ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+            if cancelled:
+                entry["cancelled"] = True
+            timings.append(entry)
+
+    intent_task = asyncio.create_task(_track("intent", intent_node(state)))
+    rewrite_task = asyncio.create_task(_track("rewrite", rewrite_node(state)))
+    embed_task = asyncio.create_task(_track("embed_raw", embed_query(question)))
+
+    async def _discard():
+        for task in (rewrite_task, embed_task):
+            task.cancel()
+        await asyncio.gather(rewrite_task, embed_task, return_exceptions=True)
+
+    try:
+        intent_out = await intent_task
+    except BaseException:
+        await _discard()
+        raise
+
+    if intent_out.get("intent") != "DATA_QUERY":
+        await _discard()
+        logger.info(f"✂️ [Speculative] Intent={intent_out.get('intent')}, discarded rewrite / embedding",
+                    extra={"trace_id": trace_id})
+        return {**intent_out, "node_timings": timings}
+
+    rewrite_out, embed_out = await asyncio.gather(rewrite_task, embed_task, return_exceptions=True)
+    if isinstance(rewrite_out, BaseException):
+        # 改写失败不致命：retrieve_node 会退回用原问题检索
+        logger.warning(f"⚠️ [Speculative] Rewrite failed: {rewrite_out}", extra={"trace_id": trace_id})
+        rewrite_out = {}
+    if isinstance(embed_out, BaseException):
+        logger.warning(f"⚠️ [Speculative] Raw embedding failed: {embed_out}", extra={"trace_id": trace_id})
+
+    return {**intent_out, **rewrite_out, "node_timings": timings}
+
+
 async def retrieve_node(state: AgentState):
     """Step 1: Retrieve Tables & Metadata"""
     trace_id = state.get("trace_id", "N/A")
@@ -220,7 +321,8 @@ async def retrieve_node(state: AgentState):
     logger.info(f"[Step 1] Retrieving Tables for: '{query_text}'", extra={"trace_id": trace_id})
 
     try:
-        candidate_tables = await retrieve_tables_advanced(query_text)
+        # 改写后的 query + 原问题一起召回 (一次 batch embedding + 一次多向量 search)，Rerank 以改写后的为准
+        candidate_tables = await retrieve_tables_multi([query_text, state["question"]], trace_id=trace_id)
     except Exception as e:
         logger.error(f"Retrieval failed: {e}")
         candidate_tables = []
@@ -228,7 +330,7 @@ async def retrieve_node(state: AgentState):
     table_names = [t.get('logical_table', t.get('table_name')) for t in candidate_tables]
 
     try:
-        table_columns_dict = get_tables_columns(table_names)
+        table_columns_dict = await _run_db(get_tables_columns, table_names)
     except Exception as e:
         logger.error(f"Metadata fetch failed: {e}")
         table_columns_dict = {}
@@ -483,7 +585,7 @@ async def validate_node(state: AgentState):
     trace_id = state.get("trace_id", "N/A")
     logger.info("[Step 3] Validating SQL", extra={"trace_id": trace_id})
     try:
-        execute_sql_explain(state["generated_sql"], trace_id=trace_id)
+        await _run_db(execute_sql_explain, state["generated_sql"], trace_id)
         return {"validation_error": None}
     except Exception as e:
         logger.warning(f"Validation Failed: {e}", extra={"trace_id": trace_id})
@@ -511,10 +613,16 @@ async def repair_node(state: AgentState):
     logger.info(f"🔧 [Repair] Analyzing failure... (Attempt {retry_count + 1})", extra={"trace_id": trace_id})
 
     repair_query = ""
+    # 额外的关键词变体，与 repair_query 一起走多路召回
+    extra_queries: List[str] = []
     strategy = "UNKNOWN"
 
     if suggested_keywords and len(str(suggested_keywords).strip()) > 2:
-        repair_query = suggested_keywords
+        # ReflectionOutput.suggested_search_keywords 是一组关键词，每个都单独召回
+        if isinstance(suggested_keywords, (list, tuple)):
+            repair_query, extra_queries = str(suggested_keywords[0]), [str(k) for k in suggested_keywords[1:]]
+        else:
+            repair_query = str(suggested_keywords)
         strategy = "REFLECTION_SUGGESTION"
     elif feedback and "缺少" in str(feedback):
         repair_query = f"{feedback} schema definition"
@@ -526,6 +634,7 @@ async def repair_node(state: AgentState):
                 missing_col = match.group(1)
                 intent = state.get("search_query") or question
                 repair_query = f"table containing column {missing_col} for {intent}"
+                extra_queries = [missing_col]
                 strategy = "SENTINEL_LINT"
         elif "Unknown column" in error_context:
             match = re.search(r"Unknown column ['`]([\w\.]+)['`]", error_context)
@@ -533,6 +642,7 @@ async def repair_node(state: AgentState):
                 full_col = match.group(1)
                 bad_col = full_col.split(".")[-1] if "." in full_col else full_col
                 repair_query = f"definition of column {bad_col}"
+                extra_queries = [bad_col, question]
                 strategy = "MYSQL_ERROR"
         elif "doesn't exist" in error_context:
             repair_query = f"correct table name for {question}"
@@ -542,12 +652,13 @@ async def repair_node(state: AgentState):
         repair_query = f"relevant tables for: {question}"
         strategy = "FALLBACK_GENERIC"
 
-    logger.info(f"🔧 [Repair] Strategy: {strategy} | Search: '{repair_query}'", extra={"trace_id": trace_id})
+    logger.info(f"🔧 [Repair] Strategy: {strategy} | Search: '{repair_query}' (+{len(extra_queries)} variants)",
+                extra={"trace_id": trace_id})
 
     new_tables_added = []
     new_table_cols = {}
     try:
-        found_tables = await retrieve_tables_advanced(repair_query)
+        found_tables = await retrieve_tables_multi([repair_query, *extra_queries], trace_id=trace_id)
         current_tables = state.get("candidate_tables", [])
         current_names = {t.get('logical_table', t.get('table_name')) for t in current_tables}
 
@@ -559,7 +670,7 @@ async def repair_node(state: AgentState):
 
         if new_tables_added:
             new_names = [t.get('logical_table', t.get('table_name')) for t in new_tables_added]
-            new_table_cols = get_tables_columns(new_names)
+            new_table_cols = await _run_db(get_tables_columns, new_names)
     except Exception as e:
         logger.error(f"Repair retrieval failed: {e}")
 
@@ -627,24 +738,32 @@ def route_after_classify(state: AgentState):
 # ==========================================
 workflow = StateGraph(AgentState)
 
-workflow.add_node("intent", intent_node)
-workflow.add_node("rewrite", rewrite_node)
-workflow.add_node("retrieve", retrieve_node)
-workflow.add_node("generate", generate_node)
-workflow.add_node("reflection", reflection_node)
-workflow.add_node("validate", validate_node)
-workflow.add_node("classify", classify_node)
-workflow.add_node("repair", repair_node)
-workflow.add_node("fallback", fallback_node)
-
-workflow.set_entry_point("intent")
-
-workflow.add_conditional_edges(
-    "intent",
-    lambda x: "rewrite" if x.get("intent") == "DATA_QUERY" else END
-)
+workflow.add_node("retrieve", _timed("retrieve", retrieve_node))
+workflow.add_node("generate", _timed("generate", generate_node))
+workflow.add_node("reflection", _timed("reflection", reflection_node))
+workflow.add_node("validate", _timed("validate", validate_node))
+workflow.add_node("classify", _timed("classify", classify_node))
+workflow.add_node("repair", _timed("repair", repair_node))
+workflow.add_node("fallback", _timed("fallback", fallback_node))
+
+if settings.AGENT_SPECULATIVE_ENABLED:
+    # 推测执行：speculate (intent ∥ rewrite ∥ 原问题检索) -> retrieve
+    workflow.add_node("speculate", _timed("speculate", speculative_front_node))
+    workflow.set_entry_point("speculate")
+    workflow.add_conditional_edges(
+        "speculate",
+        lambda x: "retrieve" if x.get("intent") == "DATA_QUERY" else END
+    )
+else:
+    workflow.add_node("intent", _timed("intent", intent_node))
+    workflow.add_node("rewrite", _timed("rewrite", rewrite_node))
+    workflow.set_entry_point("intent")
+    workflow.add_conditional_edges(
+        "intent",
+        lambda x: "rewrite" if x.get("intent") == "DATA_QUERY" else END
+    )
+    workflow.add_edge("rewrite", "retrieve")
 
-workflow.add_edge("rewrite", "retrieve")
 workflow.add_edge("retrieve", "generate")
 
 workflow.add_conditional_edges(
@@ -39,16 +39,127 @@ class Settings:
     MILVUS_HOST = os.getenv("MILVUS_HOST", "127.0.0.1")
     MILVUS_PORT = os.getenv("MILVUS_PORT", "19530")
     MILVUS_COLLECTION = os.getenv("MILVUS_COLLECTION", "schema_catalog_v2")
+    MILVUS_IO_WORKERS = int(os.getenv("MILVUS_IO_WORKERS", "8"))  # Milvus 网络 I/O 专用线程数 (不占推理线程)
+
+    # 召回后端：milvus (默认) | local (进程内 NumPy 索引，离线可跑)
+    RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "milvus").lower()
+    # local 后端启动时按 manifest.json 校验索引产物的 sha256 (多 worker 共享同一份 mmap 文件)
+    LOCAL_INDEX_VERIFY = os.getenv("LOCAL_INDEX_VERIFY", "true").lower() == "true"
+
+    # 字面快路径：问题就是表名 / 分表名 / 同义词且唯一命中时，跳过 embedding + 检索 + Rerank
+    LEXICAL_FAST_PATH_ENABLED = os.getenv("LEXICAL_FAST_PATH_ENABLED", "true").lower() == "true"
+
+    # 混合召回：BM25 倒排 + 向量，RRF 融合后再进 Rerank
+    HYBRID_ENABLED = os.getenv("HYBRID_ENABLED", "true").lower() == "true"
+    HYBRID_BM25_TOP_K = int(os.getenv("HYBRID_BM25_TOP_K", "50"))
+    RRF_K = int(os.getenv("RRF_K", "60"))
+
+    # 级联 Rerank：向量分已经拉开差距时跳过/缩小 CrossEncoder
+    RERANK_CASCADE_ENABLED = os.getenv("RERANK_CASCADE_ENABLED", "false").lower() == "true"
+    RERANK_SKIP_MARGIN = float(os.getenv("RERANK_SKIP_MARGIN", "0.15"))  # top1 - top2 >= 该值：直接跳过 Rerank
+    # 跳过 Rerank 还要求 top1 向量分不低于该值：全都不相关时 "矮子里拔将军" 的分差不算数，照常 Rerank + 阈值截断
+    RERANK_SKIP_MIN_SCORE = float(os.getenv("RERANK_SKIP_MIN_SCORE", "0.6"))
+    RERANK_POOL_MARGIN = float(os.getenv("RERANK_POOL_MARGIN", "0.25"))  # 与 top1 差距超过该值的候选不进 Rerank 池
+    RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "0"))  # 单请求检索预算，0 = 不限
+
+    # 批量检索接口 (/retrieve/batch) 单次最多的 query 数
+    RETRIEVE_BATCH_MAX_QUERIES = int(os.getenv("RETRIEVE_BATCH_MAX_QUERIES", "64"))
 
     LLM_API_KEY = os.getenv("LLM_API_KEY", "ollama")
     LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:11434/v1")
     LLM_MODEL = os.getenv("LLM_MODEL_NAME", "qwen2.5:14b")
+    # 推测执行：intent / rewrite / 原问题 embedding 并发跑，intent 不是 DATA_QUERY 时丢弃后两者
+    AGENT_SPECULATIVE_ENABLED = os.getenv("AGENT_SPECULATIVE_ENABLED", "false").lower() == "true"
+    # 主图 Router 判定 DATA_QUERY 且置信度 >= 该值时，子图 intent_node 不再调用 LLM 二次判定
+    ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.8"))
+    # Embedding 原型路由 (bge-m3 + 例句库)：置信度够高直接定路由，否则回退 LLM Router
+    SEMANTIC_ROUTER_ENABLED = os.getenv("SEMANTIC_ROUTER_ENABLED", "true").lower() == "true"
+    SEMANTIC_ROUTER_MIN_CONFIDENCE = float(os.getenv("SEMANTIC_ROUTER_MIN_CONFIDENCE", "0.9"))
+    # softmax 置信度只反映类间相对差距，还要求 top1 原型足够像 (绝对相似度) 且领先第二类足够多
+    SEMANTIC_ROUTER_MIN_SIMILARITY = float(os.getenv("SEMANTIC_ROUTER_MIN_SIMILARITY", "0.75"))
+    SEMANTIC_ROUTER_MIN_MARGIN = float(os.getenv("SEMANTIC_ROUTER_MIN_MARGIN", "0.1"))
+    SEMANTIC_ROUTER_TEMPERATURE = float(os.getenv("SEMANTIC_ROUTER_TEMPERATURE", "0.05"))
+    # 额外原型 (JSONL: {"label", "text"})；可选从审计日志挖掘执行成功的问题作为 DATA_QUERY 原型
+    ROUTER_PROTOTYPES_PATH = os.getenv("ROUTER_PROTOTYPES_PATH", os.path.join(project_root, "data", "router_prototypes.jsonl"))
+    SEMANTIC_ROUTER_MINE_AUDIT_LOG = os.getenv("SEMANTIC_ROUTER_MINE_AUDIT_LOG", "false").lower() == "true"
+    SEMANTIC_ROUTER_MINED_MAX = int(os.getenv("SEMANTIC_ROUTER_MINED_MAX", "200"))
 
     EMBED_MODEL = os.getenv("EMBED_MODEL", "BAAI/bge-m3")
     RERANK_MODEL = os.getenv("RERANK_MODEL", "BAAI/bge-reranker-base")  # 注意这里我改回了 base，和你 env 一致
 
+    # 推理后端：torch (默认) | onnx (int8 量化，需先跑 scripts/export_onnx_models.py)
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+    ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(project_root, "models", "onnx"))
+    ONNX_EMBED_MAX_LEN = int(os.getenv("ONNX_EMBED_MAX_LEN", "512"))
+    ONNX_EMBED_POOLING = os.getenv("ONNX_EMBED_POOLING", "cls")  # bge 系列用 CLS pooling
+    ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 = 跟随 MODEL_INTRA_OP_THREADS
+
+    # =========================
+    # ⚡ 检索缓存 (Retrieval Cache)
+    # =========================
+    # Query Embedding 缓存：key = 归一化后的 query 文本
+    EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+    EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+    EMBED_CACHE_TTL_S = float(os.getenv("EMBED_CACHE_TTL_S", "3600"))
+
+    # 端到端检索结果缓存：key = (catalog 版本, query, top_k 参数)
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+    RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "600"))
+    # 负缓存 (被 RERANK_THRESHOLD 截断的空结果) 过期更快
+    RESULT_CACHE_NEGATIVE_TTL_S = float(os.getenv("RESULT_CACHE_NEGATIVE_TTL_S", "120"))
+
+    # 语义答案缓存 (AgentService)：相似问题 + 相同会话上下文 + 相同用户 -> 复用已执行成功的 SQL，跳过整张图
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # 余弦相似度
+    ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "86400"))
+    ANSWER_CACHE_MAX_SCOPES = int(os.getenv("ANSWER_CACHE_MAX_SCOPES", "1024"))  # (用户, 上下文) 分区数
+    ANSWER_CACHE_MAX_PER_SCOPE = int(os.getenv("ANSWER_CACHE_MAX_PER_SCOPE", "256"))
+
+    # =========================
+    # 📦 推理微批 (Dynamic Micro-Batching)
+    # =========================
+    # 并发请求的 query 在窗口内合并成一次 model.encode
+    EMBED_BATCH_ENABLED = os.getenv("EMBED_BATCH_ENABLED", "true").lower() == "true"
+    EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+    EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+    # 并发请求的 (query, card) pair 合并成一次 CrossEncoder.predict，上限按 pair 数计
+    RERANK_BATCH_ENABLED = os.getenv("RERANK_BATCH_ENABLED", "true").lower() == "true"
+    RERANK_BATCH_WINDOW_MS = float(os.getenv("RERANK_BATCH_WINDOW_MS", "5"))
+    RERANK_BATCH_MAX_PAIRS = int(os.getenv("RERANK_BATCH_MAX_PAIRS", "128"))
+    # 启动时预分词全部表卡片，Rerank 只对 query 分词
+    RERANK_PRETOKENIZE_ENABLED = os.getenv("RERANK_PRETOKENIZE_ENABLED", "true").lower() == "true"
+
+    # =========================
+    # 🧵 执行线程池 (按资源类型隔离，见 app/core/executors.py)
+    # =========================
+    # 单次推理的 intra-op 线程数 (torch / onnxruntime)，0 = 按核数自动推算
+    MODEL_INTRA_OP_THREADS = int(os.getenv("MODEL_INTRA_OP_THREADS", "0"))
+    # 模型池并发推理数，0 = 按 核数 / intra-op 线程数 自动推算
+    EMBED_POOL_WORKERS = int(os.getenv("EMBED_POOL_WORKERS", "0"))
+    RERANK_POOL_WORKERS = int(os.getenv("RERANK_POOL_WORKERS", "0"))
+    # 业务库 (MySQL) 阻塞调用专用线程数
+    DB_IO_WORKERS = int(os.getenv("DB_IO_WORKERS", "16"))
+
+    # =========================
+    # 🚀 启动预热 (后台进行，进度见 /ready)
+    # =========================
+    # 单个组件预热失败后的重试次数，间隔指数退避 (BACKOFF_S, 2x, 4x ... 封顶 MAX_BACKOFF_S)
+    WARMUP_MAX_RETRIES = int(os.getenv("WARMUP_MAX_RETRIES", "5"))
+    WARMUP_RETRY_BACKOFF_S = float(os.getenv("WARMUP_RETRY_BACKOFF_S", "2.0"))
+    WARMUP_RETRY_MAX_BACKOFF_S = float(os.getenv("WARMUP_RETRY_MAX_BACKOFF_S", "30.0"))
+    # 必需组件重试耗尽仍失败时退出进程，交给 K8s / supervisor 重启 (与同步启动时崩溃重启的行为一致)
+    WARMUP_EXIT_ON_FAILURE = os.getenv("WARMUP_EXIT_ON_FAILURE", "true").lower() == "true"
+
     # 输出路径
     OUT_PATH = os.path.join(project_root, "data", "schema_catalog.jsonl")
+    # 进程内向量索引产物 (embeddings.npy + cards.jsonl + card_offsets.npy + manifest.json)
+    LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(project_root, "data", "vector_index"))
+    # Catalog 版本戳 (index_schema_to_milvus.py 每次全量入库后写入)
+    CATALOG_VERSION_PATH = os.path.join(project_root, "data", "catalog_version.json")
+    # 合规词典 (一行一个词，# 开头为注释)，文件变化后自动热加载
+    SENSITIVE_TERMS_PATH = os.getenv("SENSITIVE_TERMS_PATH", os.path.join(project_root, "data", "sensitive_terms.txt"))
+    SQL_DENY_TERMS_PATH = os.getenv("SQL_DENY_TERMS_PATH", os.path.join(project_root, "data", "sql_deny_terms.txt"))
 
 
 settings = Settings()
\ No newline at end of file
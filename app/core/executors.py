@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+from app.core.logger import logger
+
+_CPU_COUNT = os.cpu_count() or 4
+
+
+def model_intra_op_threads() -> int:
+    """
+    单次模型推理 (torch / onnxruntime) 使用的线程数
+    未配置时按 "embed + rerank 两个池各并发 1~2 个推理" 估算，避免并发推理 × intra-op 线程数超过物理核数
+    """
+    if settings.MODEL_INTRA_OP_THREADS > 0:
+        return settings.MODEL_INTRA_OP_THREADS
+    return max(1, _CPU_COUNT // 4)
+
+
+def _model_pool_size(configured: int) -> int:
+    if configured > 0:
+        return configured
+    # 两个模型池平分核数：workers × intra_op_threads ≈ cpu / 2
+    return max(1, _CPU_COUNT // (2 * model_intra_op_threads()))
+
+
+def configure_torch_threads() -> None:
+    """把 torch 的 intra-op 线程数与池大小对齐 (加载模型前调用；torch 未安装时跳过)"""
+    try:
+        import torch
+    except ImportError:
+        return
+    threads = model_intra_op_threads()
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+        logger.info(f"🧵 torch intra-op threads -> {threads}")
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """
+    带指标的线程池：排队深度 / 在跑任务数 / 排队等待与执行耗时 (最近 N 个任务的 p50/p95/max)
+    压测时看哪个池在排队，就知道尾延迟是卡在模型推理还是卡在网络 I/O
+    """
+
+    def __init__(self, name: str, max_workers: int, window: int = 1024):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._wait_ms: deque = deque(maxlen=window)
+        self._run_ms: deque = deque(maxlen=window)
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        enqueued = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._submitted += 1
+
+        def _task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_ms.append((started - enqueued) * 1000.0)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    self._run_ms.append((time.perf_counter() - started) * 1000.0)
+
+        return super().submit(_task)
+
+    @staticmethod
+    def _summary(samples) -> Dict[str, float]:
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "p50": round(ordered[len(ordered) // 2], 2),
+            "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 2),
+            "max": round(ordered[-1], 2),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            wait, run = list(self._wait_ms), list(self._run_ms)
+            out = {
+                "max_workers": self._max_workers,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "submitted": self._submitted,
+                "completed": self._completed,
+            }
+        out["wait_ms"] = self._summary(wait)
+        out["run_ms"] = self._summary(run)
+        return out
+
+
+# =========================
+# Named pools (按资源类型隔离)
+# =========================
+# embed / rerank: CPU 密集，池大小 × intra-op 线程数 不超过核数
+# milvus_io / db_io: 网络等待，线程多一些也不占 CPU
+EMBED_POOL = "embed"
+RERANK_POOL = "rerank"
+MILVUS_IO_POOL = "milvus_io"
+DB_IO_POOL = "db_io"
+
+_pools: Dict[str, InstrumentedExecutor] = {
+    EMBED_POOL: InstrumentedExecutor(EMBED_POOL, _model_pool_size(settings.EMBED_POOL_WORKERS)),
+    RERANK_POOL: InstrumentedExecutor(RERANK_POOL, _model_pool_size(settings.RERANK_POOL_WORKERS)),
+    MILVUS_IO_POOL: InstrumentedExecutor(MILVUS_IO_POOL, settings.MILVUS_IO_WORKERS),
+    DB_IO_POOL: InstrumentedExecutor(DB_IO_POOL, settings.DB_IO_WORKERS),
+}
+
+
+def get_pool(name: str) -> InstrumentedExecutor:
+    return _pools[name]
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in _pools.items()}
@@ -1,13 +1,15 @@
 import os
-from typing import TypedDict, Literal, List
+from typing import TypedDict, Literal, List, Optional
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
 from app.core.config import settings
 from app.core.prompts import ROUTER_PROMPT
 from app.core.mysql_saver import AsyncMySQLSaver
-from app.core.agent_graph import app as query_agent_app
+from app.core.agent_graph import app as query_agent_app, format_node_timings
+from app.modules.router.semantic_router import semantic_route
 
 # ==========================================
 # 🔥 补回丢失的 DB 配置 (main.py 需要用到)
@@ -34,36 +36,66 @@ llm = ChatOpenAI(
 class MasterState(TypedDict):
     question: str
     intent: str
+    route_confidence: float
     final_answer: str
     trace_id: str
     history: List[str]  # 主图这里存字符串列表没问题
+    node_timings: List[dict]  # 本轮子图各节点耗时 (见 agent_graph._timed)
 
 
 # --- 定义路由输出 ---
 class RouterOutput(BaseModel):
     intent: Literal["DATA_QUERY", "KNOWLEDGE_SEARCH", "CHAT"]
+    # 不在 schema 上卡范围：模型偶尔按 0-100 / "85%" 作答，校验失败会连 intent 一起丢掉；归一化交给 router_node
+    confidence: Optional[float] = Field(default=None, description="分类置信度 0.0-1.0")
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _lenient_confidence(cls, v):
+        try:
+            return float(str(v).strip().rstrip("%"))
+        except (TypeError, ValueError):
+            return None
+
+
+def _normalize_confidence(value: Optional[float]) -> float:
+    """0-1 原样；1-100 视为百分制；其余 (缺失 / 负数 / NaN) 按 0 处理，即交给子图再判一次"""
+    if value is None or value != value:
+        return 0.0
+    if value > 1.0:
+        value = value / 100.0
+    return min(max(value, 0.0), 1.0)
 
 
 # ==========================================
 # Nodes
 # ==========================================
-def router_node(state: MasterState):
+async def router_node(state: MasterState):
     print(f"🚦 [Master] Routing query: {state['question']}")
     current_history = state.get("history", [])
 
     # 构造 Prompt
     prompt = ROUTER_PROMPT.format(question=state["question"])
 
-    # 调用 LLM 决策
+    # 先走 embedding 原型路由 (几 ms)，只有低置信的才花一次 LLM 往返
+    decision = await semantic_route(state["question"])
+    if decision is not None and decision.confident:
+        print(f"    -> Route to: {decision.intent} (prototype, confidence={decision.confidence:.2f}, "
+              f"nearest='{decision.nearest}')")
+        return {"intent": decision.intent, "route_confidence": decision.confidence,
+                "history": current_history, "node_timings": []}
+
+    # 调用 LLM 决策 (异步：同步 invoke 会卡住事件循环，所有并发请求一起排队)
     try:
-        res = llm.with_structured_output(RouterOutput).invoke(prompt)
-        intent = res.intent
+        res = await llm.with_structured_output(RouterOutput).ainvoke(prompt)
+        intent, confidence = res.intent, _normalize_confidence(res.confidence)
     except Exception as e:
         print(f"⚠️ Router LLM failed: {e}, fallback to CHAT")
-        intent = "CHAT"
+        intent, confidence = "CHAT", 0.0
 
-    print(f"    -> Route to: {intent}")
-    return {"intent": intent, "history": current_history}
+    print(f"    -> Route to: {intent} (confidence={confidence:.2f})")
+    # node_timings 会随 checkpoint 保留，每轮开头清空，避免闲聊轮次带出上一轮的耗时
+    return {"intent": intent, "route_confidence": confidence, "history": current_history, "node_timings": []}
 
 
 async def search_agent_node(state: MasterState):
@@ -82,7 +114,7 @@ async def chat_node(state: MasterState):
     return {"final_answer": res.content, "history": new_history}
 
 
-async def call_query_agent(state: MasterState):
+async def call_query_agent(state: MasterState, config: RunnableConfig):
     print("📊 [Query Agent] Activated.")
     global_history = state.get("history", [])
     recent_history = global_history[-6:]
@@ -92,11 +124,16 @@ async def call_query_agent(state: MasterState):
         "trace_id": state.get("trace_id"),
         # 🔥🔥🔥 核心修复：key 必须是 "history"，对应 AgentState 定义 🔥🔥🔥
         # 原来写的是 "chat_history"，导致子 Agent 拿不到历史
-        "history": recent_history
+        "history": recent_history,
+        # Router 已经判定过一次，置信度够高时子图的 intent_node 直接复用，省一次 LLM 调用
+        "routed_intent": state.get("intent"),
+        "route_confidence": state.get("route_confidence", 0.0),
     }
 
-    # 调用子图
-    result_state = await query_agent_app.ainvoke(inputs)
+    # 调用子图：只透传 callbacks (子图无 checkpointer)，astream_events 才能看到子图里每个节点的事件
+    result_state = await query_agent_app.ainvoke(inputs, config={"callbacks": (config or {}).get("callbacks")})
+    node_timings = result_state.get("node_timings", [])
+    print(f"⏱️ [Query Agent] {format_node_timings(node_timings)}")
 
     # 解析结果
     final_ans = ""
@@ -114,7 +151,7 @@ async def call_query_agent(state: MasterState):
 
     # 更新主图历史
     new_history = global_history + [f"User: {state['question']}", f"AI: {ai_msg}"]
-    return {"final_answer": final_ans, "history": new_history}
+    return {"final_answer": final_ans, "history": new_history, "node_timings": node_timings}
 
 
 # ==========================================
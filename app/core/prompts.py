@@ -223,7 +223,9 @@ ROUTER_PROMPT = """
 ### 任务：
 用户输入: "{question}"
 
-请输出 JSON 格式，包含 "intent" 字段，取值为 [DATA_QUERY, KNOWLEDGE_SEARCH, CHAT]。
+请输出 JSON 格式，包含两个字段：
+- "intent": 取值为 [DATA_QUERY, KNOWLEDGE_SEARCH, CHAT]
+- "confidence": 0.0 ~ 1.0 的小数，表示你对该分类的把握；问题简短、有指代 (如 "那上海的呢？") 或需要结合上下文才能判断时给低分
 """
 
 
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.core.logger import logger
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ReadinessTracker:
+    """
+    启动预热状态 (按组件)：/health 只说明进程活着，/ready 要等所有必需组件都预热完才返回 200
+    K8s readinessProbe 指向 /ready，模型没加载完之前不会有流量打进来
+    可选组件 (optional) 失败只影响对应的加速能力，不拖住 /ready
+    """
+
+    def __init__(self):
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def register(self, name: str, required: bool = True) -> None:
+        self.components[name] = {"status": PENDING, "ms": None, "error": None, "attempts": 0, "required": required}
+
+    async def run(self, name: str, fn: Callable[[], Awaitable[Any]], retries: int = 0,
+                  backoff_s: float = 1.0, max_backoff_s: float = 30.0) -> bool:
+        """失败后按指数退避重试 retries 次 (MySQL / Milvus 比本进程晚起来是常态)"""
+        comp = self.components.setdefault(
+            name, {"status": PENDING, "ms": None, "error": None, "attempts": 0, "required": True})
+        t0 = time.perf_counter()
+        for attempt in range(retries + 1):
+            comp["status"] = LOADING
+            comp["attempts"] = attempt + 1
+            try:
+                await fn()
+                comp["status"] = READY
+                comp["error"] = None
+                return True
+            except Exception as e:
+                comp["status"] = FAILED
+                comp["error"] = str(e)
+                if attempt >= retries:
+                    logger.error(f"❌ [Warmup] {name} failed after {attempt + 1} attempt(s): {e}", exc_info=True)
+                    return False
+                delay = min(backoff_s * (2 ** attempt), max_backoff_s)
+                logger.warning(f"⚠️ [Warmup] {name} failed (attempt {attempt + 1}/{retries + 1}): {e}; "
+                               f"retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            finally:
+                comp["ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+        return False
+
+    async def run_all(self, tasks: Dict[str, Callable[[], Awaitable[Any]]], optional: Iterable[str] = (),
+                      retries: int = 0, backoff_s: float = 1.0, max_backoff_s: float = 30.0) -> None:
+        """所有组件并发预热，结束后打印耗时分解 (墙钟时间 vs 各组件耗时之和)"""
+        optional = set(optional)
+        for name in tasks:
+            self.register(name, required=name not in optional)
+        self.started_at = time.perf_counter()
+        await asyncio.gather(*(self.run(name, fn, retries, backoff_s, max_backoff_s) for name, fn in tasks.items()))
+        self.finished_at = time.perf_counter()
+
+        wall_ms = (self.finished_at - self.started_at) * 1000.0
+        serial_ms = sum(c["ms"] or 0.0 for c in self.components.values())
+        breakdown = ", ".join(f"{n}={c['ms']:.0f}ms({c['status']})" for n, c in self.components.items())
+        logger.info(f"⏱️ [Warmup] wall={wall_ms:.0f}ms (serial would be {serial_ms:.0f}ms) | {breakdown}")
+
+    def failed_required(self) -> List[str]:
+        return [n for n, c in self.components.items() if c["required"] and c["status"] == FAILED]
+
+    def is_ready(self) -> bool:
+        return bool(self.components) and all(
+            c["status"] == READY for c in self.components.values() if c["required"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "components": {name: dict(c) for name, c in self.components.items()},
+        }
+
+
+readiness = ReadinessTracker()
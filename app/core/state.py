@@ -1,4 +1,5 @@
-from typing import List, Dict, Any, TypedDict, Literal, Optional
+import operator
+from typing import Annotated, List, Dict, Any, TypedDict, Literal, Optional
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage  # 🔥 新增引入
 
@@ -8,6 +9,9 @@ class AgentState(TypedDict):
     trace_id: str
     question: str
     intent: str
+    # 主图 Router 的判定 (透传进子图，置信度够高时 intent_node 跳过 LLM)
+    routed_intent: Optional[str]
+    route_confidence: Optional[float]
 
     # 🔥 修复 1: 名称改为 history (匹配 agent_graph.py)
     # 🔥 修复 2: 类型改为 List[BaseMessage] (匹配 msg.content/msg.type 用法)
@@ -41,6 +45,10 @@ class AgentState(TypedDict):
     reflection_feedback: Optional[str]
     sentinel_blocked: Optional[bool]
 
+    # --- 观测 ---
+    # 每个节点追加一条 {"node", "ms"}，reducer 负责拼接 (重试会出现同名节点多次)
+    node_timings: Annotated[List[Dict[str, Any]], operator.add]
+
 
 # --- LLM 输出结构 (保持不变) ---
 class SQLOutput(BaseModel):
@@ -0,0 +1,148 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.modules.retrieval.catalog import get_catalog_version, load_catalog_cards
+from app.modules.retrieval.scope import RetrievalScope
+
+try:
+    import jieba  # 可选依赖：有就用词典分词，没有就退化成字 bigram
+
+    jieba.setLogLevel(60)
+    HAS_JIEBA = True
+except ImportError:
+    HAS_JIEBA = False
+
+# 标识符 (t_pay_flow / OrderItem / 10086) 与 连续汉字 两类片段
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+|[\u4e00-\u9fff]+")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]+")
+
+# 字段加权：表名/同义词命中比正文命中重要得多 (等价于 BM25F 的简化版)
+NAME_BOOST = 3
+SYNONYM_BOOST = 3
+SUMMARY_BOOST = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中英混合分词
+    - 标识符整体保留 (t_pay_flow)，同时拆出下划线子词 (pay / flow)，兼顾精确表名与部分匹配
+    - 汉字：jieba 搜索模式分词 + 字 bigram 兜底 (没有 jieba 时只用 bigram/unigram)
+    """
+    if not text:
+        return []
+    tokens: List[str] = []
+    for frag in _TOKEN_RE.findall(text):
+        if _CJK_RE.fullmatch(frag):
+            if HAS_JIEBA:
+                tokens.extend(w for w in jieba.cut_for_search(frag) if w.strip())
+            if len(frag) == 1:
+                tokens.append(frag)
+            else:
+                tokens.extend(frag[i:i + 2] for i in range(len(frag) - 1))
+        else:
+            word = frag.lower()
+            tokens.append(word)
+            if "_" in word:
+                tokens.extend(p for p in word.split("_") if p and not p.isdigit())
+    return tokens
+
+
+class BM25Index:
+    """
+    内存倒排索引 + Okapi BM25
+    catalog 只有几十~上千张表卡片，全量常驻内存，查询只遍历 query 词的倒排链
+    """
+
+    def __init__(self, cards: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.cards = cards
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_len: List[int] = []
+
+        for doc_id, card in enumerate(cards):
+            tf = Counter(self._doc_tokens(card))
+            self.doc_len.append(sum(tf.values()))
+            for term, freq in tf.items():
+                self.postings[term].append((doc_id, freq))
+
+        n = len(cards)
+        self.avgdl = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    @staticmethod
+    def _doc_tokens(card: Dict[str, Any]) -> List[str]:
+        tokens = tokenize(card.get("logical_table", "")) * NAME_BOOST
+        tokens += tokenize(" ".join(card.get("synonyms", []))) * SYNONYM_BOOST
+        tokens += tokenize(card.get("summary", "")) * SUMMARY_BOOST
+        tokens += tokenize(card.get("text", ""))
+        return tokens
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def search(self, query: str, limit: int, scope: Optional[RetrievalScope] = None) -> List[Dict[str, Any]]:
+        """scope: 与向量侧同一套权限过滤，否则 BM25 独有的命中会绕过 Milvus expr"""
+        if not self.cards or limit <= 0:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_id, freq in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / (self.avgdl or 1.0))
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        if scope is not None:
+            scores = {d: sc for d, sc in scores.items() if scope.matches(self.cards[d])}
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [{**self.cards[doc_id], "bm25_score": float(score)} for doc_id, score in ranked]
+
+
+_index: Optional[BM25Index] = None
+_index_version: Optional[str] = None
+_index_lock = threading.Lock()
+
+
+def bm25_index_current() -> bool:
+    """已按当前 catalog 版本建好：get_bm25_index() 不会触发重建"""
+    return _index is not None and _index_version == get_catalog_version()
+
+
+def get_bm25_index() -> BM25Index:
+    """catalog 版本变化时自动重建 (几十 ms 级别)"""
+    global _index, _index_version
+    version = get_catalog_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                cards = load_catalog_cards()
+                _index = BM25Index(cards)
+                _index_version = version
+                logger.info(f"📚 BM25 index built: {len(cards)} cards, {len(_index.postings)} terms "
+                            f"(jieba={'on' if HAS_JIEBA else 'off'})")
+    return _index
+
+
+def rrf_fuse(ranked_lists: List[List[str]], k: int = settings.RRF_K) -> Dict[str, float]:
+    """
+    Reciprocal Rank Fusion: score(d) = Σ 1 / (k + rank_i(d))
+    只看名次不看分值，天然解决 BM25 分与余弦分量纲不一致的问题
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranked in ranked_lists:
+        for rank, key in enumerate(ranked, start=1):
+            fused[key] += 1.0 / (k + rank)
+    return dict(fused)
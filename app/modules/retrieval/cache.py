@@ -0,0 +1,100 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    保留大小写的归一化：全角转半角 (NFKC) + 折叠空白
+    embedding 缓存用这个：bge-m3 的分词区分大小写，"T_Order" 和 "t_order" 的向量并不相同
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    return _WS_RE.sub(" ", text).strip()
+
+
+def normalize_query(text: str) -> str:
+    """
+    缓存 key 归一化：在 normalize_text 基础上再忽略大小写 (结果缓存 / 词法匹配用)
+    "  查看 t_Order " 和 "查看 t_order" 视为同一个问题
+    """
+    return normalize_text(text).casefold()
+
+
+class TTLCache:
+    """
+    线程安全的 LRU + TTL 缓存
+    - 超过 maxsize：淘汰最久未访问的条目
+    - 超过 ttl_s：读取时视为失效 (惰性删除)
+    - enabled=False 时 get 永远 miss、set 不落盘，方便一键关闭
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_s: float = 3600.0, enabled: bool = True, name: str = "cache"):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.ttl_s = float(ttl_s)
+        self.enabled = enabled
+
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expire_at, value = item
+            if expire_at < now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_s: Optional[float] = None) -> None:
+        """ttl_s 可单独覆盖 (例如负缓存用更短的过期时间)"""
+        if not self.enabled:
+            return
+        expire_at = time.monotonic() + (self.ttl_s if ttl_s is None else float(ttl_s))
+        with self._lock:
+            self._data[key] = (expire_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
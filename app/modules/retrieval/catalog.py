@@ -0,0 +1,156 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+
+CATALOG_PATH = settings.OUT_PATH
+VERSION_PATH = settings.CATALOG_VERSION_PATH
+CARD_TEXT_MAX_LEN = 8192  # 与 Milvus text 字段的 max_length 一致
+
+_version_lock = threading.Lock()
+_version_sig: Optional[Tuple] = None
+_version_cached: str = "unversioned"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_catalog_version(collection: str, num_entities: int, source_file: str = CATALOG_PATH) -> Dict[str, Any]:
+    """
+    由 ETL (index_schema_to_milvus.py) 在全量入库后调用，写入版本戳
+    线上进程发现版本变化后，所有依赖 catalog 的缓存自动失效
+    """
+    checksum = file_sha256(source_file) if os.path.exists(source_file) else ""
+    built_at = datetime.datetime.utcnow().isoformat()
+    stamp = {
+        "version": f"{checksum[:12]}-{built_at}",
+        "collection": collection,
+        "num_entities": int(num_entities),
+        "catalog_sha256": checksum,
+        "built_at": built_at,
+    }
+    os.makedirs(os.path.dirname(VERSION_PATH), exist_ok=True)
+    tmp_path = VERSION_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stamp, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, VERSION_PATH)
+    return stamp
+
+
+def _stat_sig(path: str) -> Tuple:
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None, None
+
+
+def get_catalog_version() -> str:
+    """
+    当前 catalog 版本 = 版本戳 + catalog 文件签名 (mtime/size)
+    - 只做两次 stat()，签名不变时直接返回缓存值，热路径上可以每次请求调用
+    - 没跑过新版 ETL (无版本戳) 时退化为文件签名
+    """
+    global _version_sig, _version_cached
+    sig = (_stat_sig(VERSION_PATH), _stat_sig(CATALOG_PATH), settings.MILVUS_COLLECTION)
+    if sig == _version_sig:
+        return _version_cached
+
+    with _version_lock:
+        if sig == _version_sig:
+            return _version_cached
+
+        stamp_version = "nostamp"
+        try:
+            with open(VERSION_PATH, "r", encoding="utf-8") as f:
+                stamp_version = json.load(f).get("version") or stamp_version
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ [Catalog] Failed to read version stamp: {e}")
+
+        catalog_mtime, catalog_size = sig[1]
+        _version_cached = f"{settings.MILVUS_COLLECTION}:{stamp_version}:{catalog_mtime}-{catalog_size}"
+        if _version_sig is not None:
+            logger.info(f"🔄 [Catalog] Version changed -> {_version_cached}")
+        _version_sig = sig
+    return _version_cached
+
+
+def get_logical_name(table_name: str) -> str:
+    """分表名归一化为逻辑表名：t_order_2024W01 / t_log_20240101 / t_user_07 -> 去掉分片后缀"""
+    name = re.sub(r'_\d{4}W\d{2,3}$', '', table_name, flags=re.IGNORECASE)
+    name = re.sub(r'_\d{8}$', '', name)
+    name = re.sub(r'_\d+$', '', name)
+    return name
+
+
+def load_catalog_cards(path: str = CATALOG_PATH) -> List[Dict[str, Any]]:
+    """读取 ETL 产物 schema_catalog.jsonl，拍平成检索用的卡片结构"""
+    cards = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                card = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            ident = card.get("identity", {})
+            llm_info = card.get("llm", {})
+            db = ident.get("db", "")
+            logical_table = ident.get("logical_table", "")
+            cards.append({
+                "full_name": f"{db}.{logical_table}",
+                "db": db,
+                "logical_table": logical_table,
+                "physical_table_example": ident.get("physical_table_example", ""),
+                "domain": ident.get("domain", "unknown"),
+                "risk_level": llm_info.get("risk_level", "normal"),
+                "table_type": llm_info.get("table_type", "unknown"),
+                "summary": llm_info.get("summary", ""),
+                "synonyms": llm_info.get("synonyms", []) or [],
+                "text": card.get("text", ""),
+            })
+    return cards
+
+
+_texts: Dict[str, str] = {}
+_texts_version: Optional[str] = None
+_texts_lock = threading.Lock()
+
+
+def card_texts_current() -> bool:
+    """卡片正文已按当前 catalog 版本建好：get_card_texts() 不会重新解析 jsonl"""
+    return _texts_version == get_catalog_version()
+
+
+def get_card_texts() -> Dict[str, str]:
+    """
+    进程内卡片正文 (full_name -> text)，两阶段召回的第二阶段优先从这里取
+    截断长度与入库时一致，保证和 Milvus 里存的 text 相同；catalog 版本变化时重建
+    """
+    global _texts, _texts_version
+    version = get_catalog_version()
+    if _texts_version != version:
+        with _texts_lock:
+            if _texts_version != version:
+                try:
+                    cards = load_catalog_cards()
+                except FileNotFoundError:
+                    cards = []
+                _texts = {c["full_name"]: (c["text"] or "")[:CARD_TEXT_MAX_LEN] for c in cards}
+                _texts_version = version
+    return _texts
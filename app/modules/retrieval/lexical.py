@@ -0,0 +1,115 @@
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.logger import logger
+from app.modules.retrieval.cache import normalize_query
+from app.modules.retrieval.catalog import CARD_TEXT_MAX_LEN, get_catalog_version, get_logical_name, load_catalog_cards
+from app.modules.retrieval.scope import RetrievalScope
+
+# query 切分：空白与常见分隔符；片段两端的引号 / 反引号 / 句末标点去掉
+_SPLIT_RE = re.compile(r"[\s,，;；、/|]+")
+_STRIP_CHARS = "`'\"“”‘’。.？?！!：:"
+
+HIT = "hit"
+MISS = "miss"
+AMBIGUOUS = "ambiguous"
+
+
+class LexicalIndex:
+    """
+    表名 / 分表名 / 同义词 -> full_name 的哈希索引
+    只做 "整句精确命中"：query 切成片段后，每个片段都必须是索引里的词，且全部指向同一张表，
+    否则交给完整的 embedding -> 检索 -> Rerank 流程 (宁可漏掉快路径，也不误判)
+    """
+
+    def __init__(self, cards: List[Dict[str, Any]]):
+        self.cards: Dict[str, Dict[str, Any]] = {c["full_name"]: c for c in cards}
+        self.terms: Dict[str, Set[str]] = defaultdict(set)
+        for c in cards:
+            for term in self._card_terms(c):
+                key = normalize_query(term)
+                if key:
+                    self.terms[key].add(c["full_name"])
+
+    @staticmethod
+    def _card_terms(card: Dict[str, Any]) -> List[str]:
+        physical = card.get("physical_table_example") or ""
+        return [
+            card["full_name"],
+            card.get("logical_table") or "",
+            physical,
+            get_logical_name(physical) if physical else "",
+            *(card.get("synonyms") or []),
+        ]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _resolve(self, fragment: str) -> Set[str]:
+        names = self.terms.get(fragment)
+        if names is None:
+            # 问题里直接写了分表名 (t_order_202401)，按 ETL 同样的规则归一化再查一次
+            names = self.terms.get(get_logical_name(fragment), set())
+        return names
+
+    def lookup(self, query: str, scope: Optional[RetrievalScope] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """返回 (hit | miss | ambiguous, 命中的卡片)；scope 之外的表不参与判定"""
+        fragments = [f.strip(_STRIP_CHARS) for f in _SPLIT_RE.split(normalize_query(query))]
+        fragments = [f for f in fragments if f]
+        if not fragments:
+            return MISS, None
+
+        matched: Set[str] = set()
+        for frag in fragments:
+            names = self._resolve(frag)
+            if not names:
+                return MISS, None
+            matched |= names
+
+        if scope is not None:
+            matched = {n for n in matched if scope.matches(self.cards[n])}
+        if not matched:
+            return MISS, None
+        if len(matched) > 1:
+            return AMBIGUOUS, None
+        return HIT, self.cards[matched.pop()]
+
+
+_index: Optional[LexicalIndex] = None
+_index_version: Optional[str] = None
+_index_lock = threading.Lock()
+
+
+def lexical_index_current() -> bool:
+    """已按当前 catalog 版本建好：get_lexical_index() 不会触发重建"""
+    return _index is not None and _index_version == get_catalog_version()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """catalog 版本变化时自动重建"""
+    global _index, _index_version
+    version = get_catalog_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                try:
+                    cards = load_catalog_cards()
+                except FileNotFoundError:
+                    cards = []
+                _index = LexicalIndex(cards)
+                _index_version = version
+                logger.info(f"🔑 Lexical index built: {len(cards)} cards, {len(_index)} terms")
+    return _index
+
+
+def lexical_result(card: Dict[str, Any]) -> Dict[str, Any]:
+    """快路径的返回结构与 Rerank 之后的候选一致 (db / logical_table / full_name / text / score)"""
+    return {
+        "full_name": card["full_name"],
+        "db": card.get("db"),
+        "logical_table": card.get("logical_table"),
+        "text": (card.get("text") or "")[:CARD_TEXT_MAX_LEN],
+        "score": 1.0,
+    }
@@ -0,0 +1,182 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.executors import model_intra_op_threads
+from app.core.logger import logger
+
+# onnxruntime / transformers 是可选依赖：只有 INFERENCE_BACKEND=onnx 时才需要
+try:
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+
+    HAS_ONNX = True
+except ImportError:
+    HAS_ONNX = False
+
+EMBED_SUBDIR = "embed"
+RERANK_SUBDIR = "rerank"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+
+# =========================
+# Export (离线执行：scripts/export_onnx_models.py)
+# =========================
+
+def export_onnx(model_name: str, out_dir: str, kind: str, quantize: bool = True, opset: int = 17) -> str:
+    """
+    导出 HF 模型为 ONNX，并做动态 int8 量化 (权重 int8，激活运行时量化，CPU 上无需校准集)
+    kind: "embed" (AutoModel -> last_hidden_state) | "rerank" (AutoModelForSequenceClassification -> logits)
+    """
+    import inspect
+
+    import torch
+    from transformers import AutoModel, AutoModelForSequenceClassification
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if kind == "embed":
+        model = AutoModel.from_pretrained(model_name)
+        output_names = ["last_hidden_state"]
+        dummy = tokenizer(["warmup"], return_tensors="pt")
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        output_names = ["logits"]
+        dummy = tokenizer([["warmup", "warmup"]], return_tensors="pt")
+    model.eval()
+
+    input_names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names}
+    dynamic_axes[output_names[0]] = {0: "batch", 1: "seq"} if kind == "embed" else {0: "batch"}
+
+    class _ExportWrapper(torch.nn.Module):
+        """按关键字参数调用 HF 模型并只返回第一个输出，避免依赖各版本 forward 的位置参数顺序"""
+
+        def __init__(self, inner, names):
+            super().__init__()
+            self.inner = inner
+            self.names = names
+
+        def forward(self, *tensors):
+            return self.inner(**dict(zip(self.names, tensors)), return_dict=True)[output_names[0]]
+
+    # 新版 torch 默认走 dynamo 导出 (需要 onnxscript)，这里固定用 TorchScript 导出器以支持 dynamic_axes
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            _ExportWrapper(model, input_names),
+            tuple(dummy[k] for k in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            **extra,
+        )
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = os.path.join(out_dir, INT8_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    logger.info(f"✅ [ONNX] {model_name} -> {int8_path}")
+    return int8_path
+
+
+# =========================
+# Runtime
+# =========================
+
+def _session(model_dir: str) -> "ort.InferenceSession":
+    path = os.path.join(model_dir, INT8_FILE)
+    if not os.path.exists(path):
+        path = os.path.join(model_dir, FP32_FILE)
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # 与 torch 共用同一套线程预算，避免 推理池并发数 × intra-op 线程数 超过核数
+    opts.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS or model_intra_op_threads()
+    return ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+
+class _OnnxModel:
+    def __init__(self, model_dir: str, max_length: int):
+        if not HAS_ONNX:
+            raise ImportError("onnxruntime / transformers not installed")
+        self.model_dir = model_dir
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = _session(model_dir)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def run_features(self, features: Dict[str, Any]) -> np.ndarray:
+        feeds = {k: np.asarray(v, dtype=np.int64) for k, v in features.items() if k in self.input_names}
+        return self.session.run(None, feeds)[0]
+
+
+class OnnxEmbedder(_OnnxModel):
+    """与 SentenceTransformer.encode 同签名 (bge 系列：CLS pooling + L2 归一化)"""
+
+    def __init__(self, model_dir: str, max_length: int = 512, pooling: str = "cls"):
+        super().__init__(model_dir, max_length)
+        self.pooling = pooling
+
+    def encode(self, sentences: Sequence[str], normalize_embeddings: bool = True, batch_size: int = 32,
+               **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        outputs: List[np.ndarray] = []
+        for start in range(0, len(sentences), batch_size):
+            batch = list(sentences[start:start + batch_size])
+            enc = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+            hidden = self.run_features(enc)
+            if self.pooling == "mean":
+                mask = enc["attention_mask"][..., None].astype(np.float32)
+                vecs = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            else:
+                vecs = hidden[:, 0]
+            outputs.append(vecs.astype(np.float32))
+
+        emb = np.vstack(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings and emb.size:
+            emb = emb / np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+        return emb
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    """与 CrossEncoder.predict 同签名 (单 label -> sigmoid)"""
+
+    def predict(self, sentences: Sequence[Sequence[str]], batch_size: int = 32, show_progress_bar: bool = False,
+                **kwargs) -> np.ndarray:
+        scores: List[np.ndarray] = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            enc = self.tokenizer(
+                [p[0] for p in batch], [p[1] for p in batch],
+                padding=True, truncation="longest_first", max_length=self.max_length, return_tensors="np",
+            )
+            scores.append(self.score_features(enc))
+        return np.concatenate(scores) if scores else np.zeros((0,), dtype=np.float32)
+
+    def score_features(self, features: Dict[str, Any]) -> np.ndarray:
+        """已分词好的输入直接打分 (供预分词 Rerank 路径复用)"""
+        logits = self.run_features(features)
+        if logits.ndim > 1 and logits.shape[-1] == 1:
+            logits = logits[:, 0]
+        return (1.0 / (1.0 + np.exp(-logits))).astype(np.float32)
+
+
+def load_onnx_embedder(model_dir: Optional[str] = None) -> OnnxEmbedder:
+    model_dir = model_dir or os.path.join(settings.ONNX_MODEL_DIR, EMBED_SUBDIR)
+    return OnnxEmbedder(model_dir, max_length=settings.ONNX_EMBED_MAX_LEN, pooling=settings.ONNX_EMBED_POOLING)
+
+
+def load_onnx_cross_encoder(model_dir: Optional[str] = None) -> OnnxCrossEncoder:
+    model_dir = model_dir or os.path.join(settings.ONNX_MODEL_DIR, RERANK_SUBDIR)
+    return OnnxCrossEncoder(model_dir, max_length=512)
@@ -0,0 +1,174 @@
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.logger import logger
+from app.modules.retrieval.catalog import get_catalog_version, load_catalog_cards
+
+QUERY_MAX_CHARS = 256
+DOC_MAX_CHARS = 512
+PREDICT_BATCH_SIZE = 32
+
+# Rerank 输入单元：(query, full_name, card_text)
+RerankItem = Tuple[str, str, str]
+
+
+class CardTokenCache:
+    """
+    表卡片预分词缓存
+    catalog 文本只在 ETL 时变化，Rerank 时每个候选都重新分词 text[:512] 纯属浪费。
+    启动时把所有卡片分词好 (key = full_name，整体绑定 catalog 版本)，
+    线上只需要对 query 分词，再用缓存的 doc ids 拼 pair 输入。
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, List[int]] = {}
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        # 重建串行化：版本切换时多个 Rerank 批并发进来，只让一个去全量分词，其余等它建完直接用
+        self._build_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, tokenizer, cards: Sequence[Dict[str, Any]], version: str) -> None:
+        names = [c["full_name"] for c in cards]
+        texts = [(c.get("text") or "")[:DOC_MAX_CHARS] for c in cards]
+        encoded = tokenizer(texts, add_special_tokens=False)["input_ids"] if texts else []
+        with self._lock:
+            self._ids = dict(zip(names, encoded))
+            self._version = version
+        logger.info(f"🧩 [Rerank] Pre-tokenized {len(self._ids)} cards (catalog={version})")
+
+    def ensure(self, tokenizer) -> None:
+        version = get_catalog_version()
+        if self._version != version:
+            with self._build_lock:
+                if self._version != version:
+                    self.build(tokenizer, load_catalog_cards(), version)
+
+    def get(self, tokenizer, full_name: str, text: str) -> List[int]:
+        ids = self._ids.get(full_name)
+        if ids is not None:
+            self.hits += 1
+            return ids
+        # 不在 catalog 里的卡片 (如 Milvus 里的新表还没同步到本地文件)：现场分词并补进缓存
+        self.misses += 1
+        ids = tokenizer((text or "")[:DOC_MAX_CHARS], add_special_tokens=False)["input_ids"]
+        with self._lock:
+            self._ids[full_name] = ids
+        return ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {"version": self._version, "size": len(self._ids), "hits": self.hits, "misses": self.misses}
+
+
+_card_tokens = CardTokenCache()
+
+
+def get_card_token_cache() -> CardTokenCache:
+    return _card_tokens
+
+
+def _truncate_longest_first(q: List[int], d: List[int], budget: int) -> Tuple[List[int], List[int]]:
+    """与 tokenizer(truncation=True) 默认的 longest_first 策略一致：每次从更长的一侧砍一个"""
+    q, d = list(q), list(d)
+    while len(q) + len(d) > budget:
+        if len(d) >= len(q):
+            d.pop()
+        else:
+            q.pop()
+    return q, d
+
+
+_templates: Dict[int, Dict[str, List[int]]] = {}
+
+
+def _pair_template(tokenizer) -> Dict[str, List[int]]:
+    """
+    推导 pair 输入的特殊 token 模板 (BERT: [CLS] q [SEP] d [SEP] / XLM-R: <s> q </s></s> d </s>)
+    用两个 unk 占位编码一次，定位出前缀 / 中间 / 后缀，不依赖各版本 transformers 的私有拼接 API
+    """
+    tpl = _templates.get(id(tokenizer))
+    if tpl is not None:
+        return tpl
+
+    unk = tokenizer.unk_token_id
+    enc = tokenizer(tokenizer.unk_token, tokenizer.unk_token)
+    ids = list(enc["input_ids"])
+    i1 = ids.index(unk)
+    i2 = ids.index(unk, i1 + 1)
+    tt = list(enc.get("token_type_ids") or [0] * len(ids))
+    tpl = {
+        "prefix": ids[:i1], "middle": ids[i1 + 1:i2], "suffix": ids[i2 + 1:],
+        "tt_prefix": tt[:i1], "tt_middle": tt[i1 + 1:i2], "tt_suffix": tt[i2 + 1:],
+        "tt_q": [tt[i1]], "tt_d": [tt[i2]],
+    }
+    _templates[id(tokenizer)] = tpl
+    return tpl
+
+
+def _activation(model):
+    # 兼容 sentence-transformers 各版本的属性名 (v2: default_activation_function / v3: activation_fct)
+    for attr in ("activation_fn", "activation_fct", "default_activation_function"):
+        fn = getattr(model, attr, None)
+        if fn is not None:
+            return fn
+    import torch
+    return torch.sigmoid
+
+
+def predict_pretokenized(model, items: Sequence[RerankItem]) -> List[float]:
+    """
+    等价于 CrossEncoder.predict([[q[:256], text[:512]], ...])，但 doc 侧复用缓存的 token ids
+    同时支持 torch CrossEncoder 与 OnnxCrossEncoder (有 score_features 方法)
+    """
+    tokenizer = model.tokenizer
+    _card_tokens.ensure(tokenizer)
+
+    max_len = int(getattr(model, "max_length", None) or min(tokenizer.model_max_length, 512))
+    tpl = _pair_template(tokenizer)
+    budget = max_len - len(tpl["prefix"]) - len(tpl["middle"]) - len(tpl["suffix"])
+    use_token_types = "token_type_ids" in getattr(tokenizer, "model_input_names", [])
+
+    # 同一批里 query 往往重复 (同一个请求的 20 个候选)，分词一次即可
+    q_cache: Dict[str, List[int]] = {}
+    features = []
+    for query, full_name, text in items:
+        q = query[:QUERY_MAX_CHARS]
+        q_ids = q_cache.get(q)
+        if q_ids is None:
+            q_ids = tokenizer(q, add_special_tokens=False)["input_ids"]
+            q_cache[q] = q_ids
+        d_ids = _card_tokens.get(tokenizer, full_name, text)
+
+        q_ids_t, d_ids_t = _truncate_longest_first(q_ids, d_ids, budget)
+        feat = {"input_ids": tpl["prefix"] + q_ids_t + tpl["middle"] + d_ids_t + tpl["suffix"]}
+        if use_token_types:
+            feat["token_type_ids"] = (tpl["tt_prefix"] + tpl["tt_q"] * len(q_ids_t) + tpl["tt_middle"]
+                                      + tpl["tt_d"] * len(d_ids_t) + tpl["tt_suffix"])
+        features.append(feat)
+
+    scores: List[float] = []
+
+    # ONNX 后端：numpy 输入，直接跑 session
+    if hasattr(model, "score_features"):
+        for start in range(0, len(features), PREDICT_BATCH_SIZE):
+            batch = tokenizer.pad(features[start:start + PREDICT_BATCH_SIZE], return_tensors="np")
+            scores.extend(float(x) for x in model.score_features(dict(batch)))
+        return scores
+
+    import torch
+
+    device = getattr(model, "device", None) or getattr(model, "_target_device", None) or "cpu"
+    activation = _activation(model)
+
+    model.model.eval()
+    with torch.no_grad():
+        for start in range(0, len(features), PREDICT_BATCH_SIZE):
+            batch = tokenizer.pad(features[start:start + PREDICT_BATCH_SIZE], return_tensors="pt")
+            batch = {k: v.to(device) for k, v in batch.items()}
+            logits = model.model(**batch, return_dict=True).logits
+            out = activation(logits)
+            if out.dim() > 1 and out.shape[-1] == 1:
+                out = out.squeeze(-1)
+            scores.extend(float(x) for x in out.detach().cpu().reshape(-1).tolist())
+    return scores
@@ -0,0 +1,70 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# 与 prompts.py 中 TableCard 打标的 risk_level 取值一致，按敏感程度递增
+RISK_LEVELS = ("normal", "sensitive", "forbidden")
+
+
+def _freeze(values: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    if values is None:
+        return None
+    return tuple(sorted({v for v in values if v}))
+
+
+@dataclass(frozen=True)
+class RetrievalScope:
+    """
+    单个用户的检索权限范围，下推到 ANN 检索里做过滤 (而不是召回后再丢弃)
+    - allowed_domains: None 表示不限；空集合表示什么都看不到
+    - max_risk_level:  只允许 <= 该等级的表 (normal < sensitive < forbidden)，None 表示不限
+    - table_types:     可选的表类型白名单 (fact / dim / log ...)
+    """
+    allowed_domains: Optional[Tuple[str, ...]] = None
+    max_risk_level: Optional[str] = None
+    table_types: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def build(cls, allowed_domains: Optional[Iterable[str]] = None, max_risk_level: Optional[str] = None,
+              table_types: Optional[Iterable[str]] = None) -> Optional["RetrievalScope"]:
+        """参数全为空时返回 None (不过滤)，调用方可以直接透传"""
+        if max_risk_level is not None and max_risk_level not in RISK_LEVELS:
+            raise ValueError(f"Unknown risk level '{max_risk_level}', expected one of {RISK_LEVELS}")
+        scope = cls(_freeze(allowed_domains), max_risk_level, _freeze(table_types))
+        return None if scope.is_unrestricted else scope
+
+    @property
+    def is_unrestricted(self) -> bool:
+        return self.allowed_domains is None and self.max_risk_level is None and self.table_types is None
+
+    @property
+    def is_empty(self) -> bool:
+        """白名单为空集合：不可能命中任何表，直接短路"""
+        return self.allowed_domains == () or self.table_types == ()
+
+    def allowed_risk_levels(self) -> Optional[Tuple[str, ...]]:
+        if self.max_risk_level is None:
+            return None
+        return RISK_LEVELS[:RISK_LEVELS.index(self.max_risk_level) + 1]
+
+    def _conditions(self) -> Dict[str, Tuple[str, ...]]:
+        conds = {
+            "domain": self.allowed_domains,
+            "risk_level": self.allowed_risk_levels(),
+            "table_type": self.table_types,
+        }
+        return {field: values for field, values in conds.items() if values is not None}
+
+    def to_milvus_expr(self) -> str:
+        """布尔表达式，如: domain in ["payment", "marketing"] and risk_level in ["normal"]"""
+        return " and ".join(
+            f"{field} in {json.dumps(list(values), ensure_ascii=False)}"
+            for field, values in self._conditions().items()
+        )
+
+    def matches(self, card: Dict[str, Any]) -> bool:
+        """与 to_milvus_expr 等价的内存判断 (本地索引 / BM25 用)"""
+        return all(card.get(field) in values for field, values in self._conditions().items())
+
+    def cache_key(self) -> str:
+        return self.to_milvus_expr()
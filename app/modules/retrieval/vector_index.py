@@ -0,0 +1,241 @@
+import datetime
+import json
+import mmap
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.modules.retrieval.catalog import file_sha256, get_catalog_version
+from app.modules.retrieval.scope import RetrievalScope
+
+INDEX_DIR = settings.LOCAL_INDEX_DIR
+EMBEDDINGS_FILE = "embeddings.npy"
+CARDS_FILE = "cards.jsonl"
+OFFSETS_FILE = "card_offsets.npy"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 1
+
+# 与 Milvus collection 保持一致的元数据字段 (embedding 单独存 .npy)
+CARD_FIELDS = ["full_name", "db", "logical_table", "domain", "risk_level", "table_type", "text"]
+# 常驻内存的轻量字段 (过滤 / 返回用)；text 按需从 mmap 的 cards.jsonl 里切出来
+META_FIELDS = [f for f in CARD_FIELDS if f != "text"]
+
+
+def save_local_index(entries: List[Dict[str, Any]], embeddings: np.ndarray, index_dir: str = INDEX_DIR) -> str:
+    """
+    由 ETL (index_schema_to_milvus.py) 调用：
+    - embeddings.npy:    (N, dim) float32，行号与 cards.jsonl 一一对应
+    - cards.jsonl:       每行一张表卡片的元数据
+    - card_offsets.npy:  (N + 1,) int64，第 i 张卡片在 cards.jsonl 中的字节区间 [off[i], off[i+1])
+    - manifest.json:     行数 / 维度 / 各文件 sha256，最后写入，作为整份产物的提交点
+    先写临时文件再 rename，在线进程不会读到写了一半的文件
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.shape[0] != len(entries):
+        raise ValueError(f"embeddings rows ({matrix.shape[0]}) != cards ({len(entries)})")
+
+    paths = {name: os.path.join(index_dir, name) for name in (EMBEDDINGS_FILE, CARDS_FILE, OFFSETS_FILE)}
+
+    with open(paths[EMBEDDINGS_FILE] + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    offsets = [0]
+    with open(paths[CARDS_FILE] + ".tmp", "wb") as f:
+        for e in entries:
+            line = (json.dumps({k: e.get(k, "") for k in CARD_FIELDS}, ensure_ascii=False) + "\n").encode("utf-8")
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    with open(paths[OFFSETS_FILE] + ".tmp", "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64))
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "rows": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "dtype": "float32",
+        "built_at": datetime.datetime.utcnow().isoformat(),
+        "files": {
+            name: {"sha256": file_sha256(path + ".tmp"), "bytes": os.path.getsize(path + ".tmp")}
+            for name, path in paths.items()
+        },
+    }
+    for path in paths.values():
+        os.replace(path + ".tmp", path)
+
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return index_dir
+
+
+def _verify_manifest(index_dir: str, manifest: Dict[str, Any], checksum: bool) -> None:
+    """文件大小总是校验；checksum=True 时再逐个比对 sha256 (顺带把文件读进 page cache)"""
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"Local index manifest format {manifest.get('format')} != {MANIFEST_FORMAT}")
+    for name, meta in manifest.get("files", {}).items():
+        path = os.path.join(index_dir, name)
+        size = os.path.getsize(path)
+        if size != meta["bytes"]:
+            raise ValueError(f"Local index corrupted: {name} is {size} bytes, manifest says {meta['bytes']}")
+        if checksum and file_sha256(path) != meta["sha256"]:
+            raise ValueError(f"Local index corrupted: {name} sha256 mismatch")
+
+
+class LocalVectorIndex:
+    """
+    进程内向量索引 (Brute-Force IP)
+    几百~几千张表的 catalog 用不着 ANN：一次矩阵-向量乘法 + argpartition 就是精确 TopK，
+    且省掉了到 Milvus 的 gRPC 往返。
+    多个 uvicorn worker 各自 mmap 同一份 embeddings.npy / cards.jsonl，只读映射由 OS page cache
+    共享一份物理内存；进程内只常驻轻量元数据，卡片正文只在命中 TopK 时按偏移切出来。
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR, verify: bool = settings.LOCAL_INDEX_VERIFY):
+        self.index_dir = index_dir
+        emb_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+        cards_path = os.path.join(index_dir, CARDS_FILE)
+        offsets_path = os.path.join(index_dir, OFFSETS_FILE)
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+
+        self.manifest: Optional[Dict[str, Any]] = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            _verify_manifest(index_dir, self.manifest, checksum=verify)
+        else:
+            logger.warning(f"⚠️ Local index at {index_dir} has no {MANIFEST_FILE}; loading unverified (re-run ETL)")
+
+        matrix = np.load(emb_path, mmap_mode="r")
+        if matrix.dtype != np.float32 or not matrix.flags["C_CONTIGUOUS"]:
+            # 拷贝后就不再是共享映射了，只为兼容旧产物
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.embeddings = matrix
+
+        with open(cards_path, "rb") as f:
+            self._cards_buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(cards_path) else b""
+        if os.path.exists(offsets_path):
+            self._offsets = np.load(offsets_path, mmap_mode="r")
+        else:
+            # 旧产物没有偏移文件：扫一遍换行符现算
+            newlines = np.flatnonzero(np.frombuffer(self._cards_buf, dtype=np.uint8) == ord("\n")) + 1
+            self._offsets = np.concatenate([[0], newlines]).astype(np.int64)
+
+        n_rows = len(self._offsets) - 1
+        if n_rows != self.embeddings.shape[0]:
+            raise ValueError(f"Local index corrupted: {n_rows} cards vs {self.embeddings.shape[0]} vectors")
+        if self.manifest and (self.manifest["rows"], self.manifest["dim"]) != (n_rows, self.dim):
+            raise ValueError(f"Local index corrupted: shape ({n_rows}, {self.dim}) != manifest "
+                             f"({self.manifest['rows']}, {self.manifest['dim']})")
+
+        self.cards: List[Dict[str, Any]] = []
+        for i in range(n_rows):
+            card = self._read_card(i)
+            self.cards.append({k: card.get(k, "") for k in META_FIELDS})
+
+        # 权限范围 -> 行掩码，同一租户的 scope 反复出现，算一次即可
+        self._masks: Dict[str, np.ndarray] = {}
+
+    def _read_card(self, i: int) -> Dict[str, Any]:
+        return json.loads(self._cards_buf[int(self._offsets[i]):int(self._offsets[i + 1])])
+
+    def text(self, i: int) -> str:
+        return self._read_card(i).get("text") or ""
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    @property
+    def dim(self) -> int:
+        return int(self.embeddings.shape[1]) if self.embeddings.ndim == 2 else 0
+
+    def _mask(self, scope: RetrievalScope) -> np.ndarray:
+        key = scope.cache_key()
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((scope.matches(c) for c in self.cards), dtype=bool, count=len(self.cards))
+            self._masks[key] = mask
+        return mask
+
+    def search(self, query_vec, limit: int, scope: Optional[RetrievalScope] = None) -> List[Dict[str, Any]]:
+        """
+        返回按内积降序的 TopK，字段与 Milvus 召回结果一致 (score + 卡片元数据，不含 text)，另带行号 row
+        scope: 与 Milvus expr 等价的过滤，被排除的行分数置为 -inf，不占 TopK 名额
+        """
+        return self.search_many([query_vec], limit, scope)[0]
+
+    def search_many(self, query_vecs, limit: int,
+                    scope: Optional[RetrievalScope] = None) -> List[List[Dict[str, Any]]]:
+        """多个 query 一次矩阵乘法 (N, dim) @ (dim, Q)，每个 query 各自取 TopK"""
+        n = len(self.cards)
+        if n == 0 or limit <= 0 or len(query_vecs) == 0:
+            return [[] for _ in query_vecs]
+
+        q = np.asarray(query_vecs, dtype=np.float32).reshape(len(query_vecs), -1)
+        scores = q @ self.embeddings.T
+
+        if scope is not None:
+            mask = self._mask(scope)
+            n = int(mask.sum())
+            if n == 0:
+                return [[] for _ in query_vecs]
+            scores = np.where(mask[None, :], scores, -np.inf)
+
+        k = min(int(limit), n)
+        results = []
+        for row in scores:
+            if k < len(row):
+                top_idx = np.argpartition(-row, k - 1)[:k]
+            else:
+                top_idx = np.arange(len(row))
+            top_idx = top_idx[np.argsort(-row[top_idx], kind="stable")]
+            # 只返回常驻元数据 + 行号；正文由调用方只对 Rerank 池按行号 text(i) 取 (两阶段召回)
+            results.append([{**self.cards[i], "row": int(i), "score": float(row[i])} for i in top_idx])
+        return results
+
+
+_index: Optional[LocalVectorIndex] = None
+_index_version: Optional[str] = None
+_index_lock = threading.Lock()
+# 重新加载失败 (产物还没写完 / 校验不过) 时继续用旧索引，同一版本隔一段时间再重试
+_RELOAD_RETRY_S = 30.0
+_failed_version: Optional[str] = None
+_failed_at = 0.0
+
+
+def local_index_current() -> bool:
+    """已加载且与当前 catalog 版本一致：get_local_index() 只走无锁快路径，可以直接在事件循环里调用"""
+    return _index is not None and _index_version == get_catalog_version()
+
+
+def get_local_index() -> LocalVectorIndex:
+    """catalog 版本变化 (ETL 重跑) 时自动重新加载，与 BM25 / 词法索引同步换代"""
+    global _index, _index_version, _failed_version, _failed_at
+    version = get_catalog_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                if (_index is not None and _failed_version == version
+                        and time.monotonic() - _failed_at < _RELOAD_RETRY_S):
+                    return _index
+                logger.info(f"🧭 Loading local vector index from {INDEX_DIR}...")
+                t0 = time.perf_counter()
+                try:
+                    index = LocalVectorIndex(INDEX_DIR)
+                except Exception as e:
+                    if _index is None:
+                        raise
+                    _failed_version, _failed_at = version, time.monotonic()
+                    logger.error(f"❌ Local vector index reload failed (version={version}), "
+                                 f"keep serving previous version {_index_version}: {e}")
+                    return _index
+                _index, _index_version, _failed_version = index, version, None
+                verified = "sha256 verified" if _index.manifest and settings.LOCAL_INDEX_VERIFY else "unverified"
+                logger.info(f"✅ Local vector index loaded: {len(_index)} cards, dim={_index.dim} "
+                            f"({verified}, {(time.perf_counter() - t0) * 1000:.0f}ms, version={version})")
+    return _index
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.api.v1.retrieve_tables import embed_query, get_embed_model
+from app.core.config import settings
+from app.core.executors import EMBED_POOL, get_pool
+from app.core.logger import logger
+from app.modules.retrieval.cache import normalize_query
+from app.modules.sql.executor import LOG_PATH as AUDIT_LOG_PATH
+
+DATA_QUERY = "DATA_QUERY"
+KNOWLEDGE_SEARCH = "KNOWLEDGE_SEARCH"
+CHAT = "CHAT"
+LABELS = (DATA_QUERY, KNOWLEDGE_SEARCH, CHAT)
+
+# 内置原型库：与 ROUTER_PROMPT 的三类定义一一对应；可用 ROUTER_PROTOTYPES_PATH 追加
+DEFAULT_PROTOTYPES: Dict[str, List[str]] = {
+    DATA_QUERY: [
+        "统计最近一个月的订单量",
+        "查询所有订单的支付总金额",
+        "昨天新注册了多少用户",
+        "列出销量前10的商品",
+        "查看用户 10086 的手机号和注册时间",
+        "各渠道本月的退款金额是多少",
+        "上周每天的活跃用户数",
+        "库存低于100的 SKU 有哪些",
+        "按省份统计今年的 GMV",
+        "查一下最近7天的支付成功率",
+        "优惠券的核销数量和核销率",
+        "购物车里商品数量最多的用户",
+        "平均客单价按月的趋势",
+        "有多少订单还没发货",
+        "导出上个月的售后工单明细",
+    ],
+    KNOWLEDGE_SEARCH: [
+        "ERROR 1064 是什么错误，怎么解决",
+        "MySQL 的 innodb_buffer_pool_size 怎么配置",
+        "索引失效有哪些常见原因",
+        "left join 和 inner join 有什么区别",
+        "什么是数据库的事务隔离级别",
+        "Deadlock found when trying to get lock 怎么处理",
+        "如何优化慢查询",
+        "分库分表的原理是什么",
+        "Milvus 的 IVF_FLAT 索引是什么",
+        "SQL 里 group by 和 having 怎么用",
+        "主从复制延迟怎么排查",
+        "连接数过多 Too many connections 报错",
+    ],
+    CHAT: [
+        "你好",
+        "谢谢你",
+        "你是谁",
+        "再见",
+        "早上好呀",
+        "好的，明白了",
+        "你能做什么",
+        "辛苦了",
+        "哈哈哈",
+        "今天心情不错",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    intent: str
+    confidence: float  # 各类最高相似度做温度 softmax 后 top1 的概率
+    margin: float  # top1 与 top2 相似度之差
+    scores: Dict[str, float] = field(default_factory=dict)
+    nearest: str = ""  # 贡献 top1 分数的原型问题，方便排查误判
+
+    @property
+    def confident(self) -> bool:
+        # 三个条件缺一不可：离所有原型都很远时，softmax 照样能因为微小的类间差给出高置信度
+        return (
+            self.confidence >= settings.SEMANTIC_ROUTER_MIN_CONFIDENCE
+            and self.scores.get(self.intent, -1.0) >= settings.SEMANTIC_ROUTER_MIN_SIMILARITY
+            and self.margin >= settings.SEMANTIC_ROUTER_MIN_MARGIN
+        )
+
+
+def load_prototype_file(path: str) -> Dict[str, List[str]]:
+    """JSONL：每行 {"label": "DATA_QUERY", "text": "..."}，未知 label 忽略"""
+    protos: Dict[str, List[str]] = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if row.get("label") in LABELS and row.get("text"):
+                protos[row["label"]].append(row["text"])
+    return protos
+
+
+def mine_audit_log(path: str, limit: int = 200) -> List[str]:
+    """
+    从审计日志挖 DATA_QUERY 原型：同一个 trace 里 USER_INPUT 的问题 + 执行成功的 QUERY
+    只挖正例 (真的查到了库)，闲聊 / 知识类没有可靠的落库信号，仍以内置原型为准
+    """
+    questions: Dict[str, str] = {}
+    succeeded = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                ev = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            trace_id = ev.get("trace_id")
+            if not trace_id:
+                continue
+            if ev.get("route") == "USER_INPUT" and ev.get("sql"):
+                questions[trace_id] = ev["sql"]
+            elif ev.get("route") == "QUERY" and not ev.get("error"):
+                succeeded.add(trace_id)
+
+    mined: Dict[str, str] = {}
+    # 越新的越有代表性：倒序取，按归一化文本去重
+    for trace_id in reversed(list(questions)):
+        if trace_id in succeeded:
+            mined.setdefault(normalize_query(questions[trace_id]), questions[trace_id])
+        if len(mined) >= limit:
+            break
+    return list(mined.values())
+
+
+class SemanticRouter:
+    """
+    原型向量路由：每类若干例句 (原型)，query 与每类原型的最高余弦相似度即该类得分
+    - 复用已加载的 bge-m3 (embedding 走检索同一套缓存 / 微批)，分类本身只是一次小矩阵乘法
+    - 置信度 = 各类得分做温度 softmax 后 top1 的概率；只有置信度、top1 绝对相似度、领先幅度都过线
+      才直接采纳 (RouteDecision.confident)，否则交给 LLM Router
+    """
+
+    def __init__(self, prototypes: Dict[str, Sequence[str]], embeddings: np.ndarray,
+                 temperature: float = 0.05):
+        self.texts: List[str] = []
+        labels: List[int] = []
+        for li, label in enumerate(LABELS):
+            for text in prototypes.get(label, []):
+                self.texts.append(text)
+                labels.append(li)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.matrix.shape[0] != len(self.texts):
+            raise ValueError(f"prototype embeddings ({self.matrix.shape[0]}) != prototypes ({len(self.texts)})")
+        self.temperature = max(1e-4, float(temperature))
+
+    @classmethod
+    def build(cls, prototypes: Dict[str, Sequence[str]], encode: Callable[[List[str]], np.ndarray],
+              temperature: float = 0.05) -> "SemanticRouter":
+        texts = [t for label in LABELS for t in prototypes.get(label, [])]
+        return cls(prototypes, encode(texts), temperature)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def classify(self, query_vec) -> RouteDecision:
+        sims = self.matrix @ np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        per_label = np.full(len(LABELS), -1.0, dtype=np.float32)
+        nearest_idx = [-1] * len(LABELS)
+        for li in range(len(LABELS)):
+            idx = np.flatnonzero(self.labels == li)
+            if len(idx):
+                best = idx[int(np.argmax(sims[idx]))]
+                per_label[li] = sims[best]
+                nearest_idx[li] = int(best)
+
+        order = np.argsort(-per_label)
+        top, second = int(order[0]), int(order[1])
+        logits = (per_label - per_label[top]) / self.temperature
+        probs = np.exp(logits) / np.exp(logits).sum()
+        return RouteDecision(
+            intent=LABELS[top],
+            confidence=round(float(probs[top]), 4),
+            margin=round(float(per_label[top] - per_label[second]), 4),
+            scores={label: round(float(per_label[i]), 4) for i, label in enumerate(LABELS)},
+            nearest=self.texts[nearest_idx[top]] if nearest_idx[top] >= 0 else "",
+        )
+
+
+def collect_prototypes() -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+    """内置原型 + 原型文件 + (可选) 审计日志挖掘，返回 (原型, 各来源条数)"""
+    protos: Dict[str, List[str]] = {label: list(texts) for label, texts in DEFAULT_PROTOTYPES.items()}
+    counts = {"default": sum(len(v) for v in protos.values()), "file": 0, "audit_log": 0}
+
+    path = settings.ROUTER_PROTOTYPES_PATH
+    if path and os.path.exists(path):
+        for label, texts in load_prototype_file(path).items():
+            protos[label].extend(texts)
+            counts["file"] += len(texts)
+
+    if settings.SEMANTIC_ROUTER_MINE_AUDIT_LOG and os.path.exists(AUDIT_LOG_PATH):
+        mined = mine_audit_log(AUDIT_LOG_PATH, settings.SEMANTIC_ROUTER_MINED_MAX)
+        protos[DATA_QUERY].extend(mined)
+        counts["audit_log"] = len(mined)
+
+    # 去重；同一句话被标进多个类时只保留在 LABELS 顺序靠前的那一类
+    seen = set()
+    for label in LABELS:
+        uniq = []
+        for t in protos[label]:
+            key = normalize_query(t)
+            if key and key not in seen:
+                seen.add(key)
+                uniq.append(t)
+        protos[label] = uniq
+    return protos, counts
+
+
+_router: Optional[SemanticRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_semantic_router() -> SemanticRouter:
+    """首次调用时用 embedding 模型编码原型库 (阻塞，建议在启动预热 / 推理线程池里调用)"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                model = get_embed_model()
+                protos, counts = collect_prototypes()
+                _router = SemanticRouter.build(
+                    protos,
+                    lambda texts: model.encode(texts, normalize_embeddings=True),
+                    temperature=settings.SEMANTIC_ROUTER_TEMPERATURE,
+                )
+                logger.info(f"🧭 Semantic router built: {len(_router)} prototypes {counts}")
+    return _router
+
+
+async def semantic_route(question: str) -> Optional[RouteDecision]:
+    """embedding 原型路由；未启用或失败返回 None (调用方回退 LLM Router)"""
+    if not settings.SEMANTIC_ROUTER_ENABLED or not question:
+        return None
+    try:
+        router = _router or await asyncio.get_running_loop().run_in_executor(get_pool(EMBED_POOL), get_semantic_router)
+        return router.classify(await embed_query(question))
+    except Exception as e:
+        logger.warning(f"⚠️ [SemanticRouter] Skipped: {e}")
+        return None
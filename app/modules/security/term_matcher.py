@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# 默认词典：词典文件不存在时兜底 (与历史硬编码列表一致)
+DEFAULT_SENSITIVE_TERMS = ["工资", "薪水", "底薪", "密码", "密钥", "token", "salary", "password"]
+DEFAULT_SQL_DENY_TERMS = [
+    "insert", "update", "delete", "drop", "alter", "truncate", "create", "replace",
+    "grant", "revoke", "commit", "rollback", "set", "call", "load", "outfile", "dumpfile"
+]
+
+
+def _is_word_char(ch: str) -> bool:
+    # 与 re 的 \w 一致 (Unicode 字母数字 + 下划线)
+    return ch.isalnum() or ch == "_"
+
+
+class TermMatcher:
+    """
+    Aho-Corasick 多模式匹配 (忽略大小写)
+    构建一次 O(词典总长)，匹配 O(文本长度 + 命中数)，与词典大小无关；
+    替代 "for kw in KEYWORDS: if kw in text" 这种随词典线性变慢的循环
+    - whole_word=True: 命中两侧必须是单词边界 (等价于 \\bkw\\b，避免误伤字段名)
+    """
+
+    def __init__(self, terms: Iterable[str], whole_word: bool = False):
+        self.whole_word = whole_word
+        seen: Dict[str, str] = {}
+        for t in terms:
+            t = (t or "").strip()
+            if t and t.lower() not in seen:
+                seen[t.lower()] = t
+        self.terms: Tuple[str, ...] = tuple(seen.values())
+
+        # trie: goto[node] = {char: child}；out[node] = 以该节点结尾的词 id (含 fail 链上的)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for idx, key in enumerate(seen):
+            node = 0
+            for ch in key:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(idx)
+        self._lengths = [len(k) for k in seen]
+        self._build_fail_links()
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """按命中结束位置依次产出 (起始下标, 词典原词)"""
+        if not text or not self.terms:
+            return
+        low = text.lower()
+        if len(low) != len(text):
+            # 极少数字符 lower() 后长度会变 (如 'İ')，边界判断改用 lower 后的文本
+            text = low
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(low):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                start = i - self._lengths[idx] + 1
+                if self.whole_word and (
+                        (start > 0 and _is_word_char(text[start - 1]))
+                        or (i + 1 < len(text) and _is_word_char(text[i + 1]))):
+                    continue
+                yield start, self.terms[idx]
+
+    def find_first(self, text: str) -> Optional[str]:
+        for _, term in self.finditer(text):
+            return term
+        return None
+
+    def find_all(self, text: str) -> List[str]:
+        """去重后的命中词 (按首次出现顺序)"""
+        return list(dict.fromkeys(term for _, term in self.finditer(text)))
+
+
+def _stat_sig(path: str) -> Tuple:
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None, None
+
+
+def read_terms(path: str) -> List[str]:
+    """词典文件：一行一个词，空行与 # 开头的行忽略"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class TermDictionary:
+    """
+    可热加载的词典：每次取 matcher 时做一次 stat()，文件签名 (mtime/size) 变化才重建自动机
+    文件不存在时使用内置默认词；文件读坏时保留旧自动机，不让一次错误编辑放开拦截
+    """
+
+    def __init__(self, name: str, path: str, defaults: Sequence[str], whole_word: bool = False):
+        self.name = name
+        self.path = path
+        self.defaults = list(defaults)
+        self.whole_word = whole_word
+        self._lock = threading.Lock()
+        self._sig: Optional[Tuple] = None
+        self._matcher: Optional[TermMatcher] = None
+        self._source = "default"
+        self._loaded_at: Optional[float] = None
+        self.reloads = 0
+
+    def matcher(self) -> TermMatcher:
+        sig = _stat_sig(self.path)
+        if sig == self._sig and self._matcher is not None:
+            return self._matcher
+        with self._lock:
+            if sig != self._sig or self._matcher is None:
+                self._load(sig)
+        return self._matcher
+
+    def _load(self, sig: Tuple) -> None:
+        if sig == (None, None):
+            terms, source = self.defaults, "default"
+        else:
+            try:
+                terms, source = read_terms(self.path), self.path
+            except Exception as e:
+                logger.error(f"❌ [Terms] Failed to load {self.name} from {self.path}: {e}")
+                if self._matcher is None:
+                    self._matcher = TermMatcher(self.defaults, self.whole_word)
+                self._sig = sig
+                return
+
+        t0 = time.perf_counter()
+        self._matcher = TermMatcher(terms, self.whole_word)
+        self._sig = sig
+        self._source = source
+        self._loaded_at = time.time()
+        self.reloads += 1
+        logger.info(f"🔁 [Terms] {self.name}: {len(self._matcher)} terms from {source} "
+                    f"({(time.perf_counter() - t0) * 1000:.1f}ms)")
+
+    def find_first(self, text: str) -> Optional[str]:
+        return self.matcher().find_first(text)
+
+    def find_all(self, text: str) -> List[str]:
+        return self.matcher().find_all(text)
+
+    def stats(self) -> Dict[str, Any]:
+        matcher = self.matcher()
+        return {"size": len(matcher), "source": self._source, "loaded_at": self._loaded_at, "reloads": self.reloads}
+
+
+# =========================
+# Shared dictionaries
+# =========================
+# sensitive: 检索入口的合规拦截 (子串匹配，中文没有词边界)
+# sql_deny:  SQL Guardrail 的禁用关键字 (整词匹配，避免误伤 updated_at 之类的字段名)
+sensitive_terms = TermDictionary("sensitive", settings.SENSITIVE_TERMS_PATH, DEFAULT_SENSITIVE_TERMS)
+sql_deny_terms = TermDictionary("sql_deny", settings.SQL_DENY_TERMS_PATH, DEFAULT_SQL_DENY_TERMS, whole_word=True)
@@ -1,11 +1,7 @@
 import re
 from dataclasses import dataclass
 from app.core.config import settings
-
-DENY_KEYWORDS = [
-    "insert", "update", "delete", "drop", "alter", "truncate", "create", "replace",
-    "grant", "revoke", "commit", "rollback", "set", "call", "load", "outfile", "dumpfile"
-]
+from app.modules.security.term_matcher import sql_deny_terms
 
 @dataclass
 class GuardrailResult:
@@ -40,12 +36,8 @@ def _is_select(sql: str) -> bool:
     return s.startswith("select ")
 
 def _contains_deny(sql: str) -> str | None:
-    low = sql.lower()
-    for kw in DENY_KEYWORDS:
-        # 单词边界，避免误伤字段名
-        if re.search(rf"\b{re.escape(kw)}\b", low):
-            return kw
-    return None
+    # 整词匹配 (单词边界)，避免误伤字段名；词典见 settings.SQL_DENY_TERMS_PATH
+    return sql_deny_terms.find_first(sql)
 
 def _rewrite_limit(sql: str) -> tuple[str, bool]:
     """
@@ -1,8 +1,7 @@
 import uuid
 import asyncio
-import re
 import json
-from typing import Dict, Any, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 # LangChain 组件
 from langchain_core.messages import HumanMessage
@@ -14,8 +13,41 @@ from app.core.prompts import DATA_SUMMARY_PROMPT
 
 # 核心图与组件
 import app.core.master_graph as mg
+from app.api.v1.retrieve_tables import embed_query
+from app.core.executors import DB_IO_POOL, get_pool
+from app.modules.security.term_matcher import TermMatcher
 from app.modules.sql.executor import execute_select
 from app.core.logger import logger
+from app.services.answer_cache import answer_cache, context_hash
+
+# 写操作 / 权限类关键字 (整词匹配，大小写不敏感)
+_DANGEROUS_SQL = TermMatcher(
+    ["DROP", "DELETE", "UPDATE", "INSERT", "ALTER", "TRUNCATE", "GRANT", "REVOKE"], whole_word=True
+)
+
+# 这些节点的 LLM 输出就是给用户的回复，流式接口逐 token 推送；其余节点 (Router / 生成 SQL) 只推结束事件
+_STREAMED_REPLY_NODES = {"chat_agent", "search_agent"}
+# 返回 / 交给 Analyst 的预览行数，完整结果只统计条数
+DISPLAY_LIMIT = 5
+# 节点结束事件里透出的状态字段 (其余如 table_columns / history 体积大且前端用不上)
+_NODE_EVENT_FIELDS = ("intent", "route_confidence", "search_query", "generated_sql", "reflection_passed",
+                      "validation_error", "error_type", "sentinel_blocked")
+
+
+def _node_event(node: str, output: Any) -> Dict[str, Any]:
+    """节点输出 -> 前端进度事件：检索到的表 / 生成的 SQL / 校验结果 / 本节点耗时"""
+    out = output if isinstance(output, dict) else {}
+    event: Dict[str, Any] = {"node": node}
+    for key in _NODE_EVENT_FIELDS:
+        if key in out:
+            event[key] = out[key]
+    if out.get("candidate_tables") is not None:
+        event["tables"] = [{"full_name": t.get("full_name"), "score": t.get("score")}
+                           for t in out["candidate_tables"]]
+    for t in out.get("node_timings") or []:
+        if t.get("node") == node:
+            event["ms"] = t["ms"]
+    return event
 
 
 class AgentService:
@@ -29,9 +61,59 @@ class AgentService:
             max_tokens=1024
         )
 
+    async def _answer_cache_context(self, query: str, user_id: str, config: Dict[str, Any],
+                                    has_session: bool, trace_id: str) -> Optional[Dict[str, Any]]:
+        """
+        语义答案缓存查找：问题向量 + 会话上下文 hash + 用户，命中则带回已校验过的 SQL
+        返回 None 表示缓存不可用 (关闭 / embedding 失败)，此时照常走完整流程且不回写
+        """
+        if not answer_cache.enabled:
+            return None
+        try:
+            history: list = []
+            if has_session:
+                snapshot = await mg.master_app.aget_state(config)
+                # 与 call_query_agent 传给子图的上下文窗口一致
+                history = (snapshot.values or {}).get("history", [])[-6:]
+            vec = await embed_query(query)
+        except Exception as e:
+            logger.warning(f"⚠️ [AnswerCache] Skipped: {e}", extra={"trace_id": trace_id})
+            return None
+
+        scope_key = answer_cache.scope_key(user_id, context_hash(history), query)
+        return {"scope_key": scope_key, "vec": vec, "hit": answer_cache.lookup(scope_key, vec, query)}
+
+    async def _record_cached_turn(self, config: Dict[str, Any], query: str, sql: str, trace_id: str) -> None:
+        """命中缓存时主图没跑，手动把这一轮写进会话历史，保证后续追问的上下文连续"""
+        try:
+            snapshot = await mg.master_app.aget_state(config)
+            history = (snapshot.values or {}).get("history", [])
+            await mg.master_app.aupdate_state(
+                config,
+                {"question": query, "intent": "DATA_QUERY", "final_answer": f"SQL_RESULT:{sql}",
+                 "history": history + [f"User: {query}", f"AI: Generated SQL: {sql}"]},
+                as_node="data_query_agent",
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ [AnswerCache] Failed to record turn in session history: {e}",
+                           extra={"trace_id": trace_id})
+
     async def process_query(self, query: str, user_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        处理 Agent 查询的核心业务逻辑 (已修复 Fallback 短路逻辑)
+        处理 Agent 查询的核心业务逻辑：与 /query/stream 共用 stream_query 同一条执行路径，只取最终的 done 结果
+        """
+        final_result: Dict[str, Any] = {}
+        async for ev in self.stream_query(query, user_id, session_id):
+            if ev["event"] == "done":
+                final_result = ev["data"]
+        return final_result
+
+    async def stream_query(self, query: str, user_id: str,
+                           session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        主图 astream_events 边跑边推，SSE 编码由 API 层负责 (已修复 Fallback 短路逻辑)
+        事件顺序：start -> node* (路由 / 检索 / 生成 / 校验...) -> rows -> token* -> done
+        token 是增量文本 (Analyst 解读，或闲聊 / 知识问答的回复)；done 带完整结果，即 /query 的返回
         """
         trace_id = str(uuid.uuid4())
         thread_id = session_id or str(uuid.uuid4())
@@ -48,20 +130,66 @@ class AgentService:
             "intent": "UNKNOWN",
             "steps": []
         }
+        yield {"event": "start", "data": {"trace_id": trace_id, "session_id": thread_id}}
 
         try:
             # LangGraph 配置
             config = {"configurable": {"thread_id": thread_id}}
 
             # =================================================
-            # 1. 调用 Master Graph (推理核心)
+            # 0. 语义答案缓存：近似重复的问题直接复用已校验的 SQL，跳过整张图 (意图/改写/检索/生成/反思/EXPLAIN)
             # =================================================
-            logger.info(f"🚀 [Agent] Starting graph execution for: {query}", extra={"trace_id": trace_id})
+            cache_ctx = await self._answer_cache_context(query, user_id, config, session_id is not None, trace_id)
+            hit = cache_ctx["hit"] if cache_ctx is not None else None
+            if cache_ctx is not None:
+                final_result["answer_cache"] = {"hit": False}
+            if hit is not None:
+                logger.info(f"⚡ [AnswerCache] Hit (sim={hit['similarity']}) <- '{hit['question']}'",
+                            extra={"trace_id": trace_id})
+                final_result["intent"] = "DATA_QUERY"
+                final_result["sql"] = hit["sql"]
+                final_result["answer_cache"] = {"hit": True, "similarity": hit["similarity"],
+                                                "question": hit["question"]}
+                steps = [f"AnswerCache: reuse SQL of '{hit['question']}' (similarity={hit['similarity']})"]
+                final_result["steps"] = steps
+                yield {"event": "node", "data": {"node": "answer_cache", "sql": hit["sql"],
+                                                 "similarity": hit["similarity"], "question": hit["question"]}}
+                async for ev in self._execute_and_summarize(query, user_id, hit["sql"], steps, trace_id,
+                                                            final_result):
+                    yield ev
+                if not final_result.get("error"):
+                    if session_id is not None:
+                        await self._record_cached_turn(config, query, hit["sql"], trace_id)
+                    yield {"event": "done", "data": final_result}
+                    return
+
+                # 缓存的 SQL 跑不通了 (表结构 / 权限变化)：丢掉这条，回退到完整流程
+                logger.warning(f"⚠️ [AnswerCache] Cached SQL failed, falling back to graph: {final_result['error']}",
+                               extra={"trace_id": trace_id})
+                answer_cache.discard(cache_ctx["scope_key"], hit["sql"])
+                final_result.update({"error": None, "message": "", "data": [], "success": False,
+                                     "answer_cache": {"hit": False, "discarded": True}})
 
-            final_state = await mg.master_app.ainvoke(
-                {"question": query, "trace_id": trace_id},
-                config=config
-            )
+            # =================================================
+            # 1. 调用 Master Graph (推理核心)：节点结束即推送；闲聊 / 知识问答节点的 LLM 输出逐 token 推送
+            # =================================================
+            logger.info(f"🚀 [Agent] Starting graph execution for: {query}", extra={"trace_id": trace_id})
+            final_state: Dict[str, Any] = {}
+            async for ev in mg.master_app.astream_events(
+                    {"question": query, "trace_id": trace_id}, config=config, version="v2"
+            ):
+                kind = ev["event"]
+                node = (ev.get("metadata") or {}).get("langgraph_node")
+                if kind == "on_chat_model_stream" and node in _STREAMED_REPLY_NODES:
+                    content = ev["data"]["chunk"].content
+                    if content:
+                        yield {"event": "token", "data": {"text": content}}
+                elif kind == "on_chain_end":
+                    if not ev.get("parent_ids"):
+                        # 根 run 结束：输出即主图最终状态 (等价于 ainvoke 的返回值)
+                        final_state = ev["data"].get("output") or {}
+                    elif node and ev["name"] == node:
+                        yield {"event": "node", "data": _node_event(node, ev["data"].get("output"))}
 
             final_answer = final_state.get("final_answer", "")
             steps = final_state.get("history", [])
@@ -70,6 +198,7 @@ class AgentService:
 
             final_result["steps"] = steps
             final_result["intent"] = intent
+            final_result["node_timings"] = final_state.get("node_timings", [])
 
             # =================================================
             # 🚦 核心修复：分支判断逻辑 (短路 Fallback)
@@ -85,7 +214,7 @@ class AgentService:
             )
 
             # =================================================
-            # 分支 A: SQL 任务 (Agent 决定查库)
+            # 分支 A: SQL 任务 (Agent 决定查库) -> rows -> Analyst token
             # =================================================
             if is_sql_task:
                 final_result["intent"] = "DATA_QUERY"
@@ -94,79 +223,14 @@ class AgentService:
                 sql = final_answer.replace("SQL_RESULT:", "").strip()
                 final_result["sql"] = sql
 
-                # 2. SQL 安全检查
-                forbidden_pattern = re.compile(r"\b(DROP|DELETE|UPDATE|INSERT|ALTER|TRUNCATE|GRANT|REVOKE)\b",
-                                               re.IGNORECASE)
-                if forbidden_pattern.search(sql):
-                    logger.error("🛑 Security Alert: Dangerous SQL detected.")
-                    final_result["error"] = "Security Alert: Dangerous SQL detected."
-                    return final_result
-
-                # 3. 执行 SQL (Executor 层强制 LIMIT 1000 兜底)
-                loop = asyncio.get_running_loop()
-                try:
-                    db_res = await loop.run_in_executor(
-                        None,
-                        lambda: execute_select(user_id, sql, trace_id=trace_id)
-                    )
-                except Exception as e:
-                    logger.error(f"Execution Failed: {e}")
-                    final_result["error"] = f"Database Error: {str(e)}"
-                    return final_result
-
-                raw_data = db_res.get("data", [])
-                error_msg = db_res.get("error")
-
-                if error_msg:
-                    final_result["error"] = error_msg
-                    final_result["message"] = f"查询执行出错: {error_msg}"
-                    return final_result
-
-                # =========================================================
-                # 核心功能：展示层截断 (Display Truncation)
-                # =========================================================
-                DISPLAY_LIMIT = 5
-                total_count = len(raw_data)
-
-                if total_count > DISPLAY_LIMIT:
-                    preview_data = raw_data[:DISPLAY_LIMIT]
-                    data_context_msg = (
-                        f"【注意】底层数据共找到 {total_count} 条，"
-                        f"为优化展示，**仅向您提供前 {DISPLAY_LIMIT} 条**作为样本。\n"
-                        f"数据预览：\n{json.dumps(preview_data, ensure_ascii=False, default=str)}"
-                    )
-                else:
-                    preview_data = raw_data
-                    data_context_msg = f"数据结果（共 {total_count} 条）：\n{json.dumps(preview_data, ensure_ascii=False, default=str)}"
-
-                final_result["data"] = preview_data
-                final_result["success"] = True
-
-                # 4. 召唤 Analyst
-                process_summary = "\n".join([str(s)[:200] for s in steps]) if steps else "执行过程已省略"
-
-                summary_prompt = DATA_SUMMARY_PROMPT.format(
-                    question=query,
-                    process_history=process_summary,
-                    sql=sql,
-                    data_context=data_context_msg
-                )
-
-                logger.info("🧠 [Analyst] Analyzing data...", extra={"trace_id": trace_id})
-                try:
-                    ai_response = await self.summary_llm.ainvoke([HumanMessage(content=summary_prompt)])
-                    summary_text = ai_response.content
-                except Exception as e:
-                    logger.error(f"Summary Generation Failed: {e}")
-                    summary_text = f"查询成功，共找到 {total_count} 条数据，详情请见下方表格。"
-
-                logger.info(f"🗣️ [Analyst Reply] {summary_text}", extra={"trace_id": trace_id})
-                final_result["message"] = summary_text
-
-                return final_result
+                async for ev in self._execute_and_summarize(query, user_id, sql, steps, trace_id, final_result):
+                    yield ev
+                # 只有真正执行成功的 (问题, SQL) 才进答案缓存
+                if cache_ctx is not None and final_result["success"] and not final_result.get("error"):
+                    answer_cache.store(cache_ctx["scope_key"], query, cache_ctx["vec"], sql)
 
             # =================================================
-            # 分支 B: 纯文本任务 (闲聊 / 拒绝 / Fallback / 知识问答)
+            # 分支 B: 纯文本任务 (闲聊 / 拒绝 / Fallback / 知识问答)；回复已在图里逐 token 推过，Fallback 文案只在 done 里
             # =================================================
             else:
                 # 即使 intent 是 non_data，final_answer 可能还是带了 SQL_RESULT 前缀（脏数据），这里清洗一下
@@ -179,10 +243,105 @@ class AgentService:
 
                 logger.info(f"💬 [Text Reply] {clean_reply[:100]}...", extra={"trace_id": trace_id})
 
-                return final_result
-
         except Exception as e:
             logger.error("Agent Service Internal Error", extra={"trace_id": trace_id}, exc_info=True)
             final_result["success"] = False
             final_result["error"] = str(e)
-            return final_result
\ No newline at end of file
+
+        yield {"event": "done", "data": final_result}
+
+    async def _execute_and_summarize(self, query: str, user_id: str, sql: str, steps: list, trace_id: str,
+                                     final_result: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        安全检查 -> 执行 SQL -> Analyst 解读 (图生成的 SQL 与答案缓存命中的 SQL 共用)
+        结果行一拿到就推 rows，Analyst 解读逐 token 推；失败时错误写入 final_result，不推任何事件
+        """
+        summary_prompt = await self._execute_sql(query, user_id, sql, steps, trace_id, final_result)
+        if summary_prompt is None:
+            return
+        yield {"event": "rows", "data": {"rows": final_result["data"], "total": final_result["total_count"],
+                                         "truncated": final_result["truncated"],
+                                         "display_truncated": final_result["display_truncated"]}}
+
+        logger.info("🧠 [Analyst] Analyzing data...", extra={"trace_id": trace_id})
+        parts = []
+        try:
+            async for chunk in self.summary_llm.astream([HumanMessage(content=summary_prompt)]):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield {"event": "token", "data": {"text": chunk.content}}
+        except Exception as e:
+            logger.error(f"Summary Generation Failed: {e}")
+            if not parts:
+                parts.append(self._summary_fallback(final_result))
+                yield {"event": "token", "data": {"text": parts[0]}}
+
+        summary_text = "".join(parts)
+        logger.info(f"🗣️ [Analyst Reply] {summary_text}", extra={"trace_id": trace_id})
+        final_result["message"] = summary_text
+
+    async def _execute_sql(self, query: str, user_id: str, sql: str, steps: list, trace_id: str,
+                           final_result: Dict[str, Any]) -> Optional[str]:
+        """安全检查 -> 执行 SQL -> 填充预览数据；成功返回 Analyst 的 Prompt，失败返回 None (错误已写入 final_result)"""
+        # 1. SQL 安全检查
+        if _DANGEROUS_SQL.find_first(sql):
+            logger.error("🛑 Security Alert: Dangerous SQL detected.")
+            final_result["error"] = "Security Alert: Dangerous SQL detected."
+            return None
+
+        # 2. 执行 SQL (Executor 层强制 LIMIT 1000 兜底)；走独立的 db_io 池，不和默认线程池抢
+        loop = asyncio.get_running_loop()
+        try:
+            db_res = await loop.run_in_executor(
+                get_pool(DB_IO_POOL),
+                lambda: execute_select(user_id, sql, trace_id=trace_id)
+            )
+        except Exception as e:
+            logger.error(f"Execution Failed: {e}")
+            final_result["error"] = f"Database Error: {str(e)}"
+            return None
+
+        raw_data = db_res.get("data", [])
+        error_msg = db_res.get("error")
+
+        if error_msg:
+            final_result["error"] = error_msg
+            final_result["message"] = f"查询执行出错: {error_msg}"
+            return None
+
+        # =========================================================
+        # 核心功能：展示层截断 (Display Truncation)
+        # =========================================================
+        total_count = len(raw_data)
+
+        if total_count > DISPLAY_LIMIT:
+            preview_data = raw_data[:DISPLAY_LIMIT]
+            data_context_msg = (
+                f"【注意】底层数据共找到 {total_count} 条，"
+                f"为优化展示，**仅向您提供前 {DISPLAY_LIMIT} 条**作为样本。\n"
+                f"数据预览：\n{json.dumps(preview_data, ensure_ascii=False, default=str)}"
+            )
+        else:
+            preview_data = raw_data
+            data_context_msg = f"数据结果（共 {total_count} 条）：\n{json.dumps(preview_data, ensure_ascii=False, default=str)}"
+
+        final_result["data"] = preview_data
+        final_result["total_count"] = total_count
+        # truncated: Executor 的 LIMIT 兜底截掉了结果 (total_count 不是真实总数)；display_truncated: data 只是前 N 条预览
+        final_result["truncated"] = bool(db_res.get("truncated"))
+        final_result["display_truncated"] = total_count > DISPLAY_LIMIT
+        final_result["success"] = True
+
+        # 3. 组装 Analyst 的 Prompt
+        process_summary = "\n".join([str(s)[:200] for s in steps]) if steps else "执行过程已省略"
+
+        return DATA_SUMMARY_PROMPT.format(
+            question=query,
+            process_history=process_summary,
+            sql=sql,
+            data_context=data_context_msg
+        )
+
+    @staticmethod
+    def _summary_fallback(final_result: Dict[str, Any]) -> str:
+        return f"查询成功，共找到 {final_result.get('total_count', 0)} 条数据，详情请见下方表格。"
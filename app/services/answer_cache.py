@@ -0,0 +1,235 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.modules.retrieval.cache import normalize_query
+from app.modules.retrieval.catalog import get_catalog_version
+from app.modules.security.term_matcher import TermMatcher
+
+# 数字 / 引号里的取值 / 时间词：向量上几乎没差别 ("前10名" vs "前20名"、"本月" vs "上月")，
+# 但 SQL 完全不同，所以作为分区 key 的一部分精确比对，而不是交给相似度阈值
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_QUOTED_RE = re.compile(r"[\"'“”‘’「」《》]([^\"'“”‘’「」《》]+)[\"'“”‘’「」《》]")
+_WEEKDAYS = ["一", "二", "三", "四", "五", "六", "日", "天"]
+_MONTHS = ["一", "二", "三", "四", "五", "六", "七", "八", "九", "十", "十一", "十二"]
+_TIME_TERMS = TermMatcher([
+    "今天", "昨天", "前天", "明天", "本周", "上周", "下周", "这周", "本月", "上月", "上个月", "下月", "这个月",
+    "本季度", "上季度", "今年", "去年", "前年", "明年", "近", "最近", "过去", "至今", "以来", "同比", "环比",
+    "年", "季度", "月", "周", "日", "天", "小时",
+    *[f"周{d}" for d in _WEEKDAYS], *[f"星期{d}" for d in _WEEKDAYS], *[f"礼拜{d}" for d in _WEEKDAYS],
+    *[f"{m}月" for m in _MONTHS], *[f"{m}月" for m in range(1, 13)],
+])
+
+# 中文数字 ("近三天" / "前二十名" / "两千")，归一成阿拉伯数字后与 "近3天" 等价
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+# 单独的 "一" 多半是量词 / 虚词 ("查一下"、"统一"、"一共")，不当作数字
+_CN_NUMBER_RE = re.compile(r"[零〇一二两三四五六七八九十百千]+")
+_CN_FILLER_RE = re.compile(r"一(?=[下共些起直般样致切])|[统唯]一")
+
+
+def _cn_to_int(numeral: str) -> int:
+    total, digit = 0, 0
+    for ch in numeral:
+        if ch in _CN_DIGITS:
+            digit = _CN_DIGITS[ch]
+        else:
+            total += (digit or 1) * _CN_UNITS[ch]
+            digit = 0
+    return total + digit
+
+
+def normalize_numerals(text: str) -> str:
+    text = _CN_FILLER_RE.sub(" ", text)
+    return _CN_NUMBER_RE.sub(lambda m: str(_cn_to_int(m.group())), text)
+
+
+def _question_numbers(text: str) -> set:
+    return {float(n) for n in _NUMBER_RE.findall(normalize_numerals(text))}
+
+
+def literal_signature(question: str) -> Tuple[str, ...]:
+    text = normalize_query(question)
+    numbers = _NUMBER_RE.findall(normalize_numerals(text))
+    literals = numbers + _QUOTED_RE.findall(text) + [t for _, t in _TIME_TERMS.finditer(text)]
+    return tuple(sorted(literals))
+
+
+# SQL 里的字符串字面量 ('张三' / "华东")，LIKE 的通配符去掉后再比
+_SQL_STRING_RE = re.compile(r"'((?:[^']|'')*)'|\"((?:[^\"]|\"\")*)\"")
+_LIKE_WILDCARDS = "%_"
+# 字符串之外的数值字面量 (INTERVAL 3 DAY / LIMIT 10 / amount > 500)；标识符里的数字 (t_order_2023) 不算
+_SQL_NUMBER_RE = re.compile(r"(?<![\w.`])\d+(?:\.\d+)?(?![\w.`])")
+
+
+def sql_string_literals(sql: str) -> List[str]:
+    literals = []
+    for single, double in _SQL_STRING_RE.findall(sql or ""):
+        value = (single or double).replace("''", "'").strip(_LIKE_WILDCARDS).strip()
+        if value:
+            literals.append(value)
+    return literals
+
+
+def sql_number_literals(sql: str) -> List[float]:
+    return [float(n) for n in _SQL_NUMBER_RE.findall(_SQL_STRING_RE.sub(" ", sql or ""))]
+
+
+def literals_carry_over(cached_question: str, sql: str, question: str) -> bool:
+    """
+    缓存 SQL 里取自原问题的取值 (人名 / 省份 / 渠道等没加引号的实体、天数 / 名次等数字)，新问题里也必须出现，才能复用
+    "查询张三的订单" 与 "查询李四的订单"、"近三天" 与 "近七天" 向量上几乎一样，但 WHERE name = '张三' /
+    INTERVAL 3 DAY 不能拿给另一个问题用；原问题里没出现的字面量 (如 "今年" 被翻译成的日期) 不参与比对
+    """
+    cached_q, new_q = normalize_query(cached_question), normalize_query(question)
+    for lit in sql_string_literals(sql):
+        lit = normalize_query(lit)
+        if lit and lit in cached_q and lit not in new_q:
+            return False
+    cached_nums, new_nums = _question_numbers(cached_q), _question_numbers(new_q)
+    for num in sql_number_literals(sql):
+        if num in cached_nums and num not in new_nums:
+            return False
+    return True
+
+
+def context_hash(history: Sequence[Any]) -> str:
+    """会话上下文摘要：追问 ("那上个月呢") 的语义依赖前几轮，上下文不同的答案不能互相复用"""
+    if not history:
+        return ""
+    joined = "\n".join(str(h) for h in history)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticAnswerCache:
+    """
+    语义答案缓存：(问题向量, 已校验 SQL)
+    - 分区 key = (user_id, 会话上下文 hash, 字面量签名)，不同用户 / 权限之间绝不复用
+    - 分区内按余弦相似度找最近邻，>= threshold 才算命中
+    - catalog 版本变化时整体清空 (表结构变了，旧 SQL 不再可信)
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_s: float = 86400.0, max_scopes: int = 1024,
+                 max_per_scope: int = 256, enabled: bool = True):
+        self.threshold = float(threshold)
+        self.ttl_s = float(ttl_s)
+        self.max_scopes = max(1, int(max_scopes))
+        self.max_per_scope = max(1, int(max_per_scope))
+        self.enabled = enabled
+
+        # scope_key -> [{"question", "vec", "sql", "ts"}]，OrderedDict 做分区级 LRU
+        self._scopes: "OrderedDict[Tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.literal_rejects = 0  # 相似度够但实体字面量对不上，被拒绝复用的次数
+
+    def _check_version(self) -> None:
+        version = get_catalog_version()
+        if version != self._version:
+            if self._scopes:
+                self.invalidations += 1
+                logger.info(f"🧹 [AnswerCache] Catalog version changed, dropped {self._size()} answers")
+            self._scopes.clear()
+            self._version = version
+
+    def _size(self) -> int:
+        return sum(len(v) for v in self._scopes.values())
+
+    @staticmethod
+    def scope_key(user_id: str, ctx_hash: str, question: str) -> Tuple:
+        return user_id, ctx_hash, literal_signature(question)
+
+    def lookup(self, scope_key: Tuple, vec: np.ndarray, question: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        命中返回 {"question", "sql", "similarity"}
+        传入 question 时，缓存 SQL 中取自原问题的字面量必须也出现在新问题里 (见 literals_carry_over)
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_version()
+            entries = self._scopes.get(scope_key)
+            if entries:
+                entries[:] = [e for e in entries if now - e["ts"] <= self.ttl_s]
+            if not entries:
+                self.misses += 1
+                return None
+
+            sims = np.stack([e["vec"] for e in entries]) @ np.asarray(vec, dtype=np.float32)
+            for best in np.argsort(-sims):
+                best = int(best)
+                if float(sims[best]) < self.threshold:
+                    break
+                entry = entries[best]
+                if question is not None and not literals_carry_over(entry["question"], entry["sql"], question):
+                    self.literal_rejects += 1
+                    continue
+                self._scopes.move_to_end(scope_key)
+                self.hits += 1
+                return {"question": entry["question"], "sql": entry["sql"], "similarity": round(float(sims[best]), 4)}
+
+            self.misses += 1
+            return None
+
+    def store(self, scope_key: Tuple, question: str, vec: np.ndarray, sql: str) -> None:
+        if not self.enabled or not sql:
+            return
+        with self._lock:
+            self._check_version()
+            entries = self._scopes.setdefault(scope_key, [])
+            self._scopes.move_to_end(scope_key)
+            entries[:] = [e for e in entries if e["question"] != question]
+            entries.append({"question": question, "vec": np.asarray(vec, dtype=np.float32), "sql": sql,
+                            "ts": time.monotonic()})
+            if len(entries) > self.max_per_scope:
+                del entries[0]
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+            self.stores += 1
+
+    def discard(self, scope_key: Tuple, sql: str) -> None:
+        """缓存的 SQL 执行失败 (表被改 / 权限收回)：删掉，下次重新走完整流程"""
+        with self._lock:
+            entries = self._scopes.get(scope_key)
+            if entries:
+                entries[:] = [e for e in entries if e["sql"] != sql]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            size, scopes = self._size(), len(self._scopes)
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "size": size,
+            "scopes": scopes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "literal_rejects": self.literal_rejects,
+            "catalog_version": self._version,
+        }
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    ttl_s=settings.ANSWER_CACHE_TTL_S,
+    max_scopes=settings.ANSWER_CACHE_MAX_SCOPES,
+    max_per_scope=settings.ANSWER_CACHE_MAX_PER_SCOPE,
+    enabled=settings.ANSWER_CACHE_ENABLED,
+)
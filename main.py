@@ -1,7 +1,10 @@
-import time
+import asyncio
+import os
+import signal
 import aiomysql
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 
 # 引入路由
 from app.api.v1.agent_query import router as agent_router
@@ -10,63 +13,113 @@ from app.api.v1.analyze import router as analyze_router
 
 # 🔥 引入 Master Graph 的注入函数和配置
 from app.core.master_graph import init_master_app, DB_CONFIG
+from app.core.config import settings
+from app.core.executors import EMBED_POOL, MILVUS_IO_POOL, RERANK_POOL, get_pool
+from app.core.readiness import readiness
 
 # 引入 RAG 模块 (容错)
 try:
     from app.api.v1.retrieve_tables import (
         router as retrieve_router,
-        get_embed_model,
-        ensure_milvus_connection
+        ensure_milvus_connection,
+        warmup_embedder,
+        warmup_reranker,
+        RETRIEVAL_BACKEND
     )
+    from app.modules.retrieval.vector_index import get_local_index
+    from app.modules.router.semantic_router import get_semantic_router
 
     HAS_RETRIEVE = True
 except ImportError:
     HAS_RETRIEVE = False
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    print("\n🔥 [Startup] System is warming up...")
-    t0 = time.perf_counter()
+_resources = {}
 
-    # ===========================
-    # 1. 初始化 MySQL 记忆连接池
-    # ===========================
-    print("   🔌 Connecting to MySQL Memory...")
-    # 创建全局连接池
-    pool = await aiomysql.create_pool(**DB_CONFIG)
 
-    # 🔥 关键：把池子注入给 Graph，让 master_app 拥有记忆
+async def _warmup_mysql():
+    # 创建全局连接池，并注入给 Graph，让 master_app 拥有记忆；重试时先关掉上一次残留的池
+    stale = _resources.pop("mysql_pool", None)
+    if stale is not None:
+        stale.close()
+    pool = await aiomysql.create_pool(**DB_CONFIG)
+    _resources["mysql_pool"] = pool
     init_master_app(pool)
 
-    print("   ✅ MySQL Memory Connected.")
 
-    # ===========================
-    # 2. 初始化 RAG 资源
-    # ===========================
+async def _warmup_vector_store():
+    loop = asyncio.get_running_loop()
+    if RETRIEVAL_BACKEND == "local":
+        await loop.run_in_executor(get_pool(MILVUS_IO_POOL), get_local_index)
+    elif not await loop.run_in_executor(get_pool(MILVUS_IO_POOL), ensure_milvus_connection):
+        raise RuntimeError("Milvus connection / collection load failed")
+
+
+async def _warmup_embed_model():
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(get_pool(EMBED_POOL), warmup_embedder)
+
+
+async def _warmup_semantic_router():
+    # 原型路由只是省 LLM 调用的加速层，例句库编码失败时 router_node 照常走 LLM，不拖住 /ready
+    await asyncio.get_running_loop().run_in_executor(get_pool(EMBED_POOL), get_semantic_router)
+
+
+async def _warmup_rerank_model():
+    # 加载 Rerank 模型 + 预分词全部表卡片 + 跑一次推理，首个真实请求不再付这笔开销
+    if not await asyncio.get_running_loop().run_in_executor(get_pool(RERANK_POOL), warmup_reranker):
+        raise RuntimeError("Rerank model unavailable")
+
+
+async def warmup():
+    """MySQL / 向量库 / Embedding / Rerank 并发预热，进度见 /ready"""
+    tasks = {"mysql": _warmup_mysql}
+    optional = []
     if HAS_RETRIEVE:
-        try:
-            if ensure_milvus_connection():
-                print("   ✅ Milvus connection established.")
-            else:
-                print("   ⚠️ Milvus connection failed.")
+        tasks.update({
+            "vector_store": _warmup_vector_store,
+            "embed_model": _warmup_embed_model,
+            "rerank_model": _warmup_rerank_model,
+        })
+        if settings.SEMANTIC_ROUTER_ENABLED:
+            tasks["semantic_router"] = _warmup_semantic_router
+            optional.append("semantic_router")
+    await readiness.run_all(
+        tasks,
+        optional=optional,
+        retries=settings.WARMUP_MAX_RETRIES,
+        backoff_s=settings.WARMUP_RETRY_BACKOFF_S,
+        max_backoff_s=settings.WARMUP_RETRY_MAX_BACKOFF_S,
+    )
+    status = "Ready" if readiness.is_ready() else "Degraded (see /ready)"
+    print(f"✅ [Startup] {status}! Warmup took {(readiness.finished_at - readiness.started_at):.2f}s\n")
 
-            print("   ↳ Loading Embedding model...")
-            get_embed_model().encode(["warmup"], normalize_embeddings=True)
-        except Exception as e:
-            print(f"   ⚠️ RAG Warmup skipped: {e}")
+    failed = readiness.failed_required()
+    if failed and settings.WARMUP_EXIT_ON_FAILURE:
+        # 重试耗尽：与其活着但永远 503，不如退出让编排系统重启 (同步启动时代就是崩溃重启)
+        print(f"💀 [Startup] Required components failed: {failed}. Shutting down for restart.")
+        os.kill(os.getpid(), signal.SIGTERM)
 
-    elapsed = time.perf_counter() - t0
-    print(f"✅ [Startup] Ready! Took {elapsed:.2f}s\n")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("\n🔥 [Startup] System is warming up (in background, poll /ready)...")
+
+    # 预热放到后台：进程立即开始监听，/health 可用；/ready 在全部组件就绪后才返回 200
+    warmup_task = asyncio.create_task(warmup())
 
     yield
 
     # ===========================
-    # 3. 关闭资源
+    # 关闭资源
     # ===========================
-    print("🛑 [Shutdown] Closing MySQL pool...")
-    pool.close()
-    await pool.wait_closed()
+    if not warmup_task.done():
+        warmup_task.cancel()
+    pool = _resources.get("mysql_pool")
+    if pool is not None:
+        print("🛑 [Shutdown] Closing MySQL pool...")
+        pool.close()
+        await pool.wait_closed()
 
 
 app = FastAPI(title="dbops-enterprise-copilot", lifespan=lifespan)
@@ -84,6 +137,13 @@ def health():
     return {"ok": True}
 
 
+@app.get("/ready")
+def ready():
+    """按组件汇报预热状态；全部就绪前返回 503，供 K8s readinessProbe 使用"""
+    snapshot = readiness.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
     import os
@@ -0,0 +1,105 @@
+import sys
+import os
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+# 🔥 确保能导入 app 模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_data import BENCHMARK_CASES
+from scripts.run_benchmark import RECALL_KS, recall_at_k
+from app.core.config import settings
+from app.modules.retrieval.catalog import load_catalog_cards
+from app.modules.retrieval.onnx_backend import load_onnx_cross_encoder, load_onnx_embedder
+
+RECALL_POOL = 20  # 与线上 top_k_rerank 一致：先向量粗排取 20，再 Rerank
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, (time.perf_counter() - t0) * 1000.0
+
+
+def evaluate(name: str, embedder, reranker, cards: list[dict], rounds: int) -> dict:
+    """在全量 catalog 卡片上做暴力向量召回 + Rerank，统计 Recall@K 与单次延迟"""
+    doc_vecs = np.asarray(embedder.encode([c["text"] for c in cards], normalize_embeddings=True), dtype=np.float32)
+
+    embed_ms, rerank_ms = [], []
+    recalls = {k: [] for k in RECALL_KS}
+    query_vecs, top1 = [], []
+
+    for case in BENCHMARK_CASES:
+        q = case["q"]
+        for _ in range(rounds):
+            q_vec, ms = _timed(embedder.encode, [q], normalize_embeddings=True)
+            embed_ms.append(ms)
+        q_vec = np.asarray(q_vec[0], dtype=np.float32)
+        query_vecs.append(q_vec)
+
+        pool = [cards[i] for i in np.argsort(-(doc_vecs @ q_vec))[:RECALL_POOL]]
+        pairs = [[q[:256], c["text"][:512]] for c in pool]
+        for _ in range(rounds):
+            scores, ms = _timed(reranker.predict, pairs)
+            rerank_ms.append(ms)
+
+        ranked = [pool[i]["logical_table"] for i in np.argsort(-np.asarray(scores))]
+        top1.append(ranked[0] if ranked else None)
+        for k in RECALL_KS:
+            r = recall_at_k(ranked, case["expected"], k)
+            if r is not None:
+                recalls[k].append(r)
+
+    embed_ms.sort()
+    rerank_ms.sort()
+    return {
+        "name": name,
+        "recall": {k: (sum(v) / len(v) if v else 0.0) for k, v in recalls.items()},
+        "embed_p50_ms": statistics.median(embed_ms),
+        "embed_p95_ms": embed_ms[int(0.95 * (len(embed_ms) - 1))],
+        "rerank_p50_ms": statistics.median(rerank_ms),
+        "rerank_p95_ms": rerank_ms[int(0.95 * (len(rerank_ms) - 1))],
+        "query_vecs": np.vstack(query_vecs),
+        "top1": top1,
+    }
+
+
+def main(rounds: int):
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    cards = load_catalog_cards()
+    print(f"📚 {len(cards)} cards, {len(BENCHMARK_CASES)} cases, rounds={rounds}")
+
+    torch_res = evaluate(
+        "torch-fp32",
+        SentenceTransformer(settings.EMBED_MODEL, device="cpu"),
+        CrossEncoder(settings.RERANK_MODEL, max_length=512, device="cpu"),
+        cards, rounds,
+    )
+    onnx_res = evaluate("onnx-int8", load_onnx_embedder(), load_onnx_cross_encoder(), cards, rounds)
+
+    print("\n" + "=" * 72)
+    print("🏆 Torch fp32 vs ONNX int8 (CPU)")
+    print("=" * 72)
+    for r in (torch_res, onnx_res):
+        recall = " ".join(f"R@{k}={v:.1%}" for k, v in r["recall"].items())
+        print(f"  {r['name']:<11} {recall} | embed p50={r['embed_p50_ms']:.1f}ms p95={r['embed_p95_ms']:.1f}ms "
+              f"| rerank(x{RECALL_POOL}) p50={r['rerank_p50_ms']:.1f}ms p95={r['rerank_p95_ms']:.1f}ms")
+
+    # 量化误差：同一 query 两个后端向量的余弦相似度、Rerank Top1 一致率
+    cos = (torch_res["query_vecs"] * onnx_res["query_vecs"]).sum(axis=1)
+    agree = sum(a == b for a, b in zip(torch_res["top1"], onnx_res["top1"])) / len(BENCHMARK_CASES)
+    print(f"  embedding cosine(torch, onnx): mean={cos.mean():.4f} min={cos.min():.4f}")
+    print(f"  rerank top1 agreement: {agree:.1%}")
+    print(f"  speedup: embed x{torch_res['embed_p50_ms'] / onnx_res['embed_p50_ms']:.2f}, "
+          f"rerank x{torch_res['rerank_p50_ms'] / onnx_res['rerank_p50_ms']:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy vs latency: torch fp32 vs quantized ONNX Runtime")
+    parser.add_argument("--rounds", type=int, default=3, help="每个 case 重复计时的次数")
+    args = parser.parse_args()
+    main(args.rounds)
@@ -0,0 +1,102 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+# 🔥 确保能导入 app 模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_data import BENCHMARK_CASES
+from app.modules.retrieval.catalog import load_catalog_cards
+from app.api.v1.retrieve_tables import (
+    _rerank_batcher,
+    _rerank_executor,
+    _run_rerank,
+    get_rerank_model,
+)
+
+POOL_SIZE = 20  # 与线上 top_k_rerank 一致
+
+
+def load_cards(limit: int = POOL_SIZE) -> list[dict]:
+    return load_catalog_cards()[:limit]
+
+
+def build_items(query: str, cards: list[dict]) -> list[tuple]:
+    return [(query, c["full_name"], c["text"]) for c in cards]
+
+
+async def _one_request(mode: str, model, items) -> float:
+    t0 = time.perf_counter()
+    if mode == "batched":
+        await _rerank_batcher.submit(items)
+    else:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_rerank_executor, _run_rerank, model, items)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+async def run_level(mode: str, concurrency: int, rounds: int, model, cards) -> dict:
+    queries = [c["q"] for c in BENCHMARK_CASES]
+    latencies = []
+
+    async def user(uid: int):
+        for r in range(rounds):
+            q = queries[(uid + r) % len(queries)]
+            latencies.append(await _one_request(mode, model, build_items(q, cards)))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[user(i) for i in range(concurrency)])
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 1),
+        "max_ms": round(latencies[-1], 1),
+        "qps": round(len(latencies) / wall, 2),
+    }
+
+
+async def main(levels: list[int], rounds: int):
+    model = get_rerank_model()
+    if model is None:
+        print("❌ Rerank model not available.")
+        return
+
+    cards = load_cards()
+    # 预热：首次 predict 有额外的图初始化开销
+    _run_rerank(model, build_items("warmup", cards))
+
+    rows = []
+    for c in levels:
+        for mode in ("per_request", "batched"):
+            row = await run_level(mode, c, rounds, model, cards)
+            rows.append(row)
+            print(f"  {mode:<12} users={c:<3} p50={row['p50_ms']:>8.1f}ms "
+                  f"p95={row['p95_ms']:>8.1f}ms qps={row['qps']:>7.2f}")
+
+    print("\n" + "=" * 60)
+    print(f"🏆 Rerank Batching Benchmark ({POOL_SIZE} pairs/request)")
+    print("=" * 60)
+    for c in levels:
+        base = next(r for r in rows if r["mode"] == "per_request" and r["concurrency"] == c)
+        batched = next(r for r in rows if r["mode"] == "batched" and r["concurrency"] == c)
+        speedup = base["p50_ms"] / batched["p50_ms"] if batched["p50_ms"] else 0.0
+        print(f"  users={c:<3} p50 {base['p50_ms']:.1f}ms -> {batched['p50_ms']:.1f}ms (x{speedup:.2f}), "
+              f"qps {base['qps']:.2f} -> {batched['qps']:.2f}")
+    print(f"  batcher: {_rerank_batcher.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CrossEncoder per-request vs cross-request batched latency")
+    parser.add_argument("--levels", default="1,8,32", help="并发用户数，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=5, help="每个用户连续发起的请求数")
+    args = parser.parse_args()
+
+    asyncio.run(main([int(x) for x in args.levels.split(",") if x], args.rounds))
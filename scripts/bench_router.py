@@ -0,0 +1,159 @@
+"""
+路由评测：embedding 原型路由 vs LLM Router (ROUTER_PROMPT)
+
+    python scripts/bench_router.py                 # 原型路由 + LLM Router + 混合策略
+    python scripts/bench_router.py --no-llm        # 只测原型路由 (离线可跑)
+
+指标：准确率 / 原型路由覆盖率 (置信度、top1 相似度、领先幅度都过线的比例) / 各路由延迟 p50/p95/p99
+混合策略 = 高置信走原型路由，其余回退 LLM，即线上 router_node 的实际行为
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import datetime
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_data import ROUTER_CASES
+from scripts.run_benchmark import percentiles
+from app.api.v1.retrieve_tables import _embed_cache, embed_query
+from app.core.config import settings
+from app.core.prompts import ROUTER_PROMPT
+from app.modules.router.semantic_router import get_semantic_router
+
+
+async def _llm_route(question: str) -> str:
+    from app.core.master_graph import llm, RouterOutput
+
+    try:
+        res = await llm.with_structured_output(RouterOutput).ainvoke(ROUTER_PROMPT.format(question=question))
+        return res.intent
+    except Exception as e:
+        print(f"  ⚠️ LLM router failed: {e}")
+        return "CHAT"
+
+
+def _accuracy(rows, key):
+    rows = [r for r in rows if r.get(key)]
+    if not rows:
+        return {"n": 0, "accuracy": 0.0}
+    correct = sum(1 for r in rows if r[key] == r["expected"])
+    return {"n": len(rows), "accuracy": round(correct / len(rows), 4)}
+
+
+async def run(use_llm: bool, min_confidence: float, min_similarity: float, min_margin: float,
+              report_path: str = None):
+    settings.SEMANTIC_ROUTER_MIN_CONFIDENCE = min_confidence
+    settings.SEMANTIC_ROUTER_MIN_SIMILARITY = min_similarity
+    settings.SEMANTIC_ROUTER_MIN_MARGIN = min_margin
+    # 冷 embedding：每个问题都真实跑一次模型，延迟才有参考意义
+    _embed_cache.enabled = False
+
+    t0 = time.perf_counter()
+    router = get_semantic_router()
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    print(f"🧭 Prototype bank: {len(router)} prototypes, built in {build_ms:.0f}ms")
+
+    rows = []
+    proto_ms, embed_ms, classify_ms, llm_ms = [], [], [], []
+    for case in ROUTER_CASES:
+        row = {"q": case["q"], "expected": case["intent"]}
+
+        t0 = time.perf_counter()
+        vec = await embed_query(case["q"])
+        t1 = time.perf_counter()
+        decision = router.classify(vec)
+        t2 = time.perf_counter()
+        embed_ms.append((t1 - t0) * 1000.0)
+        classify_ms.append((t2 - t1) * 1000.0)
+        proto_ms.append((t2 - t0) * 1000.0)
+        row.update({
+            "prototype": decision.intent,
+            "confidence": decision.confidence,
+            "similarity": decision.scores.get(decision.intent),
+            "margin": decision.margin,
+            "nearest": decision.nearest,
+            "confident": decision.confident,
+        })
+        row["prototype_confident"] = decision.intent if decision.confident else None
+
+        if use_llm:
+            t0 = time.perf_counter()
+            row["llm"] = await _llm_route(case["q"])
+            llm_ms.append((time.perf_counter() - t0) * 1000.0)
+            row["hybrid"] = decision.intent if decision.confident else row["llm"]
+        rows.append(row)
+
+    coverage = sum(1 for r in rows if r["confident"]) / len(rows)
+    report = {
+        "ts": datetime.datetime.now().isoformat(),
+        "cases": len(rows),
+        "min_confidence": min_confidence,
+        "min_similarity": min_similarity,
+        "min_margin": min_margin,
+        "prototypes": len(router),
+        "build_ms": round(build_ms, 1),
+        "coverage": round(coverage, 4),
+        "accuracy": {
+            "prototype_all": _accuracy(rows, "prototype"),
+            "prototype_confident": _accuracy(rows, "prototype_confident"),
+        },
+        "latency_ms": {
+            "prototype": percentiles(proto_ms),
+            "prototype_embed": percentiles(embed_ms),
+            "prototype_classify": percentiles(classify_ms),
+        },
+        "errors": [r for r in rows if r["prototype"] != r["expected"]],
+    }
+    if use_llm:
+        report["accuracy"]["llm"] = _accuracy(rows, "llm")
+        report["accuracy"]["hybrid"] = _accuracy(rows, "hybrid")
+        report["latency_ms"]["llm"] = percentiles(llm_ms)
+        # 混合策略的期望延迟：覆盖到的走原型，其余 = 原型 + LLM
+        hybrid_ms = [p + (0.0 if r["confident"] else l) for r, p, l in zip(rows, proto_ms, llm_ms)]
+        report["latency_ms"]["hybrid"] = percentiles(hybrid_ms)
+        report["llm_calls_saved"] = sum(1 for r in rows if r["confident"])
+
+    print("\n" + "=" * 60)
+    print(f"Coverage (confidence >= {min_confidence}, similarity >= {min_similarity}, "
+          f"margin >= {min_margin}): {coverage:.1%}")
+    for name, acc in report["accuracy"].items():
+        print(f"  {name:<22} acc={acc['accuracy']:.1%} (n={acc['n']})")
+    for name, lat in report["latency_ms"].items():
+        print(f"  {name:<22} p50={lat['p50']:.1f}ms p95={lat['p95']:.1f}ms p99={lat['p99']:.1f}ms")
+    confusion = Counter((r["expected"], r["prototype"]) for r in report["errors"])
+    if confusion:
+        print("Prototype misroutes:")
+        for (exp, got), n in confusion.most_common():
+            print(f"  {exp} -> {got}: {n}")
+        for r in report["errors"]:
+            print(f"    '{r['q']}' -> {r['prototype']} (conf={r['confidence']}, sim={r['similarity']}, "
+                  f"margin={r['margin']}, nearest='{r['nearest']}')")
+    print("=" * 60)
+
+    report_path = report_path or os.path.join(
+        "logs", f"router_benchmark_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📝 Report written to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prototype router vs LLM router benchmark")
+    parser.add_argument("--no-llm", action="store_true", help="只测原型路由，不调用 LLM")
+    parser.add_argument("--min-confidence", type=float, default=settings.SEMANTIC_ROUTER_MIN_CONFIDENCE,
+                        help="原型路由直接采纳的置信度阈值")
+    parser.add_argument("--min-similarity", type=float, default=settings.SEMANTIC_ROUTER_MIN_SIMILARITY,
+                        help="top1 原型的最低余弦相似度")
+    parser.add_argument("--min-margin", type=float, default=settings.SEMANTIC_ROUTER_MIN_MARGIN,
+                        help="top1 与 top2 类相似度的最小差距")
+    parser.add_argument("--report", default=None, help="JSON 报告路径 (默认 logs/router_benchmark_*.json)")
+    args = parser.parse_args()
+
+    asyncio.run(run(not args.no_llm, args.min_confidence, args.min_similarity, args.min_margin, args.report))
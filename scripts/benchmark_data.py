@@ -127,4 +127,44 @@ BENCHMARK_CASES = [
         "expected": [],
         "type": "熔断"
     }
-]
\ No newline at end of file
+]
+
+# ==========================
+# 🧭 路由评测 (scripts/bench_router.py)
+# 与 semantic_router 的内置原型不重叠，避免 "拿训练集测准确率"
+# ==========================
+ROUTER_CASES = [
+    # DATA_QUERY
+    {"q": "本周新增了多少会员", "intent": "DATA_QUERY"},
+    {"q": "帮我查下订单号 20240101001 的物流状态", "intent": "DATA_QUERY"},
+    {"q": "去年双十一当天的成交额", "intent": "DATA_QUERY"},
+    {"q": "复购率最高的前五个品类", "intent": "DATA_QUERY"},
+    {"q": "哪些用户领了券但一直没用", "intent": "DATA_QUERY"},
+    {"q": "每个仓库的库存周转天数", "intent": "DATA_QUERY"},
+    {"q": "统计一下售后原因的分布", "intent": "DATA_QUERY"},
+    {"q": "看看最近三天的退款笔数", "intent": "DATA_QUERY"},
+    {"q": "支付失败的订单有多少", "intent": "DATA_QUERY"},
+    {"q": "各等级会员的人数占比", "intent": "DATA_QUERY"},
+    {"q": "给我列一下价格变动过的 SKU", "intent": "DATA_QUERY"},
+    {"q": "营销活动带来的新客数量", "intent": "DATA_QUERY"},
+    # KNOWLEDGE_SEARCH
+    {"q": "Lock wait timeout exceeded 是什么原因", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "explain 结果里的 type=ALL 代表什么", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "binlog 有哪几种格式", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "为什么 count(*) 比 count(id) 快", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "utf8mb4 和 utf8 的区别", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "怎么给大表在线加字段", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "窗口函数 row_number 的用法", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "ERROR 1045 Access denied 怎么处理", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "B+ 树索引为什么适合范围查询", "intent": "KNOWLEDGE_SEARCH"},
+    {"q": "向量数据库的 HNSW 参数怎么调", "intent": "KNOWLEDGE_SEARCH"},
+    # CHAT
+    {"q": "嗨，在吗", "intent": "CHAT"},
+    {"q": "多谢帮忙", "intent": "CHAT"},
+    {"q": "晚安", "intent": "CHAT"},
+    {"q": "你叫什么名字", "intent": "CHAT"},
+    {"q": "收到，没问题", "intent": "CHAT"},
+    {"q": "你真厉害", "intent": "CHAT"},
+    {"q": "今天天气怎么样", "intent": "CHAT"},
+    {"q": "帮我写一首关于数据库的诗", "intent": "CHAT"},
+]
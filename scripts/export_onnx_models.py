@@ -0,0 +1,35 @@
+import os
+import sys
+import argparse
+
+# 添加项目根目录到 sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.modules.retrieval.onnx_backend import EMBED_SUBDIR, RERANK_SUBDIR, export_onnx
+
+
+def main(out_dir: str, quantize: bool, only: str | None):
+    targets = [
+        ("embed", settings.EMBED_MODEL, os.path.join(out_dir, EMBED_SUBDIR)),
+        ("rerank", settings.RERANK_MODEL, os.path.join(out_dir, RERANK_SUBDIR)),
+    ]
+    for kind, model_name, target_dir in targets:
+        if only and kind != only:
+            continue
+        logger.info(f"📦 Exporting {kind} model {model_name} -> {target_dir} (int8={quantize})")
+        path = export_onnx(model_name, target_dir, kind, quantize=quantize)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        logger.info(f"✅ {kind}: {path} ({size_mb:.1f} MB)")
+
+    logger.info(f"🎉 Done. Set INFERENCE_BACKEND=onnx ONNX_MODEL_DIR={out_dir} to enable.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export embedding / rerank models to ONNX with dynamic int8 quantization")
+    parser.add_argument("--out", default=settings.ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="只导出 fp32，不做 int8 量化")
+    parser.add_argument("--only", choices=["embed", "rerank"], default=None)
+    args = parser.parse_args()
+    main(args.out, not args.no_quantize, args.only)
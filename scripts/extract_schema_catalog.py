@@ -15,6 +15,7 @@ from app.core.config import settings
 from app.core.llm import chat_completion
 from app.core.prompts import TABLE_CARD_GOVERNANCE_PROMPT
 from app.core.logger import logger
+from app.modules.retrieval.catalog import get_logical_name
 
 OUTPUT_FILE = settings.OUT_PATH
 MAX_WORKERS = 5
@@ -81,13 +82,6 @@ class DateEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-def get_logical_name(table_name: str) -> str:
-    name = re.sub(r'_\d{4}W\d{2,3}$', '', table_name, flags=re.IGNORECASE)
-    name = re.sub(r'_\d{8}$', '', name)
-    name = re.sub(r'_\d+$', '', name)
-    return name
-
-
 def get_all_tables_list(conn, db_name):
     """
     🔥 修复1：改用 SHOW TABLE STATUS，解决 information_schema 查不到表的问题
@@ -1,6 +1,8 @@
 import os
 import sys
 import json
+import argparse
+import numpy as np
 from dotenv import load_dotenv
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
 from sentence_transformers import SentenceTransformer
@@ -10,6 +12,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.modules.retrieval.catalog import CARD_TEXT_MAX_LEN, write_catalog_version
+from app.modules.retrieval.vector_index import save_local_index
 
 # 配置
 MILVUS_HOST = settings.MILVUS_HOST
@@ -22,7 +26,7 @@ SOURCE_FILE = settings.OUT_PATH  # e.g., data/schema_catalog.jsonl
 # 模型配置
 EMBED_MODEL = settings.EMBED_MODEL
 BATCH_SIZE = 64
-TEXT_MAX_LEN = 8192  # 允许更长的 Rich Text
+TEXT_MAX_LEN = CARD_TEXT_MAX_LEN  # 允许更长的 Rich Text (在线两阶段召回按同一长度截断)
 
 
 def init_milvus(dim: int) -> Collection:
@@ -71,13 +75,17 @@ def init_milvus(dim: int) -> Collection:
     return col
 
 
-def insert_batch(col: Collection, model: SentenceTransformer, batch: list[dict]):
+def insert_batch(col: Collection | None, model: SentenceTransformer, batch: list[dict]) -> np.ndarray:
     # 提取用于 Embedding 的文本
     texts = [x["raw_text_for_emb"] for x in batch]
 
     # 计算向量 (Normalize=True 很重要，便于后续用 IP 算分)
     embeddings = model.encode(texts, normalize_embeddings=True)
 
+    # 只生成本地索引产物时不写 Milvus
+    if col is None:
+        return embeddings
+
     # 插入数据 (注意顺序必须和 Schema definition 一致)
     data = [
         [x["full_name"] for x in batch],  # full_name
@@ -91,9 +99,10 @@ def insert_batch(col: Collection, model: SentenceTransformer, batch: list[dict])
     ]
 
     col.insert(data)
+    return embeddings
 
 
-def main():
+def main(skip_milvus: bool = False):
     if not os.path.exists(SOURCE_FILE):
         logger.error(f"❌ File not found: {SOURCE_FILE}. Please run extract_schema_to_jsonl.py first.")
         return
@@ -111,10 +120,13 @@ def main():
     logger.info(f"📏 Vector dimension: {dim}")
 
     # 初始化 Milvus
-    col = init_milvus(dim)
+    col = None if skip_milvus else init_milvus(dim)
 
     inserted = 0
     batch = []
+    # 同时收集一份给进程内索引 (RETRIEVAL_BACKEND=local) 使用
+    all_entries: list[dict] = []
+    all_embeddings: list[np.ndarray] = []
 
     logger.info(f"🚀 Processing data from {SOURCE_FILE}...")
     with open(SOURCE_FILE, "r", encoding="utf-8") as f:
@@ -153,22 +165,40 @@ def main():
             batch.append(entry)
 
             if len(batch) >= BATCH_SIZE:
-                insert_batch(col, model, batch)
+                all_embeddings.append(insert_batch(col, model, batch))
+                all_entries.extend(batch)
                 inserted += len(batch)
                 print(f"  ✅ Inserted: {inserted}")
                 batch = []
 
     if batch:
-        insert_batch(col, model, batch)
+        all_embeddings.append(insert_batch(col, model, batch))
+        all_entries.extend(batch)
         inserted += len(batch)
         print(f"  ✅ Inserted: {inserted}")
 
-    # 刷盘并加载到内存，准备查询
-    col.flush()
-    # col.load() # 暂时不 Load，留给 retrieve_tables.py 懒加载
+    # 进程内索引产物 (embeddings.npy + cards.jsonl + card_offsets.npy + manifest.json，多 worker mmap 共享)
+    if all_entries:
+        index_dir = save_local_index(all_entries, np.vstack(all_embeddings))
+        logger.info(f"🧭 Local vector index saved to {index_dir} ({len(all_entries)} cards)")
+
+    if col is not None:
+        # 刷盘并加载到内存，准备查询
+        col.flush()
+        # col.load() # 暂时不 Load，留给 retrieve_tables.py 懒加载
+        num_entities = col.num_entities
+    else:
+        num_entities = inserted
+
+    # 写入 catalog 版本戳，在线服务据此让检索缓存失效
+    stamp = write_catalog_version(COLLECTION_NAME, num_entities, SOURCE_FILE)
+    logger.info(f"🏷️ Catalog version: {stamp['version']}")
 
-    logger.info(f"🎉 All Done! Total {col.num_entities} entities indexed in '{COLLECTION_NAME}'.")
+    logger.info(f"🎉 All Done! Total {num_entities} entities indexed in '{COLLECTION_NAME}'.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index schema catalog into Milvus and the local vector index")
+    parser.add_argument("--skip-milvus", action="store_true", help="只生成本地索引产物，不连接 Milvus")
+    args = parser.parse_args()
+    main(skip_milvus=args.skip_milvus)
\ No newline at end of file
@@ -1,6 +1,10 @@
 import sys
 import os
+import json
 import time
+import asyncio
+import argparse
+import datetime
 from colorama import init, Fore, Style
 
 # 🔥 确保能导入 app 模块
@@ -9,7 +13,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # 引入测试数据
 from scripts.benchmark_data import BENCHMARK_CASES
 # 🔥 直接引入核心函数 (根据你实际文件位置调整 import)
-from app.api.v1.retrieve_tables import retrieve_tables
+from app.api.v1.retrieve_tables import retrieve_tables, _embed_cache, _result_cache
+from app.core.executors import pool_stats
+
+RECALL_KS = (1, 5, 10)
+STAGES = ("embed", "search", "fuse", "text_fetch", "rerank", "total")
 
 init(autoreset=True)
 
@@ -49,12 +57,160 @@ def check_hit(retrieved_tables, expected_keywords):
     return hit_count == len(expected_keywords)
 
 
-def run_benchmark():
+def recall_at_k(retrieved_tables, expected_keywords, k):
+    """expected 中被前 k 个结果命中的比例 (每一项支持 "A|B" 写法)"""
+    if not expected_keywords:
+        return None
+    top = retrieved_tables[:k]
+    hit = sum(1 for exp in expected_keywords if check_hit(top, [exp]))
+    return hit / len(expected_keywords)
+
+
+def reciprocal_rank(retrieved_tables, expected_keywords):
+    """第一个命中任一 expected 的名次的倒数 (没命中记 0)"""
+    for rank, name in enumerate(retrieved_tables, start=1):
+        if any(check_hit([name], [exp]) for exp in expected_keywords):
+            return 1.0 / rank
+    return 0.0
+
+
+def percentiles(values):
+    if not values:
+        return {"n": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    ordered = sorted(values)
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+    return {"n": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "mean": round(sum(ordered) / len(ordered), 2)}
+
+
+async def run_load(concurrency=8, rounds=5, topk=10, hybrid=None, report_path=None, use_cache=False):
+    """
+    并发压测：concurrency 个 worker 抢同一个任务队列 (BENCHMARK_CASES × rounds)
+    输出端到端 / 分阶段 (embed / search / fuse / text_fetch / rerank) 的 p50/p95/p99，
+    以及按 case type 的 Recall@1/5/10 + MRR，并写一份 JSON 报告方便多次运行对比
+    """
+    # 默认关掉缓存：否则第二轮起全部命中缓存，测不到真实的模型 / 检索耗时
+    saved = (_embed_cache.enabled, _result_cache.enabled)
+    _embed_cache.enabled = _result_cache.enabled = use_cache
+
+    # 预热一次，模型加载时间不计入延迟
+    await retrieve_tables(BENCHMARK_CASES[0]["q"], topk=topk, hybrid=hybrid)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for r in range(rounds):
+        for case in BENCHMARK_CASES:
+            queue.put_nowait((r, case))
+
+    latencies = []
+    stage_ms = {s: [] for s in STAGES}
+    rerank_paths = {}
+    quality = {}  # type -> {"recall": {k: [...]}, "mrr": [...], "reject": [...]}
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            r, case = queue.get_nowait()
+            stats = {}
+            t0 = time.perf_counter()
+            try:
+                results = await retrieve_tables(case["q"], topk=topk, hybrid=hybrid, stats=stats)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            for stage, ms in stats.get("timings_ms", {}).items():
+                stage_ms.setdefault(stage, []).append(ms)
+            path = stats.get("rerank_path") or ("blocked" if stats.get("blocked") else "none")
+            rerank_paths[path] = rerank_paths.get(path, 0) + 1
+
+            # 质量指标只看第一轮 (同一 query 多轮结果相同)
+            if r != 0:
+                continue
+            names = [c.get("logical_table") for c in results]
+            q = quality.setdefault(case["type"], {"recall": {k: [] for k in RECALL_KS}, "mrr": [], "reject": []})
+            if case["expected"]:
+                for k in RECALL_KS:
+                    q["recall"][k].append(recall_at_k(names, case["expected"], k))
+                q["mrr"].append(reciprocal_rank(names, case["expected"]))
+            else:
+                # 熔断类 case：正确行为是返回空
+                q["reject"].append(1.0 if not names else 0.0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall_s = time.perf_counter() - t0
+    _embed_cache.enabled, _result_cache.enabled = saved
+
+    def mean(xs):
+        return round(sum(xs) / len(xs), 4) if xs else None
+
+    by_type = {
+        t: {
+            "cases": len(q["mrr"]) + len(q["reject"]),
+            **{f"recall@{k}": mean(q["recall"][k]) for k in RECALL_KS},
+            "mrr": mean(q["mrr"]),
+            "reject_rate": mean(q["reject"]),
+        }
+        for t, q in quality.items()
+    }
+    overall = {
+        **{f"recall@{k}": mean([x for q in quality.values() for x in q["recall"][k]]) for k in RECALL_KS},
+        "mrr": mean([x for q in quality.values() for x in q["mrr"]]),
+        "reject_rate": mean([x for q in quality.values() for x in q["reject"]]),
+    }
+
+    report = {
+        "ts": datetime.datetime.utcnow().isoformat(),
+        "config": {"concurrency": concurrency, "rounds": rounds, "topk": topk, "hybrid": hybrid,
+                   "use_cache": use_cache, "cases": len(BENCHMARK_CASES)},
+        "throughput_qps": round(len(latencies) / wall_s, 2) if wall_s else 0.0,
+        "errors": errors,
+        "latency_ms": percentiles(latencies),
+        "stage_latency_ms": {s: percentiles(v) for s, v in stage_ms.items() if v},
+        "rerank_paths": rerank_paths,
+        "quality": {"overall": overall, "by_type": by_type},
+        "pools": pool_stats(),
+    }
+
+    print("\n" + "=" * 72)
+    print(f"{Fore.YELLOW}🏁 Load Benchmark (concurrency={concurrency}, rounds={rounds}, "
+          f"requests={len(latencies)}, qps={report['throughput_qps']})")
+    print("=" * 72)
+    for name, p in [("end2end", report["latency_ms"]), *report["stage_latency_ms"].items()]:
+        print(f"  {name:<11} p50={p['p50']:>8.1f}ms  p95={p['p95']:>8.1f}ms  p99={p['p99']:>8.1f}ms  (n={p['n']})")
+    print("-" * 72)
+    print("  " + "  ".join(f"R@{k}={overall[f'recall@{k}'] or 0:.1%}" for k in RECALL_KS)
+          + f"  MRR={overall['mrr'] or 0:.3f}  Reject={overall['reject_rate'] or 0:.1%}")
+    for t, q in by_type.items():
+        if q["mrr"] is not None:
+            print(f"  - {t:<10}: " + "  ".join(f"R@{k}={q[f'recall@{k}']:.1%}" for k in RECALL_KS)
+                  + f"  MRR={q['mrr']:.3f}")
+        else:
+            print(f"  - {t:<10}: Reject={q['reject_rate']:.1%}")
+    print("=" * 72)
+
+    report_path = report_path or os.path.join(
+        "logs", f"retrieval_benchmark_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📄 Report written to {report_path}")
+    return report
+
+
+async def run_benchmark(hybrid=None, topk=10, verbose=True):
     total = len(BENCHMARK_CASES)
     passed = 0
     results_by_type = {}
+    recall_sums = {k: 0.0 for k in RECALL_KS}
+    recall_n = 0
 
-    print(f"{Fore.CYAN}🚀 开始执行检索准确率评估 (Direct Function Call)...")
+    mode = "default" if hybrid is None else ("hybrid" if hybrid else "vector-only")
+    print(f"{Fore.CYAN}🚀 开始执行检索准确率评估 (Direct Function Call, mode={mode})...")
     print("=" * 60)
 
     for idx, case in enumerate(BENCHMARK_CASES):
@@ -66,27 +222,34 @@ def run_benchmark():
             results_by_type[case_type] = {"total": 0, "pass": 0}
         results_by_type[case_type]["total"] += 1
 
-        print(f"Test [{idx + 1}/{total}] {case_type}: {query[:30]}...", end="", flush=True)
+        if verbose:
+            print(f"Test [{idx + 1}/{total}] {case_type}: {query[:30]}...", end="", flush=True)
 
         try:
             start_time = time.time()
 
             # 🔥 直接调用函数，而不是 requests.post
-            # 注意：retrieve_tables 返回的是 List[Dict]
-            candidates_list = retrieve_tables(query, topk=10)
+            # 注意：retrieve_tables 是 async 函数，返回的是 List[Dict]
+            candidates_list = await retrieve_tables(query, topk=topk, hybrid=hybrid)
 
             cost_time = (time.time() - start_time) * 1000  # ms
 
             # 提取表名 (logical_table 或 full_name)
             retrieved_names = [c.get("logical_table") for c in candidates_list]
 
+            if expected:
+                recall_n += 1
+                for k in RECALL_KS:
+                    recall_sums[k] += recall_at_k(retrieved_names, expected, k)
+
             is_success = check_hit(retrieved_names, expected)
 
             if is_success:
-                print(f"{Fore.GREEN} [PASS] {Style.RESET_ALL} ({cost_time:.1f}ms)")
                 passed += 1
                 results_by_type[case_type]["pass"] += 1
-            else:
+                if verbose:
+                    print(f"{Fore.GREEN} [PASS] {Style.RESET_ALL} ({cost_time:.1f}ms)")
+            elif verbose:
                 print(f"{Fore.RED} [FAIL] {Style.RESET_ALL} ({cost_time:.1f}ms)")
                 print(f"    ❌ Expected: {expected}")
                 print(f"    🔍 Actual:   {retrieved_names[:5]}...")  # 只打印前5个
@@ -96,10 +259,12 @@ def run_benchmark():
 
     # 打印报告
     accuracy = (passed / total) * 100 if total > 0 else 0
+    recall = {k: (recall_sums[k] / recall_n if recall_n else 0.0) for k in RECALL_KS}
     print("\n" + "=" * 60)
-    print(f"{Fore.YELLOW}🏆 测试报告 (Benchmark Report)")
+    print(f"{Fore.YELLOW}🏆 测试报告 (Benchmark Report, mode={mode})")
     print("=" * 60)
     print(f"Overall Acc:  {Fore.GREEN}{accuracy:.2f}% ({passed}/{total})")
+    print("  " + "  ".join(f"Recall@{k}: {recall[k] * 100:.1f}%" for k in RECALL_KS))
     print("-" * 60)
     for c_type, stats in results_by_type.items():
         if stats["total"] > 0:
@@ -107,6 +272,67 @@ def run_benchmark():
             print(f"  - {c_type:<10}: {type_acc:.1f}% ({stats['pass']}/{stats['total']})")
     print("=" * 60)
 
+    return {"mode": mode, "accuracy": accuracy, "recall": recall}
+
+
+async def compare_hybrid(topk=10):
+    """向量召回 vs 混合召回 (BM25 + RRF) 的 Recall@k 对比"""
+    base = await run_benchmark(hybrid=False, topk=topk, verbose=False)
+    hyb = await run_benchmark(hybrid=True, topk=topk, verbose=False)
+
+    print(f"\n{Fore.YELLOW}📊 Hybrid Recall Delta")
+    print("=" * 60)
+    print(f"  Acc      : {base['accuracy']:.1f}% -> {hyb['accuracy']:.1f}%")
+    for k in RECALL_KS:
+        b, h = base["recall"][k] * 100, hyb["recall"][k] * 100
+        color = Fore.GREEN if h >= b else Fore.RED
+        print(f"  Recall@{k:<2}: {b:.1f}% -> {color}{h:.1f}% ({h - b:+.1f}){Style.RESET_ALL}")
+    print("=" * 60)
+
+
+async def compare_hybrid_load(concurrency=8, rounds=5, topk=10, report_path=None, use_cache=False):
+    """并发压测下的 向量召回 vs 混合召回：延迟 (p50/p95) 与 Recall/MRR 一起对比"""
+    reports = {}
+    for label, hybrid in (("vector", False), ("hybrid", True)):
+        path = f"{os.path.splitext(report_path)[0]}_{label}.json" if report_path else None
+        reports[label] = await run_load(concurrency, rounds, topk, hybrid=hybrid, report_path=path,
+                                        use_cache=use_cache)
+    base, hyb = reports["vector"], reports["hybrid"]
+
+    print(f"\n{Fore.YELLOW}📊 Hybrid Load Delta (vector -> hybrid)")
+    print("=" * 60)
+    for pct in ("p50", "p95"):
+        b, h = base["latency_ms"][pct], hyb["latency_ms"][pct]
+        print(f"  {pct} end2end : {b:.1f}ms -> {h:.1f}ms ({h - b:+.1f}ms)")
+    print(f"  QPS         : {base['throughput_qps']} -> {hyb['throughput_qps']}")
+    for metric in [f"recall@{k}" for k in RECALL_KS] + ["mrr"]:
+        b, h = base["quality"]["overall"][metric] or 0.0, hyb["quality"]["overall"][metric] or 0.0
+        color = Fore.GREEN if h >= b else Fore.RED
+        print(f"  {metric:<12}: {b:.3f} -> {color}{h:.3f} ({h - b:+.3f}){Style.RESET_ALL}")
+    print("=" * 60)
+    return reports
+
 
 if __name__ == "__main__":
-    run_benchmark()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Retrieval accuracy benchmark")
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--compare-hybrid", action="store_true", help="对比纯向量召回与混合召回的 Recall@k")
+    parser.add_argument("--concurrency", type=int, default=0, help=">0 时跑并发压测 (分阶段 p50/p95/p99 + Recall/MRR)")
+    parser.add_argument("--rounds", type=int, default=5, help="并发压测中每个 case 重复的次数")
+    parser.add_argument("--report", default=None, help="并发压测 JSON 报告路径 (默认 logs/retrieval_benchmark_*.json)")
+    parser.add_argument("--use-cache", action="store_true", help="并发压测时保留 Embedding / 结果缓存")
+    parser.add_argument("--hybrid", choices=["on", "off"], default=None,
+                        help="并发压测是否开启混合召回 (默认跟随 HYBRID_ENABLED)；与 --compare-hybrid 同用时两种都跑")
+    args = parser.parse_args()
+
+    if args.concurrency > 0 and args.compare_hybrid:
+        asyncio.run(compare_hybrid_load(args.concurrency, args.rounds, args.topk, report_path=args.report,
+                                        use_cache=args.use_cache))
+    elif args.concurrency > 0:
+        asyncio.run(run_load(args.concurrency, args.rounds, args.topk,
+                             hybrid=None if args.hybrid is None else args.hybrid == "on",
+                             report_path=args.report, use_cache=args.use_cache))
+    elif args.compare_hybrid:
+        asyncio.run(compare_hybrid(args.topk))
+    else:
+        asyncio.run(run_benchmark(topk=args.topk))